@@ -0,0 +1,196 @@
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import random
+from app.core.setting import get_settings
+from .resilience import CircuitState, UpstreamCall, get_upstream_guard
+
+
+class Upstream:
+    """
+    OpenAI 兼容的上游端点(网关地址 + API密钥)
+
+    记录延迟 EWMA 与未完成请求数，供负载均衡选择；熔断状态复用该端点的保护组合
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        weight: float = 1.0,
+        name: Optional[str] = None,
+        alpha: float = 0.3,
+    ):
+        """
+        初始化上游端点
+
+        Args:
+            base_url: 上游基础URL
+            api_key: API密钥
+            weight: 权重，越大分到的请求越多
+            name: 名称，用于统计和熔断器区分，默认使用 base_url
+            alpha: 延迟 EWMA 的平滑系数
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.weight = max(weight, 0.001)
+        self.name = name or base_url
+        self.alpha = alpha
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+        self.guard = get_upstream_guard(self.name)
+        self.ewma_latency = 0.0
+        self.outstanding = 0
+        self._stats = {"requests": 0, "failures": 0}
+
+    @property
+    def healthy(self) -> bool:
+        """熔断器打开的上游视为已摘除"""
+        return self.guard.breaker.state is not CircuitState.OPEN
+
+    def score(self) -> float:
+        """负载评分，越低越优先：延迟 × (未完成请求数 + 1) / 权重"""
+        return self.ewma_latency * (self.outstanding + 1) / self.weight
+
+    @asynccontextmanager
+    async def call(self) -> AsyncIterator[UpstreamCall]:
+        """
+        执行一次受熔断与并发限制保护的调用，并更新负载统计
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            ConcurrencyLimitExceeded: 并发名额排队超时
+        """
+        with self._track():
+            async with self.guard.call() as call:
+                yield call
+            self._observe(call.latency)
+
+    @contextmanager
+    def call_sync(self) -> Iterator[UpstreamCall]:
+        """
+        同步版本的 call，并发名额不足时不排队直接失败
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            ConcurrencyLimitExceeded: 没有空闲的并发名额
+        """
+        with self._track():
+            with self.guard.call_sync() as call:
+                yield call
+            self._observe(call.latency)
+
+    @contextmanager
+    def _track(self) -> Iterator[None]:
+        """更新未完成请求数，失败时惩罚延迟估计"""
+        self.outstanding += 1
+        self._stats["requests"] += 1
+        try:
+            yield
+        except Exception:
+            self._stats["failures"] += 1
+            # 失败时惩罚延迟估计，使后续请求暂时偏向其他上游
+            self.ewma_latency = min(self.ewma_latency * 2 or 1.0, 60.0)
+            raise
+        finally:
+            self.outstanding -= 1
+
+    def _observe(self, latency: Optional[float]) -> None:
+        """成功调用后更新延迟 EWMA"""
+        if latency is not None:
+            self.ewma_latency += self.alpha * (latency - self.ewma_latency)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "ewma_latency": round(self.ewma_latency, 4),
+            "outstanding": self.outstanding,
+            **self._stats,
+        }
+
+
+class LoadBalancer:
+    """
+    上游负载均衡器 - 按权重随机抽取两个候选(power of two choices)，选择负载评分更低者
+
+    熔断中的上游被摘除，全部摘除时仍返回一个上游，由其熔断器快速失败
+    """
+
+    def __init__(self, upstreams: List[Upstream]):
+        """
+        初始化负载均衡器
+
+        Args:
+            upstreams: 上游列表，至少包含一个上游
+        """
+        if not upstreams:
+            raise ValueError("至少需要配置一个上游")
+        self.upstreams = upstreams
+
+    def pick(self, avoid: Optional[Upstream] = None) -> Upstream:
+        """
+        选择一个上游
+
+        Args:
+            avoid: 尽量避开的上游(如上一次失败的上游)
+
+        Returns:
+            选中的上游
+        """
+        candidates = [u for u in self.upstreams if u.healthy and u is not avoid]
+        if not candidates:
+            candidates = [u for u in self.upstreams if u.healthy] or self.upstreams
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.choices(
+            candidates, weights=[u.weight for u in candidates], k=2
+        )
+        return first if first.score() <= second.score() else second
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {u.name: u.stats for u in self.upstreams}
+
+
+_single_upstreams: Dict[Tuple[str, str], Upstream] = {}
+
+
+def get_upstream(base_url: str, api_key: str) -> Upstream:
+    """
+    获取单个上游端点，未配置负载均衡时使用
+
+    Args:
+        base_url: 上游基础URL
+        api_key: API密钥
+
+    Returns:
+        复用的上游端点
+    """
+    upstream = _single_upstreams.get((base_url, api_key))
+    if upstream is None:
+        upstream = _single_upstreams[(base_url, api_key)] = Upstream(base_url, api_key)
+    return upstream
+
+
+@lru_cache()
+def get_load_balancer() -> Optional[LoadBalancer]:
+    """获取全局负载均衡器，未配置多个上游时返回None"""
+    config = get_settings().chat
+    if not config.UPSTREAMS:
+        return None
+    return LoadBalancer(
+        [
+            Upstream(
+                base_url=item["base_url"],
+                api_key=item.get("api_key", config.SHAREAI_API_KEY),
+                weight=float(item.get("weight", 1.0)),
+                name=item.get("name", f"upstream-{index}"),
+            )
+            for index, item in enumerate(config.UPSTREAMS)
+        ]
+    )
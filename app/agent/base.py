@@ -1,10 +1,256 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Callable, TypeVar, Generic, Union, List
+from typing import (
+    Any,
+    Dict,
+    Optional,
+    Callable,
+    TypeVar,
+    Generic,
+    Union,
+    List,
+    Tuple,
+    FrozenSet,
+)
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import asyncio
+import random
 import time
 from functools import wraps
+import httpx
+
+# aiohttp 为可选依赖，安装时同样识别其异常类型
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
 T = TypeVar("T")
 
+# 上游限流、超时及服务端错误对应的可重试状态码
+RETRYABLE_STATUS_CODES: FrozenSet[int] = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头
+
+    Args:
+        value: 响应头的值，可以是秒数或 HTTP 日期
+
+    Returns:
+        需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """
+    重试策略 - 全抖动指数退避，带总体截止时间并遵循上游 Retry-After
+
+    策略对象本身无状态，可在多个代理之间共享
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        deadline: Optional[float] = None,
+        retryable_status: FrozenSet[int] = RETRYABLE_STATUS_CODES,
+    ):
+        """
+        初始化重试策略
+
+        Args:
+            max_attempts: 最大尝试次数(含首次)
+            base_delay: 退避基础间隔(秒)
+            max_delay: 单次退避的最大间隔(秒)
+            deadline: 所有尝试加退避的总时间预算(秒)，为空时不限制
+            retryable_status: 可重试的HTTP状态码
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retryable_status = retryable_status
+
+    def classify(self, exc: BaseException) -> Tuple[bool, Optional[float]]:
+        """
+        判断异常是否可重试
+
+        Args:
+            exc: 请求抛出的异常
+
+        Returns:
+            (是否可重试, 上游要求的等待秒数)
+        """
+        if isinstance(exc, httpx.HTTPStatusError):
+            response = exc.response
+            if response.status_code in self.retryable_status:
+                return True, parse_retry_after(response.headers.get("Retry-After"))
+            return False, None
+        if isinstance(exc, (httpx.TimeoutException, httpx.NetworkError)):
+            return True, None
+        if isinstance(exc, httpx.RemoteProtocolError):
+            # 上游提前断开连接等协议错误
+            return True, None
+        if aiohttp is not None:
+            if isinstance(exc, aiohttp.ClientResponseError):
+                if exc.status in self.retryable_status:
+                    headers = exc.headers or {}
+                    return True, parse_retry_after(headers.get("Retry-After"))
+                return False, None
+            if isinstance(exc, aiohttp.ClientConnectionError):
+                return True, None
+        if isinstance(exc, (TimeoutError, ConnectionError)):
+            return True, None
+        return False, None
+
+    @staticmethod
+    def describe(exc: BaseException) -> str:
+        """
+        生成记录到 retry_info 中的简短错误描述
+
+        Args:
+            exc: 请求抛出的异常
+
+        Returns:
+            错误描述
+        """
+        if isinstance(exc, httpx.HTTPStatusError):
+            return f"HTTP {exc.response.status_code}"
+        if aiohttp is not None and isinstance(exc, aiohttp.ClientResponseError):
+            return f"HTTP {exc.status}"
+        message = str(exc)
+        return f"{type(exc).__name__}: {message}" if message else type(exc).__name__
+
+    def backoff(self, attempt: int) -> float:
+        """
+        计算第 attempt 次失败后的退避时间(全抖动)
+
+        Args:
+            attempt: 已失败的次数，从1开始
+
+        Returns:
+            退避秒数
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def next_delay(
+        self, exc: BaseException, attempt: int, started: float
+    ) -> Optional[float]:
+        """
+        计算下一次重试前的等待时间
+
+        Args:
+            exc: 本次失败的异常
+            attempt: 已失败的次数，从1开始
+            started: 首次尝试开始的单调时钟时间
+
+        Returns:
+            等待秒数，不应再重试时返回None
+        """
+        retryable, retry_after = self.classify(exc)
+        if not retryable or attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if self.deadline is not None:
+            remaining = self.deadline - (time.monotonic() - started)
+            if delay >= remaining:
+                return None
+        return delay
+
+    async def call(
+        self, func: Callable, *args, retry_info: Dict[str, Any], **kwargs
+    ) -> Any:
+        """
+        按策略执行协程函数，并记录重试信息
+
+        Args:
+            func: 需要重试的协程函数
+            retry_info: 用于记录重试信息的字典
+            *args, **kwargs: 传给 func 的参数
+
+        Returns:
+            func 的返回值
+        """
+        retry_info["attempts"] = 0
+        retry_info["errors"] = []
+        retry_info["success"] = False
+        started = time.monotonic()
+
+        while True:
+            retry_info["attempts"] += 1
+            try:
+                if self.deadline is None:
+                    result = await func(*args, **kwargs)
+                else:
+                    # 单次尝试同样受总时限约束，避免一次慢请求越过截止时间
+                    remaining = self.deadline - (time.monotonic() - started)
+                    try:
+                        result = await asyncio.wait_for(func(*args, **kwargs), remaining)
+                    except asyncio.TimeoutError as e:
+                        raise TimeoutError(f"超过请求总时限 {self.deadline}s") from e
+            except Exception as e:
+                retry_info["errors"].append(self.describe(e))
+                delay = self.next_delay(e, retry_info["attempts"], started)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                retry_info["success"] = True
+                return result
+
+    def call_sync(
+        self, func: Callable, *args, retry_info: Dict[str, Any], **kwargs
+    ) -> Any:
+        """
+        按策略执行同步函数，并记录重试信息(退避期间阻塞当前线程)
+
+        Args:
+            func: 需要重试的函数
+            retry_info: 用于记录重试信息的字典
+            *args, **kwargs: 传给 func 的参数
+
+        Returns:
+            func 的返回值
+        """
+        retry_info["attempts"] = 0
+        retry_info["errors"] = []
+        retry_info["success"] = False
+        started = time.monotonic()
+
+        while True:
+            retry_info["attempts"] += 1
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                retry_info["errors"].append(self.describe(e))
+                delay = self.next_delay(e, retry_info["attempts"], started)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                retry_info["success"] = True
+                return result
+
 
 class BaseAgent(ABC, Generic[T]):
     """
@@ -17,6 +263,7 @@ class BaseAgent(ABC, Generic[T]):
         base_url: str,
         max_retries: int = 3,
         retry_delay: float = 1.0,
+        retry_policy: Optional[RetryPolicy] = None,
     ):
         """
         初始化代理
@@ -26,12 +273,16 @@ class BaseAgent(ABC, Generic[T]):
             base_url: 基础URL
             max_retries: 最大重试次数
             retry_delay: 重试间隔时间(秒)
+            retry_policy: 重试策略，默认根据 max_retries 和 retry_delay 创建
         """
         self.api_key = api_key
         self.base_url = base_url
         self._result: Optional[T] = None
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=max_retries, base_delay=retry_delay
+        )
         # 记录重试信息
         self.retry_info: Dict[str, Any] = {
             "attempts": 0,
@@ -44,6 +295,15 @@ class BaseAgent(ABC, Generic[T]):
         """执行代理的主要功能"""
         pass
 
+    async def arun(self, *args, **kwargs) -> None:
+        """
+        异步执行代理的主要功能
+
+        默认将同步的 run 放到线程池中执行，避免阻塞事件循环；
+        支持异步IO的子类应重写此方法
+        """
+        await asyncio.to_thread(self.run, *args, **kwargs)
+
     def get_result(self) -> Optional[T]:
         """
         获取代理执行的结果
@@ -97,34 +357,28 @@ class BaseAgent(ABC, Generic[T]):
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-            self.retry_info["attempts"] = 0
-            self.retry_info["errors"] = []
-            self.retry_info["success"] = False
-
-            retryable_errors = (
-                TimeoutError,
-                ConnectionError,
-                ConnectionRefusedError,
-                ConnectionResetError,
+            return self.retry_policy.call_sync(
+                func, *args, retry_info=self.retry_info, **kwargs
             )
 
-            for attempt in range(self.max_retries):
-                try:
-                    self.retry_info["attempts"] += 1
-                    result = func(*args, **kwargs)
-                    self.retry_info["success"] = True
-                    return result
-                except retryable_errors as e:
-                    self.retry_info["errors"].append(str(e))
-                    if attempt < self.max_retries - 1:
-                        # 使用指数退避策略
-                        delay = self.retry_delay * (2**attempt)
-                        time.sleep(delay)
-                    else:
-                        # 最后一次尝试失败，重新抛出异常
-                        raise
+        return wrapper
 
-            return None
+    def with_async_retry(self, func: Callable) -> Callable:
+        """
+        装饰器：为协程函数添加重试功能，退避期间不阻塞事件循环
+
+        Args:
+            func: 需要添加重试功能的协程函数
+
+        Returns:
+            添加了重试功能的协程函数
+        """
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await self.retry_policy.call(
+                func, *args, retry_info=self.retry_info, **kwargs
+            )
 
         return wrapper
 
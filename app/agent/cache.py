@@ -0,0 +1,261 @@
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+import orjson
+from app.core.setting import get_settings
+from .message import Message
+
+
+def make_cache_key(model: str, messages: Iterable[Message]) -> str:
+    """
+    根据模型和消息历史生成规范化的缓存键，直接使用各消息缓存的 JSON 片段
+
+    Args:
+        model: 模型名称
+        messages: 消息历史
+
+    Returns:
+        缓存键(sha256 十六进制摘要)
+    """
+    digest = hashlib.sha256(orjson.dumps(model))
+    for msg in messages:
+        digest.update(b"\n")
+        digest.update(msg.to_json())
+    return digest.hexdigest()
+
+
+class CompletionCache:
+    """
+    聊天补全精确匹配缓存
+
+    内存层为带 TTL 的 LRU，可选磁盘层在内存淘汰或进程重启后继续命中；
+    磁盘层每写入一定数量的条目清理一次过期文件，仍超过条目上限时删除最早写入的文件，
+    两次清理之间最多超出上限的十分之一
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        disk_dir: Optional[str] = None,
+        disk_max_entries: int = 100000,
+    ):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 内存层最大条目数
+            ttl: 缓存有效期(秒)
+            disk_dir: 磁盘层目录，为空时不启用磁盘层
+            disk_max_entries: 磁盘层最大条目数
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_entries = disk_max_entries
+        self._sweep_every = max(1, disk_max_entries // 10)
+        self._disk_writes = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        # key -> (过期时间戳, 缓存值)
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "disk_evictions": 0,
+        }
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        同步查询缓存(磁盘层为阻塞读取)
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值，未命中时返回None
+        """
+        value = self._get_memory(key)
+        if value is None and self.disk_dir:
+            value = self._read_disk(key)
+            if value is not None:
+                self._stats["disk_hits"] += 1
+                self._set_memory(key, value, time.time() + self.ttl)
+        return self._record(value)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        异步查询缓存，磁盘读取放到线程池执行
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值，未命中时返回None
+        """
+        value = self._get_memory(key)
+        if value is None and self.disk_dir:
+            value = await asyncio.to_thread(self._read_disk, key)
+            if value is not None:
+                self._stats["disk_hits"] += 1
+                self._set_memory(key, value, time.time() + self.ttl)
+        return self._record(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        同步写入缓存
+
+        Args:
+            key: 缓存键
+            value: 缓存值，需可被 JSON 序列化
+        """
+        expires_at = time.time() + self.ttl
+        self._stats["sets"] += 1
+        self._set_memory(key, value, expires_at)
+        if self.disk_dir:
+            self._write_disk(key, value, expires_at)
+
+    async def aset(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        异步写入缓存，磁盘写入放到线程池执行
+
+        Args:
+            key: 缓存键
+            value: 缓存值，需可被 JSON 序列化
+        """
+        expires_at = time.time() + self.ttl
+        self._stats["sets"] += 1
+        self._set_memory(key, value, expires_at)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, value, expires_at)
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层"""
+        self._memory.clear()
+        if self.disk_dir:
+            for path in self.disk_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            命中、未命中、淘汰等计数及当前条目数
+        """
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._memory),
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+    def _record(self, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        self._stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    def _get_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._memory[key]
+            self._stats["expirations"] += 1
+            return None
+        self._memory.move_to_end(key)
+        self._stats["memory_hits"] += 1
+        return value
+
+    def _set_memory(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._disk_path(key)
+        try:
+            entry = orjson.loads(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, orjson.JSONDecodeError):
+            path.unlink(missing_ok=True)
+            return None
+        if entry["expires_at"] <= time.time():
+            path.unlink(missing_ok=True)
+            self._stats["expirations"] += 1
+            return None
+        return entry["value"]
+
+    def _write_disk(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        path = self._disk_path(key)
+        # 先写唯一命名的临时文件再替换，避免并发读取到半截内容或并发写入互相覆盖
+        with tempfile.NamedTemporaryFile(
+            dir=self.disk_dir, prefix=f"{key}.", suffix=".tmp", delete=False
+        ) as tmp:
+            tmp.write(orjson.dumps({"expires_at": expires_at, "value": value}))
+        try:
+            os.replace(tmp.name, path)
+        except OSError:
+            os.unlink(tmp.name)
+            raise
+        # 写入可能在多个线程中并发执行，计数不精确只会让清理稍早或稍晚
+        self._disk_writes += 1
+        if self._disk_writes >= self._sweep_every:
+            self._disk_writes = 0
+            self._sweep_disk()
+
+    def _sweep_disk(self) -> None:
+        """删除过期文件和遗留的临时文件，仍超过条目上限时删除最早写入的文件"""
+        now = time.time()
+        entries: List[Tuple[float, Path]] = []
+        for path in self.disk_dir.iterdir():
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            # 写入时间加有效期即过期时间，无需读取文件内容
+            expired = mtime + self.ttl <= now
+            if path.suffix == ".json" and not expired:
+                entries.append((mtime, path))
+            elif path.suffix in (".json", ".tmp") and expired:
+                path.unlink(missing_ok=True)
+                if path.suffix == ".json":
+                    self._stats["expirations"] += 1
+        excess = len(entries) - self.disk_max_entries
+        if excess > 0:
+            entries.sort()
+            for _, path in entries[:excess]:
+                path.unlink(missing_ok=True)
+            self._stats["disk_evictions"] += excess
+
+
+@lru_cache()
+def get_completion_cache() -> Optional[CompletionCache]:
+    """获取全局补全缓存单例，未启用时返回None"""
+    config = get_settings().chat
+    if not config.CACHE_ENABLED:
+        return None
+    return CompletionCache(
+        max_entries=config.CACHE_MAX_ENTRIES,
+        ttl=config.CACHE_TTL,
+        disk_dir=config.CACHE_DISK_DIR or None,
+        disk_max_entries=config.CACHE_DISK_MAX_ENTRIES,
+    )
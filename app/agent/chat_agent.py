@@ -1,10 +1,40 @@
-from typing import List, Dict, Any, Optional, Callable
-from .base import BaseAgent
-import httpx
-import aiohttp
-import json
-from functools import partial
+from typing import (
+    List,
+    Dict,
+    Any,
+    Optional,
+    Callable,
+    AsyncIterator,
+    Awaitable,
+    Iterator,
+    Union,
+)
+from .base import BaseAgent, RetryPolicy
+from .http_pool import UpstreamPool, get_upstream_pool
+from .sse import ChatStreamParser
+from .cache import CompletionCache, make_cache_key
+from .singleflight import SingleFlight, Emit
+from .balancer import LoadBalancer, Upstream, get_upstream
+from .hedging import HedgePolicy
+from .context import ContextWindow
+from .message import Message, MessageHistory, encode_payload
+from .stream_timing import DeliveryTiming, StreamTiming, stream_timing_summary
+from app.core.logger import log_warning
+from app.core.metrics import ServiceMetrics
+import inspect
+from contextlib import asynccontextmanager, contextmanager, suppress
 import asyncio
+import time
+
+# 流式回调既可以是普通函数，也可以是返回可等待对象的协程函数(用于背压)
+StreamCallback = Callable[[str], Union[None, Awaitable[None]]]
+
+# 流式队列结束标记
+_STREAM_END = object()
+
+
+class StreamInterruptedError(Exception):
+    """流式响应已向调用方输出内容后中断，重试会导致内容重复，因此不再重试"""
 
 
 class ChatAgent(BaseAgent[Dict[str, Any]]):
@@ -16,6 +46,14 @@ class ChatAgent(BaseAgent[Dict[str, Any]]):
         model: str = "gpt-4o-mini",
         max_retries: int = 3,
         retry_delay: float = 1.0,
+        retry_policy: Optional[RetryPolicy] = None,
+        pool: Optional[UpstreamPool] = None,
+        cache: Optional[CompletionCache] = None,
+        flight: Optional[SingleFlight] = None,
+        balancer: Optional[LoadBalancer] = None,
+        hedging: Optional[HedgePolicy] = None,
+        context: Optional[ContextWindow] = None,
+        metrics: Optional[ServiceMetrics] = None,
     ):
         """
         初始化聊天代理
@@ -25,70 +63,333 @@ class ChatAgent(BaseAgent[Dict[str, Any]]):
             model: 模型名称
             max_retries: 最大重试次数
             retry_delay: 重试间隔时间(秒)
+            retry_policy: 重试策略，默认根据 max_retries 和 retry_delay 创建
+            pool: 上游连接池，默认使用应用级共享连接池
+            cache: 补全缓存，为空时不使用缓存
+            flight: 请求合并器，为空时不合并相同的并发请求
+            balancer: 上游负载均衡器，为空时固定使用 base_url 和 api_key
+            hedging: 对冲请求策略，为空时不发送对冲请求
+            context: 上下文窗口管理，为空时不裁剪消息历史
+            metrics: 服务指标，为空时不记录上游请求指标
         """
         super().__init__(
             api_key=api_key,
             base_url=base_url,
             max_retries=max_retries,
             retry_delay=retry_delay,
+            retry_policy=retry_policy,
         )
         self.model = model
-        self.messages: List[Dict[str, str]] = []
+        self.pool = pool or get_upstream_pool()
+        self.cache = cache
+        self.flight = flight
+        self.balancer = balancer
+        self.hedging = hedging
+        self.context = context
+        self.metrics = metrics
+        # 最近一次请求使用的上游
+        self._upstream: Optional[Upstream] = None
+        self.messages = MessageHistory()
         self._is_running = False
+        # 最近一次流式请求的解析统计
+        self.stream_stats: Dict[str, Any] = {}
+        # 最近一次流式请求的上游时间线及服务端推送时间
+        self.stream_timing: Optional[StreamTiming] = None
+        self.delivery_timing: Optional[DeliveryTiming] = None
 
     def add_message(self, role: str, content: str) -> None:
         """
         添加消息到对话历史
         """
-        self.messages.append({"role": role, "content": content})
+        self.messages.add(role, content)
 
-    def _execute_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def _context_messages(self) -> List[Message]:
         """
-        执行HTTP请求，可以被重试装饰器包装
+        获取发送给上游的消息快照，超出模型上下文窗口时丢弃最早的轮次；
+        完整历史仍保留在 self.messages 中
+        """
+        messages = self.messages[:]
+        if self.context is None:
+            return messages
+        return self.context.fit(self.model, messages, self.messages.system_indexes)
+
+    def _request_key(self) -> Optional[str]:
+        """
+        根据当前模型和消息历史计算请求键，用于缓存和请求合并；
+        两者均未启用时返回None
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
+        if self.cache is None and self.flight is None:
+            return None
+        return make_cache_key(self.model, self.messages)
+
+    def _apply_shared(self, retry_info: Dict[str, Any]) -> None:
+        """复用其他请求的上游调用时，沿用其重试信息"""
+        self.retry_info = {**retry_info, "coalesced": True}
+
+    def _apply_response(self, response_data: Dict[str, Any]) -> None:
+        """保存响应结果，并将助手回复添加到消息历史"""
+        self._result = response_data
+
+        if "choices" in response_data and response_data["choices"]:
+            assistant_message = response_data["choices"][0]["message"]
+            self.add_message(assistant_message["role"], assistant_message["content"])
+
+    def _apply_cache_hit(self, response_data: Dict[str, Any]) -> None:
+        """使用缓存命中的响应，不访问上游"""
+        self.retry_info = {
+            "attempts": 0,
+            "errors": [],
+            "success": True,
+            "cached": True,
         }
+        self._apply_response(response_data)
+
+    @contextmanager
+    def _observe_upstream_sync(self) -> Iterator[None]:
+        """记录一次上游请求的结果和耗时"""
+        if self.metrics is None:
+            yield
+            return
+        with self.metrics.upstream_call(self.model):
+            yield
+
+    @asynccontextmanager
+    async def _observe_upstream(self) -> AsyncIterator[None]:
+        """异步版本的 _observe_upstream_sync"""
+        with self._observe_upstream_sync():
+            yield
+
+    def _cache_get_sync(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """读取缓存，缓存故障时视为未命中，不影响请求本身"""
+        if self.cache is None or not key:
+            return None
+        try:
+            return self.cache.get(key)
+        except Exception as e:
+            log_warning(f"读取补全缓存失败: {e!r}")
+            return None
+
+    def _cache_set_sync(self, key: Optional[str], response_data: Dict[str, Any]) -> None:
+        """写入缓存，缓存故障只记录日志，不把成功的响应变成错误"""
+        if self.cache is None or not key or not response_data.get("choices"):
+            return
+        try:
+            self.cache.set(key, response_data)
+        except Exception as e:
+            log_warning(f"写入补全缓存失败: {e!r}")
+
+    async def _cache_get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """异步版本的 _cache_get_sync"""
+        if self.cache is None or not key:
+            return None
+        try:
+            return await self.cache.aget(key)
+        except Exception as e:
+            log_warning(f"读取补全缓存失败: {e!r}")
+            return None
 
-        with httpx.Client(timeout=60.0) as client:
+    async def _cache_set(self, key: Optional[str], response_data: Dict[str, Any]) -> None:
+        """异步版本的 _cache_set_sync"""
+        if self.cache is None or not key or not response_data.get("choices"):
+            return
+        try:
+            await self.cache.aset(key, response_data)
+        except Exception as e:
+            log_warning(f"写入补全缓存失败: {e!r}")
+
+    def _record_retries(self) -> None:
+        """重试结束后记录本次请求的尝试次数和错误"""
+        if self.metrics is not None:
+            self.metrics.observe_retry_info(self.model, self.retry_info)
+
+    def _pick_upstream(self) -> Upstream:
+        """选择本次请求的上游，重试时尽量避开上一次使用的上游"""
+        if self.balancer is None:
+            self._upstream = get_upstream(self.base_url, self.api_key)
+        else:
+            avoid = self._upstream if self.retry_info["attempts"] > 1 else None
+            self._upstream = self.balancer.pick(avoid=avoid)
+        return self._upstream
+
+    def _execute_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        执行HTTP请求，可以被重试装饰器包装
+        """
+        upstream = self._pick_upstream()
+        client = self.pool.get_sync_client(upstream.base_url)
+        # 与异步请求共用熔断器和并发限制，同步调用不排队等待名额
+        with upstream.call_sync() as call, self._observe_upstream_sync():
             response = client.post(
-                f"{self.base_url}/v1/chat/completions",
-                headers=headers,
-                json=payload,
+                f"{upstream.base_url}/v1/chat/completions",
+                headers=upstream.headers,
+                content=encode_payload(payload),
             )
+            call.mark_response()
             response.raise_for_status()
             return response.json()
 
+    def _pick_hedge_upstream(self, primary: Upstream) -> Upstream:
+        """为对冲请求选择上游，尽量与主请求不同"""
+        if self.balancer is None:
+            return primary
+        return self.balancer.pick(avoid=primary)
+
+    @staticmethod
+    async def _cancel_tasks(tasks) -> None:
+        """取消并等待任务结束，确保上游连接和并发名额被释放"""
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _aexecute_request(
+        self, payload: Dict[str, Any], upstream: Optional[Upstream] = None
+    ) -> Dict[str, Any]:
+        """
+        异步执行HTTP请求，可以被异步重试装饰器包装
+        """
+        upstream = upstream or self._pick_upstream()
+        client = self.pool.get_client(upstream.base_url)
+        # 熔断器打开或并发名额不足时快速失败，不再等待上游超时
+        async with upstream.call() as call, self._observe_upstream():
+            response = await client.post(
+                f"{upstream.base_url}/v1/chat/completions",
+                headers=upstream.headers,
+                content=encode_payload(payload),
+            )
+            call.mark_response()
+            response.raise_for_status()
+            return response.json()
+
+    async def _aexecute_hedged(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        带对冲的异步HTTP请求：主请求超过分位数延迟仍未返回时向另一个上游
+        发送对冲请求，先成功者胜出，另一个被取消
+        """
+        primary = self._pick_upstream()
+        started = time.monotonic()
+        delay = self.hedging.delay("completion")
+        tasks = {asyncio.ensure_future(self._aexecute_request(payload, primary))}
+        hedge_task = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self.hedging.try_hedge():
+                hedge_task = asyncio.ensure_future(
+                    self._aexecute_request(payload, self._pick_hedge_upstream(primary))
+                )
+                tasks.add(hedge_task)
+
+            error: Optional[BaseException] = None
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self.hedging.observe("completion", time.monotonic() - started)
+                        if task is hedge_task:
+                            self.hedging.record_hedge_win()
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            await self._cancel_tasks([task for task in tasks if not task.done()])
+
     def run(self, prompt: str = None, system_prompt: str = None) -> None:
         """
-        执行聊天请求
+        执行聊天请求(同步阻塞，异步场景请使用 arun)
         """
         self._is_running = True
 
-        if system_prompt and not any(msg["role"] == "system" for msg in self.messages):
+        if system_prompt and not self.messages.has_system:
             self.add_message("system", system_prompt)
 
         if prompt:
             self.add_message("user", prompt)
 
         try:
+            cache_key = make_cache_key(self.model, self.messages) if self.cache else None
+            cached = self._cache_get_sync(cache_key)
+            if cached is not None:
+                self._apply_cache_hit(cached)
+                return
+
             payload = {
                 "model": self.model,
-                "messages": self.messages,
+                "messages": self._context_messages(),
             }
 
             # 使用重试装饰器包装请求执行函数
             execute_with_retry = self.with_retry(self._execute_request)
-            response_data = execute_with_retry(payload)
+            try:
+                response_data = execute_with_retry(payload)
+            finally:
+                self._record_retries()
+
+            self._apply_response(response_data)
+            self._cache_set_sync(cache_key, response_data)
+
+        except Exception as e:
+            self._result = {"error": str(e)}
+        finally:
+            self._is_running = False
+
+    async def arun(self, prompt: str = None, system_prompt: str = None) -> None:
+        """
+        异步执行聊天请求，请求与重试退避均不阻塞事件循环
+
+        Args:
+            prompt: 用户提示
+            system_prompt: 系统提示
+        """
+        self._is_running = True
+
+        if system_prompt and not self.messages.has_system:
+            self.add_message("system", system_prompt)
+
+        if prompt:
+            self.add_message("user", prompt)
+
+        try:
+            request_key = self._request_key()
+            cached = await self._cache_get(request_key)
+            if cached is not None:
+                self._apply_cache_hit(cached)
+                return
+
+            payload = {
+                "model": self.model,
+                "messages": self._context_messages(),
+            }
+
+            execute_with_retry = self.with_async_retry(
+                self._aexecute_hedged if self.hedging else self._aexecute_request
+            )
+
+            async def call_with_retry():
+                try:
+                    return await execute_with_retry(payload)
+                finally:
+                    self._record_retries()
+
+            if self.flight is not None:
 
-            self._result = response_data
+                async def shared_call():
+                    return await call_with_retry(), dict(self.retry_info)
 
-            if "choices" in response_data and response_data["choices"]:
-                assistant_message = response_data["choices"][0]["message"]
-                self.add_message(
-                    assistant_message["role"], assistant_message["content"]
+                (response_data, retry_info), shared = await self.flight.do(
+                    request_key, shared_call
                 )
+                if shared:
+                    self._apply_shared(retry_info)
+            else:
+                response_data = await call_with_retry()
+                shared = False
+
+            self._apply_response(response_data)
+            # 合并的请求只由实际访问上游的一方写入缓存
+            if not shared:
+                await self._cache_set(request_key, response_data)
 
         except Exception as e:
             self._result = {"error": str(e)}
@@ -97,7 +398,7 @@ class ChatAgent(BaseAgent[Dict[str, Any]]):
 
     def reset(self) -> None:
         """重置代理状态"""
-        self.messages = []
+        self.messages = MessageHistory()
         self._result = None
         self._is_running = False
 
@@ -126,7 +427,7 @@ class ChatAgent(BaseAgent[Dict[str, Any]]):
             return self.messages[-1]["content"]
         return None
 
-    def filter_messages(self, role_filter: str) -> List[Dict[str, str]]:
+    def filter_messages(self, role_filter: str) -> List[Message]:
         """
         按角色筛选消息
 
@@ -136,7 +437,17 @@ class ChatAgent(BaseAgent[Dict[str, Any]]):
         Returns:
             筛选后的消息列表
         """
-        return list(filter(lambda msg: msg["role"] == role_filter, self.messages))
+        return list(self.messages.by_role(role_filter))
+
+    def get_stream_timing(self) -> Dict[str, Any]:
+        """
+        获取最近一次流式请求的耗时摘要
+
+        Returns:
+            upstream 为上游的首字节、首个片段、片段间隔和生成速率，
+            server 为服务端队列排队时间和背压时间
+        """
+        return stream_timing_summary(self.stream_timing, self.delivery_timing)
 
     def get_conversation_text(self) -> str:
         """
@@ -145,47 +456,65 @@ class ChatAgent(BaseAgent[Dict[str, Any]]):
         Returns:
             格式化后的对话文本
         """
-        return "\n".join(
-            [f"{msg['role'].upper()}: {msg['content']}" for msg in self.messages]
-        )
+        return "\n".join(f"{msg.role.upper()}: {msg.content}" for msg in self.messages)
 
     async def _execute_stream_request(
-        self, payload: Dict[str, Any], callback: Optional[Callable[[str], None]]
+        self,
+        payload: Dict[str, Any],
+        callback: Optional[StreamCallback],
+        upstream: Optional[Upstream] = None,
     ) -> Dict[str, Any]:
         """
         执行流式HTTP请求，可以被重试装饰器包装
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60.0,
+        upstream = upstream or self._pick_upstream()
+        client = self.pool.get_client(upstream.base_url)
+        async with upstream.call() as call, self._observe_upstream():
+            timing = StreamTiming()
+
+            async def emit(content: str) -> None:
+                timing.mark_delta()
+                if callback:
+                    ret = callback(content)
+                    if inspect.isawaitable(ret):
+                        # 下游消费变慢时在此等待，计入背压时间
+                        blocked = time.perf_counter()
+                        await ret
+                        timing.backpressure += time.perf_counter() - blocked
+
+            async with client.stream(
+                "POST",
+                f"{upstream.base_url}/v1/chat/completions",
+                headers=upstream.headers,
+                content=encode_payload(payload),
             ) as response:
+                call.mark_response()
                 response.raise_for_status()
 
-                full_content = ""
-                async for line in response.content:
-                    line = line.decode("utf-8").strip()
-                    if line.startswith("data:") and line != "data: [DONE]":
-                        chunk_data = line[5:].strip()
-                        if chunk_data:
-                            try:
-                                chunk_obj = json.loads(chunk_data)
-                                if "choices" in chunk_obj and chunk_obj["choices"]:
-                                    delta = chunk_obj["choices"][0].get("delta", {})
-                                    if "content" in delta:
-                                        content = delta["content"]
-                                        full_content += content
-                                        if callback:
-                                            callback(content)
-                            except Exception:
-                                pass
+                parser = ChatStreamParser()
+                async for raw in response.aiter_bytes():
+                    timing.mark_byte()
+                    for content in parser.feed(raw):
+                        await emit(content)
+                for content in parser.close():
+                    await emit(content)
+
+                self.stream_stats = parser.stats
+                if self.stream_stats["malformed"]:
+                    log_warning(f"上游流式响应存在无法解析的数据帧: {self.stream_stats}")
+
+                full_content = parser.content.getvalue() if parser.content else ""
+                timing.finish(full_content)
+                self.stream_timing = timing
+                if self.metrics is not None:
+                    self.metrics.observe_stream(
+                        self.model,
+                        timing.ttfb,
+                        timing.ttft,
+                        timing.gaps,
+                        timing.tokens_per_second,
+                        timing.backpressure,
+                    )
 
                 # 将完整响应添加到消息历史
                 if full_content:
@@ -201,75 +530,260 @@ class ChatAgent(BaseAgent[Dict[str, Any]]):
                     }
                 return {"choices": []}
 
+    async def _execute_stream_hedged(
+        self, payload: Dict[str, Any], callback: Optional[StreamCallback]
+    ) -> Dict[str, Any]:
+        """
+        带对冲的流式HTTP请求：主请求超过分位数延迟仍未收到首个内容片段时
+        向另一个上游发送对冲请求，先产出内容者胜出，另一个被取消
+        """
+        primary = self._pick_upstream()
+        started = time.monotonic()
+        delay = self.hedging.delay("stream")
+        first_token = asyncio.Event()
+        winner: List[Optional[int]] = [None]
+
+        def contender_callback(index: int) -> StreamCallback:
+            async def forward(chunk: str) -> None:
+                if winner[0] is None:
+                    winner[0] = index
+                    first_token.set()
+                    self.hedging.observe("stream", time.monotonic() - started)
+                if winner[0] != index:
+                    # 落败的请求即将被取消，丢弃其内容
+                    return
+                if callback:
+                    ret = callback(chunk)
+                    if inspect.isawaitable(ret):
+                        await ret
+
+            return forward
+
+        contenders = [
+            asyncio.ensure_future(
+                self._execute_stream_request(payload, contender_callback(0), primary)
+            )
+        ]
+        first_token_task = asyncio.ensure_future(first_token.wait())
+        try:
+            await asyncio.wait(
+                [contenders[0], first_token_task],
+                timeout=delay,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if (
+                not first_token.is_set()
+                and not contenders[0].done()
+                and self.hedging.try_hedge()
+            ):
+                contenders.append(
+                    asyncio.ensure_future(
+                        self._execute_stream_request(
+                            payload,
+                            contender_callback(1),
+                            self._pick_hedge_upstream(primary),
+                        )
+                    )
+                )
+
+            error: Optional[BaseException] = None
+            pending = set(contenders)
+            while pending:
+                if first_token.is_set():
+                    # 已决出胜者，取消其余请求并等待胜者读完
+                    chosen = contenders[winner[0]]
+                    await self._cancel_tasks([t for t in contenders if t is not chosen])
+                    if winner[0] == 1:
+                        self.hedging.record_hedge_win()
+                    return await chosen
+                done, pending = await asyncio.wait(
+                    pending | {first_token_task}, return_when=asyncio.FIRST_COMPLETED
+                )
+                pending.discard(first_token_task)
+                for task in done:
+                    if task is first_token_task:
+                        continue
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    # 已产出内容的胜者与没有内容但成功结束的响应均视为胜出；
+                    # 整个回复只有一个片段时，胜者可能与 first_token 在同一轮结束
+                    index = contenders.index(task)
+                    if not first_token.is_set() or winner[0] == index:
+                        if index == 1:
+                            self.hedging.record_hedge_win()
+                        return task.result()
+            raise error
+        finally:
+            await self._cancel_tasks(
+                [t for t in contenders + [first_token_task] if not t.done()]
+            )
+
+    async def _stream_with_retry(
+        self, payload: Dict[str, Any], callback: Optional[StreamCallback]
+    ) -> Dict[str, Any]:
+        """
+        执行带重试的流式请求
+
+        Args:
+            payload: 请求数据
+            callback: 接收流式响应的回调函数
+
+        Returns:
+            汇总后的响应数据
+        """
+        execute = (
+            self._execute_stream_hedged if self.hedging else self._execute_stream_request
+        )
+        emitted = False
+
+        async def tracked(chunk: str) -> None:
+            nonlocal emitted
+            emitted = True
+            ret = callback(chunk)
+            if inspect.isawaitable(ret):
+                await ret
+
+        async def attempt(payload: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                return await execute(payload, tracked if callback else None)
+            except Exception as e:
+                if emitted:
+                    raise StreamInterruptedError(
+                        f"流式响应输出内容后中断: {RetryPolicy.describe(e)}"
+                    ) from e
+                raise
+
+        execute_with_retry = self.with_async_retry(attempt)
+        try:
+            return await execute_with_retry(payload)
+        finally:
+            self._record_retries()
+
     async def stream_run(
         self,
         prompt: str = None,
         system_prompt: str = None,
-        callback: Callable[[str], None] = None,
+        callback: StreamCallback = None,
     ) -> None:
         """
-        流式执行聊天请求，使用 aiohttp 替代 httpx
+        流式执行聊天请求，复用连接池中的异步客户端
 
         Args:
             prompt: 用户提示
             system_prompt: 系统提示
-            callback: 接收流式响应的回调函数
+            callback: 接收流式响应的回调函数，返回可等待对象时会被等待
         """
         self._is_running = True
 
         # 添加系统提示和用户提示的代码保持不变
-        if system_prompt and not any(msg["role"] == "system" for msg in self.messages):
+        if system_prompt and not self.messages.has_system:
             self.add_message("system", system_prompt)
 
         if prompt:
             self.add_message("user", prompt)
 
         try:
-            # 准备请求数据
-            payload = {"model": self.model, "messages": self.messages, "stream": True}
+            # 缓存命中时直接回放完整内容
+            request_key = self._request_key()
+            cached = await self._cache_get(request_key)
+            if cached is not None:
+                self._apply_cache_hit(cached)
+                if callback and cached.get("choices"):
+                    ret = callback(cached["choices"][0]["message"]["content"])
+                    if inspect.isawaitable(ret):
+                        await ret
+                return
 
-            # 这里我们需要一个异步版本的重试装饰器
-            # 由于基础实现是同步的，我们需要在这里手动实现异步重试逻辑
-            attempt = 0
-            self.retry_info["attempts"] = 0
-            self.retry_info["errors"] = []
-            self.retry_info["success"] = False
-
-            while attempt < self.max_retries:
-                try:
-                    self.retry_info["attempts"] += 1
-                    attempt += 1
-
-                    response_data = await self._execute_stream_request(
-                        payload, callback
-                    )
-                    self._result = response_data
+            # 准备请求数据
+            payload = {
+                "model": self.model,
+                "messages": self._context_messages(),
+                "stream": True,
+            }
 
-                    if "choices" in response_data and response_data["choices"]:
-                        assistant_message = response_data["choices"][0]["message"]
-                        self.add_message(
-                            assistant_message["role"], assistant_message["content"]
-                        )
+            if self.flight is not None:
+                # 相同的并发流式请求共享一个上游流
+                async def shared_stream(emit: Emit):
+                    data = await self._stream_with_retry(payload, emit)
+                    return data, dict(self.retry_info)
 
-                    self.retry_info["success"] = True
-                    break
+                (response_data, retry_info), shared = await self.flight.stream(
+                    request_key, shared_stream, callback
+                )
+                if shared:
+                    self._apply_shared(retry_info)
+            else:
+                response_data = await self._stream_with_retry(payload, callback)
+                shared = False
 
-                except (
-                    TimeoutError,
-                    ConnectionError,
-                    ConnectionRefusedError,
-                    ConnectionResetError,
-                ) as e:
-                    self.retry_info["errors"].append(str(e))
-                    if attempt < self.max_retries:
-                        # 使用指数退避策略
-                        delay = self.retry_delay * (2 ** (attempt - 1))
-                        await asyncio.sleep(delay)
-                    else:
-                        # 最后一次尝试失败
-                        raise
+            self._apply_response(response_data)
+            # 合并的请求只由实际访问上游的一方写入缓存
+            if not shared:
+                await self._cache_set(request_key, response_data)
 
         except Exception as e:
             self._result = {"error": str(e)}
         finally:
             self._is_running = False
+
+    async def astream(
+        self,
+        prompt: str = None,
+        system_prompt: str = None,
+        queue_size: int = 256,
+    ) -> AsyncIterator[str]:
+        """
+        以异步迭代器的形式流式执行聊天请求，内容片段到达即推送给调用方
+
+        内部使用有界队列连接上游读取与下游消费，消费方变慢时上游读取会被
+        背压暂停；迭代提前结束时会取消上游请求。与相同的并发请求合并时，
+        共享的上游请求在最后一个订阅者离开后才被取消
+
+        Args:
+            prompt: 用户提示
+            system_prompt: 系统提示
+            queue_size: 缓冲队列的最大长度
+
+        Yields:
+            流式响应的内容片段
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        delivery = self.delivery_timing = DeliveryTiming()
+
+        def enqueue(chunk: str) -> Awaitable[None]:
+            # 片段连同入队时间放入队列，用于统计服务端排队时间
+            return queue.put((chunk, time.perf_counter()))
+
+        async def produce() -> None:
+            cancelled = False
+            try:
+                await self.stream_run(
+                    prompt=prompt, system_prompt=system_prompt, callback=enqueue
+                )
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                # 被取消说明消费方已离开，不再放入结束标记，避免在满队列上永久阻塞
+                if not cancelled:
+                    await queue.put(_STREAM_END)
+
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                chunk, queued_at = item
+                delivery.record(queued_at)
+                yield chunk
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+                # 等待上游请求真正结束，确保连接和并发名额被释放
+                with suppress(asyncio.CancelledError):
+                    await task
+            if self.metrics is not None:
+                self.metrics.observe_delivery(self.model, delivery.waits)
@@ -0,0 +1,254 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+import hashlib
+import re
+from app.core.setting import get_settings
+from .message import Message
+
+# 常见模型的上下文窗口(token)，按最长前缀匹配
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4-turbo": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "claude": 200000,
+    "deepseek": 65536,
+    "qwen": 32768,
+    "glm-4": 128000,
+}
+
+# 每条消息的格式开销及回复起始开销(与 OpenAI 的计算方式一致)
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+
+# 中日韩字符、字母数字串、其余单个非空白字符
+_TOKEN_PATTERN = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]"
+    r"|[A-Za-z0-9]+"
+    r"|[^\sA-Za-z0-9]"
+)
+
+
+class ContextOverflowError(ValueError):
+    """最新一轮消息本身已超出模型的上下文窗口"""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    离线估算文本的 token 数
+
+    中日韩字符按每字一个 token，字母数字串按每 4 个字符一个 token，
+    其余符号各计一个 token，结果略偏保守
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的 token 数
+    """
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        length = match.end() - match.start()
+        tokens += (length + 3) // 4 if length > 1 else 1
+    return tokens
+
+
+class TokenCounter:
+    """
+    带缓存的消息 token 计数器
+
+    计数保存在消息对象上；另以消息内容的摘要为键缓存计数，使重新构建的同内容消息
+    (如客户端每次重发的历史)也无需再次分词，缓存本身不持有消息内容
+    """
+
+    def __init__(self, max_entries: int = 65536):
+        """
+        初始化计数器
+
+        Args:
+            max_entries: 最多缓存的消息数
+        """
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def count(self, content: str) -> int:
+        """
+        获取一条消息的 token 数(含消息格式开销)
+
+        Args:
+            content: 消息内容
+
+        Returns:
+            token 数
+        """
+        key = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+        tokens = self._cache.get(key)
+        if tokens is not None:
+            self._cache.move_to_end(key)
+            self._stats["hits"] += 1
+            return tokens
+        self._stats["misses"] += 1
+        tokens = self._cache[key] = estimate_tokens(content) + MESSAGE_OVERHEAD
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def count_message(self, message: Message) -> int:
+        """
+        获取消息的 token 数，结果保存在消息对象上，之后的轮次直接复用
+
+        Args:
+            message: 消息
+
+        Returns:
+            token 数
+        """
+        if message.tokens is None:
+            message.tokens = self.count(message.content)
+        return message.tokens
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "size": len(self._cache)}
+
+
+class ContextWindow:
+    """
+    上下文窗口管理 - 消息历史超出模型窗口时从最早的轮次开始丢弃，保留系统提示
+    """
+
+    def __init__(
+        self,
+        counter: Optional[TokenCounter] = None,
+        reserve_tokens: int = 1024,
+        default_window: int = 8192,
+        windows: Optional[Dict[str, int]] = None,
+        max_models: int = 1024,
+    ):
+        """
+        初始化上下文窗口管理
+
+        Args:
+            counter: token 计数器，默认新建
+            reserve_tokens: 为模型回复预留的 token 数
+            default_window: 未知模型的上下文窗口
+            windows: 额外的模型窗口配置，优先于内置配置
+            max_models: 最多缓存匹配结果的模型名称数
+        """
+        self.counter = counter or TokenCounter()
+        self.reserve_tokens = reserve_tokens
+        self.default_window = default_window
+        self.windows = {**MODEL_CONTEXT_WINDOWS, **(windows or {})}
+        # 按前缀长度倒序，保证最长前缀优先匹配
+        self._prefixes = sorted(self.windows, key=len, reverse=True)
+        self.max_models = max_models
+        # 模型名称由客户端提供，按 LRU 限制缓存大小
+        self._resolved: "OrderedDict[str, int]" = OrderedDict()
+        self._stats = {"trimmed_requests": 0, "dropped_messages": 0}
+
+    def window_for(self, model: str) -> int:
+        """
+        获取模型的上下文窗口
+
+        Args:
+            model: 模型名称
+
+        Returns:
+            上下文窗口(token)
+        """
+        window = self._resolved.get(model)
+        if window is not None:
+            self._resolved.move_to_end(model)
+            return window
+        name = model.rsplit("/", 1)[-1].lower()
+        window = next(
+            (self.windows[p] for p in self._prefixes if name.startswith(p)),
+            self.default_window,
+        )
+        self._resolved[model] = window
+        if len(self._resolved) > self.max_models:
+            self._resolved.popitem(last=False)
+        return window
+
+    def fit(
+        self,
+        model: str,
+        messages: List[Message],
+        system_indexes: Optional[List[int]] = None,
+    ) -> List[Message]:
+        """
+        裁剪消息历史使其不超过模型窗口
+
+        系统消息始终保留；其余消息从最新往前累加，超出预算时停止，不再计数更早的消息，
+        并保证保留部分从用户消息开始，不留下没有提问的助手回复
+
+        Args:
+            model: 模型名称
+            messages: 完整消息历史
+            system_indexes: 系统消息的位置，为空时扫描消息历史得到
+
+        Returns:
+            裁剪后的消息列表，未超出时返回原列表
+
+        Raises:
+            ContextOverflowError: 系统提示与最新一条消息已超出窗口
+        """
+        if system_indexes is None:
+            system_indexes = [
+                i for i, msg in enumerate(messages) if msg.role == "system"
+            ]
+        count = self.counter.count_message
+        remaining = self.window_for(model) - self.reserve_tokens - REPLY_OVERHEAD
+        remaining -= sum(count(messages[i]) for i in system_indexes)
+        systems = set(system_indexes)
+        # 只计数最终保留的消息及第一条放不下的消息，每轮的开销与保留部分成正比
+        start = len(messages)
+        for index in range(len(messages) - 1, -1, -1):
+            if index in systems:
+                continue
+            tokens = count(messages[index])
+            if tokens > remaining:
+                break
+            remaining -= tokens
+            start = index
+        else:
+            if remaining >= 0:
+                return messages
+
+        while start < len(messages) and messages[start].role != "user":
+            start += 1
+        if start >= len(messages):
+            raise ContextOverflowError(
+                f"消息长度超出模型 {model} 的上下文窗口({self.window_for(model)} tokens)"
+            )
+
+        kept = [messages[i] for i in system_indexes if i < start]
+        kept.extend(messages[start:])
+        self._stats["trimmed_requests"] += 1
+        self._stats["dropped_messages"] += len(messages) - len(kept)
+        return kept
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "counter": self.counter.stats}
+
+
+@lru_cache()
+def get_context_window() -> Optional[ContextWindow]:
+    """获取全局上下文窗口管理，未启用裁剪时返回None"""
+    config = get_settings().chat
+    if not config.CONTEXT_TRIM_ENABLED:
+        return None
+    return ContextWindow(
+        counter=TokenCounter(config.CONTEXT_CACHE_ENTRIES),
+        reserve_tokens=config.CONTEXT_RESERVE_TOKENS,
+        default_window=config.CONTEXT_DEFAULT_WINDOW,
+        windows=config.CONTEXT_WINDOWS,
+    )
@@ -0,0 +1,173 @@
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict
+from app.core.setting import get_settings
+
+
+class LatencyTracker:
+    """
+    最近延迟样本的滑动窗口，用于估计指定分位数的延迟
+    """
+
+    def __init__(self, window: int = 256, refresh_every: int = 16):
+        """
+        初始化延迟窗口
+
+        Args:
+            window: 保留的样本数
+            refresh_every: 每新增多少个样本重新计算一次分位数
+        """
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._refresh_every = refresh_every
+        self._pending = 0
+        self._sorted: list = []
+
+    def observe(self, latency: float) -> None:
+        """记录一个延迟样本"""
+        self._samples.append(latency)
+        self._pending += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        获取延迟分位数
+
+        Args:
+            q: 分位数，取值 0~1
+
+        Returns:
+            对应分位数的延迟(秒)
+        """
+        if self._pending >= self._refresh_every or len(self._sorted) != len(
+            self._samples
+        ):
+            self._sorted = sorted(self._samples)
+            self._pending = 0
+        index = min(len(self._sorted) - 1, int(q * len(self._sorted)))
+        return self._sorted[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class HedgePolicy:
+    """
+    对冲请求策略
+
+    主请求在指定分位数延迟内没有响应(流式为没有首个内容片段)时，向另一个上游发送
+    对冲请求，先返回者胜出。对冲受全局预算约束：每个请求积累 budget_ratio 个令牌，
+    每次对冲消耗一个令牌，因此对冲请求占比不会超过 budget_ratio
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay: float = 0.2,
+        max_delay: float = 10.0,
+        default_delay: float = 2.0,
+        min_samples: int = 20,
+        budget_ratio: float = 0.1,
+        budget_burst: float = 10.0,
+    ):
+        """
+        初始化对冲策略
+
+        Args:
+            percentile: 计算对冲延迟使用的分位数
+            min_delay: 对冲延迟下限(秒)
+            max_delay: 对冲延迟上限(秒)
+            default_delay: 样本不足时使用的对冲延迟(秒)
+            min_samples: 开始使用分位数前需要的最少样本数
+            budget_ratio: 对冲请求占全部请求的最大比例
+            budget_burst: 对冲预算的最大积累量
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self._tokens = budget_burst
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "budget_denied": 0,
+        }
+
+    def _tracker(self, kind: str) -> LatencyTracker:
+        tracker = self._trackers.get(kind)
+        if tracker is None:
+            tracker = self._trackers[kind] = LatencyTracker()
+        return tracker
+
+    def delay(self, kind: str) -> float:
+        """
+        获取发起对冲前的等待时间，并为对冲预算积累令牌
+
+        Args:
+            kind: 请求类型，如 "completion" 或 "stream"(首个内容片段)
+
+        Returns:
+            等待秒数
+        """
+        self._stats["requests"] += 1
+        self._tokens = min(self.budget_burst, self._tokens + self.budget_ratio)
+        tracker = self._tracker(kind)
+        if len(tracker) < self.min_samples:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, tracker.percentile(self.percentile)))
+
+    def observe(self, kind: str, latency: float) -> None:
+        """
+        记录胜出请求的延迟
+
+        Args:
+            kind: 请求类型
+            latency: 延迟(秒)
+        """
+        self._tracker(kind).observe(latency)
+
+    def try_hedge(self) -> bool:
+        """
+        申请发起一次对冲
+
+        Returns:
+            预算充足时返回True
+        """
+        if self._tokens < 1.0:
+            self._stats["budget_denied"] += 1
+            return False
+        self._tokens -= 1.0
+        self._stats["hedged"] += 1
+        return True
+
+    def record_hedge_win(self) -> None:
+        """记录一次对冲请求胜出"""
+        self._stats["hedge_wins"] += 1
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "budget": round(self._tokens, 2),
+            "delays": {
+                kind: round(tracker.percentile(self.percentile), 4)
+                for kind, tracker in self._trackers.items()
+                if len(tracker)
+            },
+        }
+
+
+@lru_cache()
+def get_hedge_policy() -> HedgePolicy:
+    """获取全局对冲策略，所有代理共享同一份预算"""
+    config = get_settings().chat
+    return HedgePolicy(
+        percentile=config.HEDGE_PERCENTILE,
+        min_delay=config.HEDGE_MIN_DELAY,
+        max_delay=config.HEDGE_MAX_DELAY,
+        default_delay=config.HEDGE_DEFAULT_DELAY,
+        budget_ratio=config.HEDGE_BUDGET_RATIO,
+    )
@@ -0,0 +1,150 @@
+from typing import Dict, Optional
+import httpx
+from app.core.setting import get_settings, ChatConfig
+
+# HTTP/2 依赖 h2 包，未安装时退回 HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class UpstreamPool:
+    """
+    上游连接池 - 每个上游地址复用一个长连接客户端
+
+    避免每次聊天请求都重新进行 DNS 解析、TCP 及 TLS 握手
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+        write_timeout: float = 10.0,
+        pool_timeout: float = 10.0,
+        http2: bool = True,
+    ):
+        """
+        初始化连接池
+
+        Args:
+            max_connections: 每个上游的最大连接数
+            max_keepalive_connections: 每个上游保持的空闲长连接数
+            keepalive_expiry: 空闲长连接的过期时间(秒)
+            connect_timeout: 建立连接超时时间(秒)
+            read_timeout: 读取响应超时时间(秒)
+            write_timeout: 发送请求超时时间(秒)
+            pool_timeout: 等待连接池空闲连接的超时时间(秒)
+            http2: 是否启用 HTTP/2
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=write_timeout,
+            pool=pool_timeout,
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._sync_clients: Dict[str, httpx.Client] = {}
+
+    @classmethod
+    def from_config(cls, config: ChatConfig) -> "UpstreamPool":
+        """根据聊天配置创建连接池"""
+        return cls(
+            max_connections=config.POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=config.POOL_MAX_KEEPALIVE,
+            keepalive_expiry=config.POOL_KEEPALIVE_EXPIRY,
+            connect_timeout=config.CONNECT_TIMEOUT,
+            read_timeout=config.READ_TIMEOUT,
+            write_timeout=config.WRITE_TIMEOUT,
+            pool_timeout=config.POOL_TIMEOUT,
+            http2=config.HTTP2,
+        )
+
+    def get_client(self, base_url: str) -> httpx.AsyncClient:
+        """
+        获取上游对应的异步客户端，不存在时创建
+
+        Args:
+            base_url: 上游基础URL
+
+        Returns:
+            复用的异步客户端
+        """
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self.limits, timeout=self.timeout, http2=self.http2
+            )
+            self._clients[base_url] = client
+        return client
+
+    def get_sync_client(self, base_url: str) -> httpx.Client:
+        """
+        获取上游对应的同步客户端，供同步调用路径使用
+
+        Args:
+            base_url: 上游基础URL
+
+        Returns:
+            复用的同步客户端
+        """
+        client = self._sync_clients.get(base_url)
+        if client is None or client.is_closed:
+            client = httpx.Client(
+                limits=self.limits, timeout=self.timeout, http2=self.http2
+            )
+            self._sync_clients[base_url] = client
+        return client
+
+    async def aclose(self) -> None:
+        """关闭所有客户端并释放连接"""
+        clients, self._clients = self._clients, {}
+        sync_clients, self._sync_clients = self._sync_clients, {}
+        for client in clients.values():
+            await client.aclose()
+        for sync_client in sync_clients.values():
+            sync_client.close()
+
+
+_pool: Optional[UpstreamPool] = None
+
+
+def init_upstream_pool(config: Optional[ChatConfig] = None) -> UpstreamPool:
+    """
+    创建全局连接池，在应用生命周期启动时调用
+
+    Args:
+        config: 聊天配置，默认读取全局配置
+
+    Returns:
+        全局连接池
+    """
+    global _pool
+    _pool = UpstreamPool.from_config(config or get_settings().chat)
+    return _pool
+
+
+def get_upstream_pool() -> UpstreamPool:
+    """获取全局连接池，未初始化时(如脚本中直接使用代理)按配置懒加载"""
+    if _pool is None:
+        return init_upstream_pool()
+    return _pool
+
+
+async def close_upstream_pool() -> None:
+    """关闭全局连接池，在应用生命周期结束时调用"""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.aclose()
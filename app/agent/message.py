@@ -0,0 +1,136 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+import sys
+import orjson
+
+
+class Message:
+    """
+    聊天消息 - 使用 __slots__ 保存，角色字符串驻留以共享同一对象
+
+    支持 msg["role"] / msg["content"] 的字典式读取，兼容原有的字典消息写法；
+    JSON 片段和 token 数在首次使用时计算并缓存，消息内容不可修改
+    """
+
+    __slots__ = ("role", "content", "tokens", "_json")
+
+    def __init__(self, role: str, content: str):
+        self.role = sys.intern(role)
+        self.content = content
+        # 由上下文窗口管理填充的 token 数
+        self.tokens: Optional[int] = None
+        self._json: Optional[bytes] = None
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def to_dict(self) -> Dict[str, str]:
+        """转换为 OpenAI 格式的消息字典"""
+        return {"role": self.role, "content": self.content}
+
+    def to_json(self) -> bytes:
+        """获取消息的 JSON 片段(已缓存)"""
+        if self._json is None:
+            self._json = orjson.dumps({"role": self.role, "content": self.content})
+        return self._json
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content[:30]!r})"
+
+
+class MessageHistory:
+    """
+    消息历史 - 记录系统消息的位置，判断是否已有系统提示为 O(1)
+    """
+
+    __slots__ = ("_items", "system_indexes")
+
+    def __init__(
+        self,
+        messages: Iterable[Message] = (),
+        system_indexes: Optional[List[int]] = None,
+    ):
+        """
+        初始化消息历史
+
+        Args:
+            messages: 初始消息，会复用传入的消息对象而不复制内容
+            system_indexes: 初始消息中系统消息的位置，调用方已知时传入可免去扫描
+        """
+        self._items: List[Message] = list(messages)
+        if system_indexes is None:
+            system_indexes = [
+                i for i, msg in enumerate(self._items) if msg.role == "system"
+            ]
+        self.system_indexes: List[int] = list(system_indexes)
+
+    @property
+    def system_index(self) -> Optional[int]:
+        """首条系统消息的位置"""
+        return self.system_indexes[0] if self.system_indexes else None
+
+    @property
+    def has_system(self) -> bool:
+        return bool(self.system_indexes)
+
+    def append(self, message: Message) -> None:
+        """追加一条消息"""
+        if message.role == "system":
+            self.system_indexes.append(len(self._items))
+        self._items.append(message)
+
+    def add(self, role: str, content: str) -> Message:
+        """
+        按角色和内容追加消息
+
+        Returns:
+            新消息
+        """
+        message = Message(role, content)
+        self.append(message)
+        return message
+
+    def by_role(self, role: str) -> Iterator[Message]:
+        """按角色迭代消息"""
+        role = sys.intern(role)
+        # 角色已驻留，使用 is 比较即可
+        return (msg for msg in self._items if msg.role is role)
+
+    def to_dicts(self) -> List[Dict[str, str]]:
+        """转换为消息字典列表"""
+        return [msg.to_dict() for msg in self._items]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Message, List[Message]]:
+        return self._items[index]
+
+
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    """
+    序列化上游请求体，消息部分直接拼接各消息缓存的 JSON 片段
+
+    Args:
+        payload: 请求数据，messages 可以是 Message 或字典
+
+    Returns:
+        JSON 字节串
+    """
+    rest = {key: value for key, value in payload.items() if key != "messages"}
+    fragments = b",".join(
+        msg.to_json() if isinstance(msg, Message) else orjson.dumps(msg)
+        for msg in payload.get("messages", ())
+    )
+    head = orjson.dumps(rest)[:-1]
+    separator = b"," if rest else b""
+    return head + separator + b'"messages":[' + fragments + b"]}"
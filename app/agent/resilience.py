@@ -0,0 +1,409 @@
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from enum import Enum
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+import asyncio
+import time
+from app.core.setting import get_settings, ChatConfig
+from .base import RetryPolicy
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被快速拒绝"""
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """上游并发已达上限且排队超时，请求被快速拒绝"""
+
+
+class CircuitState(str, Enum):
+    """熔断器状态枚举"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    熔断器 - 连续失败达到阈值后打开，冷却后放行少量探测请求
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold: 触发熔断的连续失败次数
+            recovery_time: 打开状态持续时间(秒)，之后进入半开状态
+            half_open_max_calls: 半开状态下允许同时进行的探测请求数
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._stats = {"rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> CircuitState:
+        """当前状态，打开状态冷却结束后自动转为半开"""
+        if (
+            self._state is CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.recovery_time
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """
+        请求前检查
+
+        Raises:
+            CircuitOpenError: 熔断器打开或半开探测名额已满
+        """
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return
+        if (
+            state is CircuitState.HALF_OPEN
+            and self._half_open_calls < self.half_open_max_calls
+        ):
+            self._half_open_calls += 1
+            return
+        self._stats["rejected"] += 1
+        raise CircuitOpenError("上游熔断中，请稍后重试")
+
+    def record_success(self) -> None:
+        """记录一次成功调用"""
+        self._failures = 0
+        if self._state is CircuitState.HALF_OPEN:
+            self._state = CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        """记录一次上游失败"""
+        self._failures += 1
+        if (
+            self._state is CircuitState.HALF_OPEN
+            or self._failures >= self.failure_threshold
+        ):
+            self._trip()
+
+    def release(self) -> None:
+        """调用既未成功也未失败(如被取消)时归还半开探测名额"""
+        if self._state is CircuitState.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def _trip(self) -> None:
+        if self._state is not CircuitState.OPEN:
+            self._stats["opened"] += 1
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self._failures,
+            **self._stats,
+        }
+
+
+def _in_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    """当前线程是否正在运行指定的事件循环"""
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class AdaptiveLimiter:
+    """
+    自适应并发限制器(AIMD + 延迟梯度)
+
+    比较短期与长期的延迟均值：短期延迟没有明显升高时并发上限缓慢增加，
+    明显升高或上游失败时按比例收缩。长期均值已包含不同输出长度的混合，
+    因此长回复本身不会被误判为过载。超出上限的请求短暂排队，排队超时则快速失败
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 20,
+        min_limit: float = 1,
+        max_limit: float = 200,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.9,
+        queue_timeout: float = 1.0,
+        short_alpha: float = 0.2,
+        long_alpha: float = 0.01,
+    ):
+        """
+        初始化限制器
+
+        Args:
+            initial_limit: 初始并发上限
+            min_limit: 并发上限的最小值
+            max_limit: 并发上限的最大值
+            latency_tolerance: 短期延迟超过长期延迟的倍数时视为过载
+            backoff_ratio: 过载时并发上限的收缩比例
+            queue_timeout: 等待并发名额的最长时间(秒)
+            short_alpha: 短期延迟均值的平滑系数
+            long_alpha: 长期延迟均值的平滑系数
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.queue_timeout = queue_timeout
+        self.short_alpha = short_alpha
+        self.long_alpha = long_alpha
+        self._inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._short_latency: Optional[float] = None
+        self._long_latency: Optional[float] = None
+        self._stats = {"rejected": 0}
+
+    async def acquire(self) -> None:
+        """
+        获取一个并发名额
+
+        Raises:
+            ConcurrencyLimitExceeded: 排队超时
+        """
+        if self._inflight < int(self.limit) and not self._waiters:
+            self._inflight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # 名额由 release 直接转交，转交时已计入 _inflight
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self._stats["rejected"] += 1
+            raise ConcurrencyLimitExceeded("上游并发已达上限，请稍后重试")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 名额已转交但调用方被取消，需要归还
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+
+    def try_acquire(self) -> None:
+        """
+        不排队地获取一个并发名额，供无法等待事件循环的同步调用使用
+
+        Raises:
+            ConcurrencyLimitExceeded: 当前没有空闲名额
+        """
+        if self._inflight < int(self.limit) and not self._waiters:
+            self._inflight += 1
+            return
+        self._stats["rejected"] += 1
+        raise ConcurrencyLimitExceeded("上游并发已达上限，请稍后重试")
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """
+        归还并发名额并根据本次结果调整上限
+
+        Args:
+            latency: 本次调用的延迟(秒)，为空时不调整上限
+            overloaded: 本次调用是否出现了过载信号(超时、429、5xx等)
+        """
+        self._inflight -= 1
+        if overloaded:
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        elif latency is not None:
+            self._observe(latency)
+        self._wake_waiters()
+
+    def _observe(self, latency: float) -> None:
+        if self._short_latency is None:
+            self._short_latency = self._long_latency = latency
+            return
+        self._short_latency += self.short_alpha * (latency - self._short_latency)
+        self._long_latency += self.long_alpha * (latency - self._long_latency)
+
+        if self._short_latency > self._long_latency * self.latency_tolerance:
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        elif self._inflight + 1 >= int(self.limit):
+            # 只有接近上限时才增加，避免空闲期间上限无限增长
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._inflight < int(self.limit):
+            loop = self._waiters[0].get_loop()
+            if not _in_loop(loop):
+                # 同步调用在其他线程归还名额时，转交给等待者所在的事件循环唤醒
+                loop.call_soon_threadsafe(self._wake_waiters)
+                return
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._inflight += 1
+                waiter.set_result(None)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self._inflight,
+            "queued": len(self._waiters),
+            "short_latency": self._short_latency,
+            "long_latency": self._long_latency,
+            **self._stats,
+        }
+
+
+class UpstreamCall:
+    """一次受保护的上游调用，用于标记首字节到达时间"""
+
+    __slots__ = ("started", "latency")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.latency: Optional[float] = None
+
+    def mark_response(self) -> None:
+        """上游响应头到达时调用，以首字节延迟作为并发调整依据"""
+        if self.latency is None:
+            self.latency = time.monotonic() - self.started
+
+
+class UpstreamGuard:
+    """
+    单个上游的保护组合：熔断器 + 自适应并发限制器
+    """
+
+    # 只用于判断异常是否属于上游故障，不参与重试
+    _classifier = RetryPolicy()
+
+    def __init__(self, breaker: CircuitBreaker, limiter: AdaptiveLimiter):
+        self.breaker = breaker
+        self.limiter = limiter
+
+    @classmethod
+    def from_config(cls, config: ChatConfig) -> "UpstreamGuard":
+        """根据聊天配置创建保护组合"""
+        return cls(
+            breaker=CircuitBreaker(
+                failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+                recovery_time=config.BREAKER_RECOVERY_TIME,
+                half_open_max_calls=config.BREAKER_HALF_OPEN_CALLS,
+            ),
+            limiter=AdaptiveLimiter(
+                initial_limit=config.LIMIT_INITIAL,
+                min_limit=config.LIMIT_MIN,
+                max_limit=config.LIMIT_MAX,
+                latency_tolerance=config.LIMIT_LATENCY_TOLERANCE,
+                queue_timeout=config.LIMIT_QUEUE_TIMEOUT,
+            ),
+        )
+
+    @asynccontextmanager
+    async def call(self) -> AsyncIterator[UpstreamCall]:
+        """
+        保护一次上游调用
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            ConcurrencyLimitExceeded: 并发名额排队超时
+        """
+        self.breaker.before_call()
+        try:
+            await self.limiter.acquire()
+        except ConcurrencyLimitExceeded:
+            self.breaker.release()
+            raise
+
+        call = UpstreamCall()
+        with self._settle(call):
+            yield call
+
+    @contextmanager
+    def call_sync(self) -> Iterator[UpstreamCall]:
+        """
+        保护一次同步上游调用，并发名额不足时不排队直接失败
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            ConcurrencyLimitExceeded: 没有空闲的并发名额
+        """
+        self.breaker.before_call()
+        try:
+            self.limiter.try_acquire()
+        except ConcurrencyLimitExceeded:
+            self.breaker.release()
+            raise
+
+        call = UpstreamCall()
+        with self._settle(call):
+            yield call
+
+    @contextmanager
+    def _settle(self, call: UpstreamCall) -> Iterator[None]:
+        """根据调用结果更新熔断器并归还并发名额"""
+        try:
+            yield
+        except Exception as e:
+            if self._classifier.classify(e)[0]:
+                self.breaker.record_failure()
+                self.limiter.release(overloaded=True)
+            else:
+                # 参数错误等客户端问题不代表上游不健康
+                self.breaker.release()
+                self.limiter.release()
+            raise
+        except BaseException:
+            # 调用方取消时不影响熔断和并发上限的判断
+            self.breaker.release()
+            self.limiter.release()
+            raise
+        else:
+            self.breaker.record_success()
+            self.limiter.release(
+                latency=call.latency or time.monotonic() - call.started
+            )
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {"breaker": self.breaker.stats, "limiter": self.limiter.stats}
+
+
+_guards: Dict[str, UpstreamGuard] = {}
+
+
+def get_upstream_guard(base_url: str) -> UpstreamGuard:
+    """
+    获取上游对应的保护组合，不存在时按配置创建
+
+    Args:
+        base_url: 上游基础URL
+
+    Returns:
+        上游保护组合
+    """
+    guard = _guards.get(base_url)
+    if guard is None:
+        guard = _guards[base_url] = UpstreamGuard.from_config(get_settings().chat)
+    return guard
+
+
+def get_upstream_guard_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有上游的熔断与并发统计"""
+    return {base_url: guard.stats for base_url, guard in _guards.items()}
@@ -0,0 +1,304 @@
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import asyncio
+import os
+import time
+import uuid
+import weakref
+import orjson
+from app.core.setting import get_settings, SessionConfig
+from .message import Message, MessageHistory
+
+
+class Session:
+    """
+    服务端会话 - 以 Message 对象紧凑保存消息历史，跨轮次复用其 JSON 片段和 token 数
+
+    同一会话的多轮请求通过 lock 串行执行，保证历史顺序一致；
+    lock 由 SessionStore 按会话ID分配，会话被淘汰后重新加载仍使用同一个锁
+    """
+
+    __slots__ = (
+        "id",
+        "model",
+        "history",
+        "system_indexes",
+        "size",
+        "created_at",
+        "updated_at",
+        "lock",
+    )
+
+    def __init__(
+        self,
+        model: str,
+        session_id: Optional[str] = None,
+        created_at: Optional[float] = None,
+        lock: Optional[asyncio.Lock] = None,
+    ):
+        self.id = session_id or f"sess_{uuid.uuid4().hex}"
+        self.model = model
+        self.history: List[Message] = []
+        # 系统消息的位置，随消息追加维护，创建消息历史时无需重新扫描
+        self.system_indexes: List[int] = []
+        # 消息内容的 UTF-8 字节数，用于内存上限计算
+        self.size = 0
+        self.created_at = created_at or time.time()
+        self.updated_at = self.created_at
+        self.lock = lock or asyncio.Lock()
+
+    def extend(self, messages: Iterable[Message]) -> None:
+        """
+        追加消息
+
+        Args:
+            messages: 新消息
+        """
+        for msg in messages:
+            if msg.role == "system":
+                self.system_indexes.append(len(self.history))
+            self.history.append(msg)
+            self.size += len(msg.content.encode("utf-8"))
+        self.updated_at = time.time()
+
+    def to_history(self) -> MessageHistory:
+        """创建供 ChatAgent 使用的消息历史，复用会话中的消息对象"""
+        return MessageHistory(self.history, self.system_indexes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为接口返回的字典"""
+        return {
+            "session_id": self.id,
+            "model": self.model,
+            "messages": [msg.to_dict() for msg in self.history],
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class SessionStore:
+    """
+    会话存储 - 内存 LRU，按会话数与总字节数双重限制淘汰
+
+    启用持久化时每个会话对应一个 JSONL 文件，每轮只追加新消息；
+    被淘汰或进程重启后的会话在下次访问时从文件恢复；正在进行中(持有锁)的会话不会被淘汰
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: float = 86400.0,
+        persist_dir: Optional[str] = None,
+    ):
+        """
+        初始化会话存储
+
+        Args:
+            max_sessions: 内存中保留的最大会话数
+            max_bytes: 内存中所有会话消息内容的最大总字节数
+            ttl: 会话空闲过期时间(秒)
+            persist_dir: 持久化目录，为空时只保存在内存中
+        """
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        if self.persist_dir:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # 会话ID到锁的弱引用映射，只要还有请求持有或等待锁，重新加载的会话就复用它
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._bytes = 0
+        self._stats = {"created": 0, "loaded": 0, "evicted": 0, "expired": 0}
+
+    async def create(self, model: str, system_prompt: Optional[str] = None) -> Session:
+        """
+        创建会话
+
+        Args:
+            model: 会话使用的模型
+            system_prompt: 系统提示，为空时不添加
+
+        Returns:
+            新会话
+        """
+        session = Session(model)
+        self._locks[session.id] = session.lock
+        self._stats["created"] += 1
+        if self.persist_dir:
+            header = orjson.dumps(
+                {"model": session.model, "created_at": session.created_at}
+            )
+            await asyncio.to_thread(self._append_file, session.id, [header])
+        self._put(session)
+        if system_prompt:
+            await self.append(session, [Message("system", system_prompt)])
+        return session
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        """
+        获取会话，内存未命中时尝试从持久化文件恢复
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            会话，不存在或已过期时返回None
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            if time.time() - session.updated_at > self.ttl:
+                self._stats["expired"] += 1
+                await self.delete(session_id)
+                return None
+            self._sessions.move_to_end(session_id)
+            return session
+
+        if not self.persist_dir or not self._valid_id(session_id):
+            return None
+        session = await asyncio.to_thread(self._load_file, session_id)
+        if session is None:
+            return None
+        # 读取文件期间其他请求可能已经加载了同一会话，保证内存中只有一个会话对象
+        loaded = self._sessions.get(session_id)
+        if loaded is not None:
+            return loaded
+        lock = self._locks.get(session_id)
+        if lock is None:
+            self._locks[session_id] = session.lock
+        else:
+            session.lock = lock
+        self._stats["loaded"] += 1
+        self._put(session)
+        return session
+
+    async def append(self, session: Session, messages: List[Message]) -> None:
+        """
+        向会话追加消息，启用持久化时同时追加到文件
+
+        Args:
+            session: 会话
+            messages: 新消息
+        """
+        before = session.size
+        session.extend(messages)
+        if session.id in self._sessions:
+            self._bytes += session.size - before
+            self._sessions.move_to_end(session.id)
+            self._evict()
+        if self.persist_dir:
+            lines = [orjson.dumps([msg.role, msg.content]) for msg in messages]
+            await asyncio.to_thread(self._append_file, session.id, lines)
+
+    async def delete(self, session_id: str) -> bool:
+        """
+        删除会话及其持久化文件
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            会话存在时返回True
+        """
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size
+        removed = session is not None
+        if self.persist_dir and self._valid_id(session_id):
+            path = self._path(session_id)
+            if path.exists():
+                await asyncio.to_thread(path.unlink, missing_ok=True)
+                removed = True
+        return removed
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取会话统计信息
+
+        Returns:
+            内存中会话数、总字节数及累计计数
+        """
+        return {**self._stats, "sessions": len(self._sessions), "bytes": self._bytes}
+
+    def _put(self, session: Session) -> None:
+        self._sessions[session.id] = session
+        self._bytes += session.size
+        self._evict()
+
+    def _evict(self) -> None:
+        count, size = len(self._sessions), self._bytes
+        if count <= self.max_sessions and size <= self.max_bytes:
+            return
+        victims = []
+        newest = next(reversed(self._sessions))
+        # 至少保留最近使用的一个会话，即使它本身超过字节上限；
+        # 持有锁的会话正在进行一轮对话，淘汰后再加载会得到过期的历史，因此跳过
+        for session_id, session in self._sessions.items():
+            if session_id == newest or (
+                count <= self.max_sessions and size <= self.max_bytes
+            ):
+                break
+            if session.lock.locked():
+                continue
+            victims.append(session_id)
+            count -= 1
+            size -= session.size
+        for session_id in victims:
+            self._bytes -= self._sessions.pop(session_id).size
+            self._stats["evicted"] += 1
+
+    @staticmethod
+    def _valid_id(session_id: str) -> bool:
+        # 防止通过会话ID访问持久化目录之外的文件
+        return session_id.startswith("sess_") and session_id[5:].isalnum()
+
+    def _path(self, session_id: str) -> Path:
+        return self.persist_dir / f"{session_id}.jsonl"
+
+    def _append_file(self, session_id: str, lines: List[bytes]) -> None:
+        with open(self._path(session_id), "ab") as f:
+            f.write(b"".join(line + b"\n" for line in lines))
+
+    def _load_file(self, session_id: str) -> Optional[Session]:
+        path = self._path(session_id)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                self._stats["expired"] += 1
+                return None
+            lines = path.read_bytes().splitlines()
+            header = orjson.loads(lines[0])
+            session = Session(header["model"], session_id, header["created_at"])
+        except (OSError, IndexError, KeyError, ValueError):
+            # 文件不存在或头部损坏时视为会话不存在
+            return None
+
+        messages = []
+        for line in lines[1:]:
+            try:
+                role, content = orjson.loads(line)
+            except (TypeError, ValueError):
+                # 进程中断可能留下半行，忽略即可
+                continue
+            messages.append(Message(role, content))
+        session.extend(messages)
+        session.updated_at = os.path.getmtime(path)
+        return session
+
+
+@lru_cache()
+def get_session_store() -> SessionStore:
+    """获取全局会话存储单例"""
+    config: SessionConfig = get_settings().session
+    return SessionStore(
+        max_sessions=config.MAX_SESSIONS,
+        max_bytes=config.MAX_BYTES,
+        ttl=config.TTL,
+        persist_dir=config.PERSIST_DIR or None,
+    )
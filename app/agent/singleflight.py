@@ -0,0 +1,201 @@
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+import asyncio
+import inspect
+from app.core.setting import get_settings
+
+T = TypeVar("T")
+
+# 流式片段推送函数，等待期间上游读取被暂停(背压)
+Emit = Callable[[str], Awaitable[None]]
+
+# 订阅者队列结束标记
+_STREAM_END = object()
+
+
+async def _deliver(callback: Optional[Callable[[str], Any]], chunk: str) -> None:
+    """调用订阅者的片段回调，返回可等待对象时等待其完成"""
+    if callback:
+        ret = callback(chunk)
+        if inspect.isawaitable(ret):
+            await ret
+
+
+class _StreamCall:
+    """
+    一次共享的上游流式调用
+
+    每个订阅者一个有界队列，推送片段时等待所有队列都有空位，最慢的订阅者决定上游读取速度；
+    最后一个订阅者离开时取消上游调用
+    """
+
+    __slots__ = ("task", "subscribers", "started", "finished", "queue_size")
+
+    def __init__(self, queue_size: int):
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers: "set[asyncio.Queue]" = set()
+        # 已推送过片段后不再接受新的订阅者，因此无需保留片段用于回放
+        self.started = False
+        self.finished = False
+        self.queue_size = queue_size
+
+    @property
+    def joinable(self) -> bool:
+        return not self.started and not self.task.done()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """订阅者离开，最后一个订阅者离开时取消仍在进行的上游调用"""
+        self.subscribers.discard(queue)
+        # 清空队列，使阻塞在该队列上的推送继续执行
+        while not queue.empty():
+            queue.get_nowait()
+        if not self.subscribers and not self.task.done():
+            self.task.cancel()
+
+    async def emit(self, chunk: str) -> None:
+        """向所有订阅者推送一个片段"""
+        self.started = True
+        for queue in tuple(self.subscribers):
+            await queue.put(chunk)
+
+    def finish(self, _task: Any = None) -> None:
+        """上游调用结束(无论成功与否)，唤醒空闲的订阅者"""
+        self.finished = True
+        for queue in self.subscribers:
+            # 队列已满时订阅者取完剩余片段后会发现调用已结束，无需结束标记
+            if not queue.full():
+                queue.put_nowait(_STREAM_END)
+
+
+class SingleFlight:
+    """
+    请求合并(single-flight) - 相同的并发请求只访问一次上游
+
+    非流式调用共享同一个结果；流式调用由一个上游流扇出给所有订阅者，
+    只有在上游产出第一个片段之前到达的请求才会加入，之后到达的请求独立访问上游
+    """
+
+    def __init__(self, stream_queue_size: int = 256):
+        """
+        初始化请求合并器
+
+        Args:
+            stream_queue_size: 流式调用中每个订阅者缓冲队列的最大长度
+        """
+        self.stream_queue_size = stream_queue_size
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _StreamCall] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "uncoalesced": 0}
+
+    async def do(
+        self, key: str, func: Callable[[], Awaitable[T]]
+    ) -> Tuple[T, bool]:
+        """
+        执行或加入一次非流式调用
+
+        Args:
+            key: 请求键，相同键的并发调用会被合并
+            func: 实际执行调用的协程函数
+
+        Returns:
+            (调用结果, 是否复用了其他请求的调用)
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self._stats["coalesced"] += 1
+        else:
+            self._stats["leaders"] += 1
+            # 上游调用独立于发起者运行，发起者断开不会影响其他等待者
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(self._calls, key, t))
+        return await asyncio.shield(task), shared
+
+    async def stream(
+        self,
+        key: str,
+        producer: Callable[[Emit], Awaitable[T]],
+        callback: Optional[Callable[[str], Any]] = None,
+    ) -> Tuple[T, bool]:
+        """
+        执行或订阅一次流式调用
+
+        订阅者的回调变慢时共享的上游读取随之暂停；订阅者被取消(如客户端断开)时退出订阅，
+        最后一个订阅者离开时取消上游调用
+
+        Args:
+            key: 请求键，相同键的并发调用会被合并
+            producer: 实际执行上游流式调用的协程函数，接收片段推送函数
+            callback: 当前订阅者的片段回调，返回可等待对象时会被等待
+
+        Returns:
+            (调用结果, 是否复用了其他请求的调用)
+        """
+        call = self._streams.get(key)
+        if call is not None and not call.joinable:
+            # 共享的流已经开始输出，晚到的请求不回放已输出的片段，直接独立访问上游
+            self._stats["uncoalesced"] += 1
+
+            async def emit(chunk: str) -> None:
+                await _deliver(callback, chunk)
+
+            return await producer(emit), False
+        shared = call is not None
+        if shared:
+            self._stats["coalesced"] += 1
+        else:
+            self._stats["leaders"] += 1
+            call = _StreamCall(self.stream_queue_size)
+            call.task = asyncio.ensure_future(producer(call.emit))
+            self._streams[key] = call
+            call.task.add_done_callback(call.finish)
+            call.task.add_done_callback(
+                lambda t: self._forget(self._streams, key, call)
+            )
+
+        queue = call.subscribe()
+        try:
+            while not (call.finished and queue.empty()):
+                chunk = await queue.get()
+                if chunk is _STREAM_END:
+                    break
+                await _deliver(callback, chunk)
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.unsubscribe(queue)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        获取合并统计信息
+
+        Returns:
+            发起调用数、被合并的请求数、因流已开始输出而未合并的请求数及当前进行中的调用数
+        """
+        return {
+            **self._stats,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
+
+    @staticmethod
+    def _forget(calls: Dict[str, Any], key: str, value: Any) -> None:
+        task = value.task if isinstance(value, _StreamCall) else value
+        if calls.get(key) is value:
+            del calls[key]
+        # 读取异常，避免无人等待时出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+
+@lru_cache()
+def get_single_flight() -> Optional[SingleFlight]:
+    """获取全局请求合并器单例，未启用时返回None"""
+    if not get_settings().chat.COALESCE_ENABLED:
+        return None
+    return SingleFlight()
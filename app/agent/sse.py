@@ -0,0 +1,210 @@
+from typing import Any, Dict, List, Optional
+import orjson
+
+# SSE 事件中表示流结束的数据
+DONE_MARKER = b"[DONE]"
+
+
+class ContentBuilder:
+    """
+    内容拼接器 - 收集片段并在最后一次性拼接，避免字符串反复相加带来的二次复杂度
+    """
+
+    __slots__ = ("_parts", "_length")
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._length = 0
+
+    def append(self, part: str) -> None:
+        """追加一个内容片段"""
+        self._parts.append(part)
+        self._length += len(part)
+
+    def getvalue(self) -> str:
+        """获取拼接后的完整内容"""
+        if len(self._parts) > 1:
+            # 合并后只保留一个片段，重复调用不会重新拼接
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+
+class SSEDecoder:
+    """
+    增量 SSE 解码器 - 直接处理原始字节
+
+    支持任意位置切分的数据块、\\n 与 \\r\\n 换行、多行 data 字段与注释行，
+    每个完整事件返回其 data 字段(多行以 \\n 连接)
+    """
+
+    __slots__ = ("_buffer", "_data", "max_buffer", "events", "malformed")
+
+    def __init__(self, max_buffer: int = 1024 * 1024):
+        """
+        初始化解码器
+
+        Args:
+            max_buffer: 单行允许缓存的最大字节数，超出时丢弃该行并计为异常帧
+        """
+        self._buffer = bytearray()
+        self._data: Optional[List[bytes]] = None
+        self.max_buffer = max_buffer
+        self.events = 0
+        self.malformed = 0
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        输入一段原始字节
+
+        Args:
+            chunk: 上游返回的数据块
+
+        Returns:
+            本次解码出的完整事件数据列表
+        """
+        buffer = self._buffer
+        buffer += chunk
+        events: List[bytes] = []
+        start = 0
+        find = buffer.find
+        while True:
+            end = find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            self._process_line(line, events)
+
+        if start:
+            del buffer[:start]
+        if len(buffer) > self.max_buffer:
+            # 没有换行的超长数据视为异常帧
+            buffer.clear()
+            self.malformed += 1
+        return events
+
+    def flush(self) -> List[bytes]:
+        """
+        流结束时处理残留数据，兼容最后一个事件缺少空行结尾的上游
+
+        Returns:
+            剩余的完整事件数据列表
+        """
+        events: List[bytes] = []
+        if self._buffer:
+            line = bytes(self._buffer).rstrip(b"\r")
+            self._buffer.clear()
+            self._process_line(line, events)
+        self._process_line(b"", events)
+        return events
+
+    def _process_line(self, line: bytes, events: List[bytes]) -> None:
+        """处理一行 SSE 数据"""
+        if not line:
+            # 空行表示事件结束
+            if self._data is not None:
+                events.append(
+                    self._data[0] if len(self._data) == 1 else b"\n".join(self._data)
+                )
+                self._data = None
+                self.events += 1
+            return
+
+        if line[0] == 0x3A:  # 以 ':' 开头的注释行
+            return
+
+        field, _, value = line.partition(b":")
+        if field != b"data":
+            # event / id / retry 等字段对聊天流无意义，直接忽略
+            return
+        if value[:1] == b" ":
+            value = value[1:]
+        if self._data is None:
+            self._data = [value]
+        else:
+            self._data.append(value)
+
+
+class ChatStreamParser:
+    """
+    OpenAI 兼容的聊天流解析器
+
+    将原始字节解码为 SSE 事件，用 orjson 解析 JSON 并提取增量内容，
+    同时统计事件数、内容片段数及无法解析的异常帧数
+    """
+
+    __slots__ = ("decoder", "content", "deltas", "malformed", "bytes", "done")
+
+    def __init__(self, max_buffer: int = 1024 * 1024):
+        self.decoder = SSEDecoder(max_buffer=max_buffer)
+        self.content = ContentBuilder()
+        self.deltas = 0
+        self.malformed = 0
+        self.bytes = 0
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """
+        输入一段原始字节
+
+        Args:
+            chunk: 上游返回的数据块
+
+        Returns:
+            本次解析出的内容片段列表
+        """
+        self.bytes += len(chunk)
+        return self._parse_events(self.decoder.feed(chunk))
+
+    def close(self) -> List[str]:
+        """
+        流结束时调用，返回残留事件中的内容片段
+        """
+        return self._parse_events(self.decoder.flush())
+
+    def _parse_events(self, events: List[bytes]) -> List[str]:
+        deltas: List[str] = []
+        for data in events:
+            if self.done:
+                break
+            if data == DONE_MARKER:
+                self.done = True
+                break
+            try:
+                chunk_obj = orjson.loads(data)
+                choices = chunk_obj.get("choices")
+                if not choices:
+                    continue
+                content = (choices[0].get("delta") or {}).get("content")
+            except (orjson.JSONDecodeError, AttributeError, TypeError, IndexError):
+                self.malformed += 1
+                continue
+            if content:
+                self.content.append(content)
+                deltas.append(content)
+        self.deltas += len(deltas)
+        return deltas
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取解析统计信息
+
+        Returns:
+            包含字节数、事件数、内容片段数及异常帧数的字典
+        """
+        return {
+            "bytes": self.bytes,
+            "events": self.decoder.events,
+            "deltas": self.deltas,
+            "malformed": self.malformed + self.decoder.malformed,
+            "done": self.done,
+        }
@@ -0,0 +1,156 @@
+from typing import Any, Dict, List, Optional
+import time
+from .context import estimate_tokens
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _distribution(values: List[float]) -> Optional[Dict[str, float]]:
+    """计算一组耗时的均值、分位数和最大值(毫秒)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {
+        "mean": _ms(sum(ordered) / len(ordered)),
+        "p50": _ms(ordered[last // 2]),
+        "p99": _ms(ordered[round(last * 0.99)]),
+        "max": _ms(ordered[last]),
+    }
+
+
+class StreamTiming:
+    """
+    单次上游流式请求的时间线(单调时钟)
+
+    记录请求发出、收到首个字节、首个内容片段及之后每个片段的时间，
+    以及下游消费变慢导致上游读取被暂停(背压)的累计时间
+    """
+
+    __slots__ = (
+        "sent",
+        "first_byte",
+        "first_delta",
+        "last_delta",
+        "finished",
+        "gaps",
+        "deltas",
+        "tokens",
+        "backpressure",
+    )
+
+    def __init__(self):
+        self.sent = time.perf_counter()
+        self.first_byte: Optional[float] = None
+        self.first_delta: Optional[float] = None
+        self.last_delta: Optional[float] = None
+        self.finished: Optional[float] = None
+        # 相邻内容片段的间隔(秒)
+        self.gaps: List[float] = []
+        self.deltas = 0
+        self.tokens = 0
+        self.backpressure = 0.0
+
+    def mark_byte(self) -> None:
+        """收到响应体数据，只记录第一次"""
+        if self.first_byte is None:
+            self.first_byte = time.perf_counter()
+
+    def mark_delta(self) -> None:
+        """解析出一个内容片段"""
+        now = time.perf_counter()
+        if self.first_delta is None:
+            self.first_delta = now
+        else:
+            self.gaps.append(now - self.last_delta)
+        self.last_delta = now
+        self.deltas += 1
+
+    def finish(self, content: str) -> None:
+        """
+        上游响应读取完毕
+
+        Args:
+            content: 完整回复内容，用于估算 token 数
+        """
+        self.finished = time.perf_counter()
+        self.tokens = estimate_tokens(content) if content else 0
+
+    @property
+    def ttfb(self) -> Optional[float]:
+        return None if self.first_byte is None else self.first_byte - self.sent
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return None if self.first_delta is None else self.first_delta - self.sent
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """首个内容片段之后的生成速率，片段少于两个时无法计算"""
+        if self.first_delta is None or self.last_delta == self.first_delta:
+            return None
+        return self.tokens / (self.last_delta - self.first_delta)
+
+    def summary(self) -> Dict[str, Any]:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        rate = self.tokens_per_second
+        return {
+            "ttfb_ms": _ms(self.ttfb),
+            "ttft_ms": _ms(self.ttft),
+            "duration_ms": _ms(end - self.sent),
+            "deltas": self.deltas,
+            "tokens": self.tokens,
+            "tokens_per_second": None if rate is None else round(rate, 2),
+            "gap_ms": _distribution(self.gaps),
+        }
+
+
+class DeliveryTiming:
+    """
+    服务端推送时间 - 每个内容片段从上游读出到被响应生成器取走的排队时间
+    """
+
+    __slots__ = ("waits",)
+
+    def __init__(self):
+        self.waits: List[float] = []
+
+    def record(self, queued_at: float) -> None:
+        """
+        记录一个片段被取走
+
+        Args:
+            queued_at: 片段放入队列时的 time.perf_counter()
+        """
+        self.waits.append(time.perf_counter() - queued_at)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "delivered": len(self.waits),
+            "queue_ms": _distribution(self.waits),
+            "queue_ms_total": _ms(sum(self.waits)),
+        }
+
+
+def stream_timing_summary(
+    upstream: Optional[StreamTiming], delivery: Optional[DeliveryTiming]
+) -> Dict[str, Any]:
+    """
+    汇总一次流式请求的耗时，上游耗时与服务端排队、背压分开报告
+
+    Args:
+        upstream: 胜出的上游请求的时间线，缓存命中或合并请求时为空
+        delivery: 服务端推送时间，未经过队列推送时为空
+
+    Returns:
+        包含 upstream 和 server 两部分的摘要
+    """
+    server: Dict[str, Any] = delivery.summary() if delivery else {}
+    if upstream is not None:
+        server["backpressure_ms"] = _ms(upstream.backpressure)
+    return {
+        "upstream": upstream.summary() if upstream else None,
+        "server": server,
+    }
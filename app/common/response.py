@@ -1,11 +1,18 @@
 from typing import TypeVar, Generic, Optional, Any, Callable
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from fastapi.responses import JSONResponse
-from functools import partial
+from functools import partial, lru_cache
+import orjson
 from .enums import ResponseCode, get_message
 
 T = TypeVar("T")
 
+# orjson 3.9+ 支持直接嵌入已编码的 JSON 片段
+_Fragment = getattr(orjson, "Fragment", None)
+
+# orjson 可直接编码的数据类型，其余类型交给 pydantic 序列化
+_NATIVE_TYPES = (dict, list, tuple, str, int, float, bool, type(None))
+
 
 class ResponseModel(BaseModel, Generic[T]):
     """统一响应模型"""
@@ -17,6 +24,51 @@ class ResponseModel(BaseModel, Generic[T]):
     data: Optional[T] = None
 
 
+class EncodedJSONResponse(JSONResponse):
+    """内容已编码为 JSON 字节串的响应，跳过 JSONResponse 的二次编码"""
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+@lru_cache(maxsize=256)
+def _type_adapter(tp: type) -> TypeAdapter:
+    """按数据类型缓存 TypeAdapter，避免每次响应重新构建序列化器"""
+    return TypeAdapter(tp)
+
+
+def _encode_default(obj: Any) -> Any:
+    """orjson 无法直接编码的对象：pydantic 模型及提供 to_json/to_dict 的对象"""
+    if isinstance(obj, BaseModel):
+        if _Fragment is not None:
+            return _Fragment(obj.__pydantic_serializer__.to_json(obj))
+        return obj.model_dump(mode="json")
+    if _Fragment is not None and hasattr(obj, "to_json"):
+        return _Fragment(obj.to_json())
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    return _type_adapter(type(obj)).dump_python(obj, mode="json")
+
+
+def encode_data(data: Any) -> bytes:
+    """
+    将响应数据编码为 JSON 字节串
+
+    字典、列表等原生类型使用 orjson 编码，其余类型使用按类型缓存的 TypeAdapter
+
+    Args:
+        data: 响应数据
+
+    Returns:
+        JSON 字节串
+    """
+    if isinstance(data, _NATIVE_TYPES):
+        return orjson.dumps(
+            data, default=_encode_default, option=orjson.OPT_NON_STR_KEYS
+        )
+    return _type_adapter(type(data)).dump_json(data)
+
+
 def create_response(
     *,
     code: ResponseCode,
@@ -24,13 +76,12 @@ def create_response(
     data: Optional[Any] = None,
 ) -> JSONResponse:
     """
-    创建统一响应
+    创建统一响应，信封直接编码为字节串，不经过 ResponseModel 校验和 model_dump
     """
-    return JSONResponse(
+    head = orjson.dumps({"code": int(code), "msg": msg or get_message(code)})
+    return EncodedJSONResponse(
         status_code=200,
-        content=ResponseModel(
-            code=code, msg=msg or get_message(code), data=data
-        ).model_dump(),
+        content=head[:-1] + b',"data":' + encode_data(data) + b"}",
     )
 
 
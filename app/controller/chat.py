@@ -1,11 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
+from pydantic import AnyHttpUrl, BaseModel, Field
 from typing import List, Dict, Any, Optional
-from app.common import success_response, ResponseModel, error_response, ResponseCode
+from app.common import (
+    success_response,
+    ResponseModel,
+    error_response,
+    not_found_error,
+    ResponseCode,
+)
 from app.core.logger import log_info, log_error
 from app.agent.factory import AgentFactory
+from app.agent.chat_agent import ChatAgent
+from app.agent.base import RetryPolicy
+from app.agent.cache import get_completion_cache
+from app.agent.singleflight import get_single_flight
+from app.agent.resilience import get_upstream_guard_stats
+from app.agent.balancer import get_load_balancer
+from app.agent.hedging import get_hedge_policy
+from app.agent.session import get_session_store
+from app.agent.context import get_context_window
+from app.middreware.rate_limit import get_rate_limit_stats
 from app.core.setting import settings
+from app.core.jobs import get_job_manager
+from app.core.metrics import get_metrics
+from app.core.webhook import get_callback_dispatcher
+from functools import lru_cache
 import asyncio
 import json
 
@@ -27,6 +47,12 @@ class ChatRequest(BaseModel):
     stream: bool = Field(default=False, description="是否使用流式响应")
     max_retries: int = Field(default=3, description="最大重试次数")
     retry_delay: float = Field(default=1.0, description="重试间隔时间(秒)")
+    use_cache: bool = Field(
+        default=True, description="是否允许使用补全缓存及合并相同的并发请求"
+    )
+    hedge: bool = Field(
+        default=False, description="响应过慢时是否向另一个上游发送对冲请求"
+    )
 
 
 class ChatResponse(BaseModel):
@@ -35,14 +61,27 @@ class ChatResponse(BaseModel):
     retry_info: Dict[str, Any] = Field(..., description="重试信息")
 
 
-@router.post("/completions", response_model=ResponseModel[ChatResponse])
-async def chat_completions(request: ChatRequest):
-    """
-    聊天完成接口
+@lru_cache()
+def get_retry_policy() -> RetryPolicy:
+    """根据配置创建共享的上游重试策略"""
+    return RetryPolicy(
+        max_attempts=settings.chat.MAX_RETRIES,
+        base_delay=settings.chat.RETRY_DELAY,
+        max_delay=settings.chat.RETRY_MAX_DELAY,
+        deadline=settings.chat.RETRY_DEADLINE or None,
+    )
+
+
+def create_chat_agent(request: ChatRequest) -> ChatAgent:
     """
-    log_info(f"收到聊天请求: {request.prompt[:50]}...")
+    根据请求创建聊天代理并填充历史消息
 
-    # 创建聊天代理
+    Args:
+        request: 聊天请求
+
+    Returns:
+        聊天代理实例
+    """
     chat_agent = AgentFactory.create(
         "chat",
         api_key=settings.chat.SHAREAI_API_KEY,
@@ -50,17 +89,39 @@ async def chat_completions(request: ChatRequest):
         model=request.model,
         max_retries=settings.chat.MAX_RETRIES,
         retry_delay=settings.chat.RETRY_DELAY,
+        retry_policy=get_retry_policy(),
+        cache=get_completion_cache() if request.use_cache else None,
+        flight=get_single_flight() if request.use_cache else None,
+        balancer=get_load_balancer(),
+        hedging=get_hedge_policy() if request.hedge else None,
+        context=get_context_window(),
+        metrics=get_metrics() if settings.metrics.ENABLED else None,
     )
 
     # 添加历史消息
     for message in request.messages:
         chat_agent.add_message(message.role, message.content)
 
+    return chat_agent
+
+
+@router.post("/completions", response_model=ResponseModel[ChatResponse])
+async def chat_completions(request: ChatRequest):
+    """
+    聊天完成接口
+    """
+    log_info(f"收到聊天请求: {request.prompt[:50]}...")
+
+    # 创建聊天代理
+    chat_agent = create_chat_agent(request)
+
     try:
         # 执行聊天请求
         if not request.stream:
-            # 同步请求
-            chat_agent.run(prompt=request.prompt, system_prompt=request.system_prompt)
+            # 非流式请求
+            await chat_agent.arun(
+                prompt=request.prompt, system_prompt=request.system_prompt
+            )
         else:
             # 流式请求
             await chat_agent.stream_run(
@@ -73,23 +134,21 @@ async def chat_completions(request: ChatRequest):
         # 获取重试信息
         retry_info = chat_agent.get_retry_info()
 
-        # 转换消息格式
-        messages = [
-            ChatMessage(role=msg["role"], content=msg["content"])
-            for msg in chat_agent.messages
-        ]
-
         # 获取助手回复
         assistant_message = (
             chat_agent.get_last_message()
-            if chat_agent.messages and chat_agent.messages[-1]["role"] == "assistant"
+            if chat_agent.messages and chat_agent.messages[-1].role == "assistant"
             else ""
         )
 
+        # 数据结构与 ChatResponse 一致：消息对象由响应编码器直接输出缓存的
+        # {"role", "content"} JSON 片段，与 ChatMessage 的序列化结果相同，无需逐条构造模型
         return success_response(
-            data=ChatResponse(
-                content=assistant_message, messages=messages, retry_info=retry_info
-            )
+            data={
+                "content": assistant_message,
+                "messages": chat_agent.messages[:],
+                "retry_info": retry_info,
+            }
         )
     except Exception:
         return error_response(
@@ -98,7 +157,9 @@ async def chat_completions(request: ChatRequest):
 
 
 class StreamRequest(ChatRequest):
-    pass
+    timing: bool = Field(
+        default=False, description="是否在最后的 retry_info 事件中附带流式耗时摘要"
+    )
 
 
 @router.post("/stream")
@@ -111,56 +172,35 @@ async def chat_stream(request: StreamRequest):
     # 创建响应生成器
     async def event_generator():
         # 创建聊天代理
-        chat_agent = AgentFactory.create(
-            "chat",
-            api_key=settings.chat.SHAREAI_API_KEY,
-            base_url=settings.chat.SHAREAI_BASE_URL,
-            model=request.model,
-            max_retries=settings.chat.MAX_RETRIES,
-            retry_delay=settings.chat.RETRY_DELAY,
-        )
-
-        # 添加历史消息
-        for message in request.messages:
-            chat_agent.add_message(message.role, message.content)
-
-        # 用于存储流式响应内容
-        content_buffer = []
-
-        # 回调函数，用于处理流式响应
-        async def handle_chunk(chunk: str):
-            content_buffer.append(chunk)
-            yield f"data: {chunk}\n\n"
+        chat_agent = create_chat_agent(request)
+        # 关闭指标时代理不持有 metrics，也不统计活跃流
+        metrics = chat_agent.metrics
+        if metrics is not None:
+            metrics.active_streams.inc()
 
         try:
-            # 执行流式请求
-            task = asyncio.create_task(
-                chat_agent.stream_run(
-                    prompt=request.prompt,
-                    system_prompt=request.system_prompt,
-                    callback=lambda chunk: content_buffer.append(chunk),
-                )
-            )
-
-            # 发送内容
-            while not task.done() or content_buffer:
-                if content_buffer:
-                    chunk = content_buffer.pop(0)
-                    yield f"data: {chunk}\n\n"
-                else:
-                    await asyncio.sleep(0.1)
-
-            # 等待任务完成
-            await task
+            # 内容片段到达即推送，无需轮询
+            async for chunk in chat_agent.astream(
+                prompt=request.prompt,
+                system_prompt=request.system_prompt,
+                queue_size=settings.chat.STREAM_QUEUE_SIZE,
+            ):
+                yield f"data: {chunk}\n\n"
 
             # 发送完成事件
             retry_info = chat_agent.get_retry_info()
+            final_event = {"retry_info": retry_info}
+            if request.timing:
+                final_event["timing"] = chat_agent.get_stream_timing()
             yield f"data: [DONE]\n\n"
-            yield f"data: {json.dumps({'retry_info': retry_info})}\n\n"
+            yield f"data: {json.dumps(final_event)}\n\n"
 
         except Exception as e:
             log_error(f"流式聊天请求失败: {str(e)}")
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            if metrics is not None:
+                metrics.active_streams.dec()
 
     return StreamingResponse(
         event_generator(),
@@ -173,39 +213,33 @@ async def chat_stream(request: StreamRequest):
 
 
 class AsyncChatRequest(ChatRequest):
-    callback_url: Optional[str] = Field(None, description="回调URL，用于异步通知结果")
+    callback_url: Optional[AnyHttpUrl] = Field(
+        None, description="回调URL，用于异步通知结果"
+    )
 
 
 @router.post("/async", response_model=ResponseModel[Dict[str, Any]])
-async def async_chat(request: AsyncChatRequest, background_tasks: BackgroundTasks):
+async def async_chat(request: AsyncChatRequest):
     """
-    异步聊天接口 - 立即返回，后台处理
+    异步聊天接口 - 立即返回任务ID，由后台工作池处理
     """
     log_info(f"收到异步聊天请求: {request.prompt[:50]}...")
-
-    # 创建任务ID
-    task_id = f"task_{id(request)}"
+    callback_url = str(request.callback_url) if request.callback_url else None
+    if callback_url:
+        try:
+            await get_callback_dispatcher().validate(callback_url)
+        except ValueError as e:
+            return error_response(code=ResponseCode.PARAM_ERROR, msg=str(e))
 
     # 后台任务
-    async def process_chat():
+    async def process_chat() -> Dict[str, Any]:
         try:
             # 创建聊天代理
-            chat_agent = AgentFactory.create(
-                "chat",
-                api_key=settings.chat.SHAREAI_API_KEY,
-                base_url=settings.chat.SHAREAI_BASE_URL,
-                model=request.model,
-                max_retries=settings.chat.MAX_RETRIES,
-                retry_delay=settings.chat.RETRY_DELAY,
-            )
-
-            # 添加历史消息
-            for message in request.messages:
-                chat_agent.add_message(message.role, message.content)
+            chat_agent = create_chat_agent(request)
 
             # 执行聊天请求
             if not request.stream:
-                chat_agent.run(
+                await chat_agent.arun(
                     prompt=request.prompt, system_prompt=request.system_prompt
                 )
             else:
@@ -214,26 +248,272 @@ async def async_chat(request: AsyncChatRequest, background_tasks: BackgroundTask
                 )
 
             # 获取结果
-            result = chat_agent.get_result()
+            error = (chat_agent.get_result() or {}).get("error")
+            if error is not None:
+                raise RuntimeError(error)
             retry_info = chat_agent.get_retry_info()
 
             log_info(
-                f"异步聊天请求完成，任务ID: {task_id}，重试次数: {retry_info['attempts']}"
+                f"异步聊天请求完成，任务ID: {job.id}，重试次数: {retry_info['attempts']}"
             )
 
+            data = {"content": chat_agent.get_last_message(), "retry_info": retry_info}
+
             # 如果提供了回调URL，发送结果
-            if request.callback_url:
-                # 这里可以实现回调逻辑
-                pass
+            if callback_url:
+                await get_callback_dispatcher().enqueue(
+                    callback_url,
+                    {"task_id": job.id, "status": "succeeded", "result": data},
+                )
 
-        except Exception:
-            log_error(f"异步聊天请求失败，任务ID: {task_id}")
+            return data
+
+        except Exception as e:
+            log_error(f"异步聊天请求失败，任务ID: {job.id}")
             # 如果提供了回调URL，发送错误信息
-            if request.callback_url:
-                # 这里可以实现回调错误逻辑
-                pass
+            if callback_url:
+                await get_callback_dispatcher().enqueue(
+                    callback_url,
+                    {"task_id": job.id, "status": "failed", "error": str(e)},
+                )
+            raise
 
-    background_tasks.add_task(process_chat)
+    # 队列已满时抛出 SERVICE_BUSY 业务异常
+    job = get_job_manager().submit(process_chat)
 
     # 立即返回
-    return success_response(data={"task_id": task_id, "status": "processing"})
+    return success_response(data={"task_id": job.id, "status": job.status.value})
+
+
+class BatchChatRequest(BaseModel):
+    items: List[ChatRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.chat.BATCH_MAX_ITEMS,
+        description="聊天请求列表",
+    )
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="最大并发数，不超过服务端配置的上限"
+    )
+    stream: bool = Field(
+        default=False, description="是否以 NDJSON 按完成顺序逐条返回结果"
+    )
+
+
+async def run_batch_item(index: int, request: ChatRequest) -> Dict[str, Any]:
+    """
+    执行批量请求中的单个聊天请求，失败时返回错误信息而不是抛出异常
+
+    Args:
+        index: 请求在批量列表中的位置
+        request: 聊天请求
+
+    Returns:
+        包含 index、content、retry_info 和 error 的结果
+    """
+    chat_agent = create_chat_agent(request)
+    await chat_agent.arun(prompt=request.prompt, system_prompt=request.system_prompt)
+    result = chat_agent.get_result()
+    error = result.get("error") if result else None
+    return {
+        "index": index,
+        "content": None if error else chat_agent.get_last_message(),
+        "retry_info": chat_agent.get_retry_info(),
+        "error": error,
+    }
+
+
+@router.post("/batch", response_model=ResponseModel[Dict[str, Any]])
+async def batch_chat(request: BatchChatRequest):
+    """
+    批量聊天接口 - 在并发上限内并行执行多个聊天请求
+
+    单个请求失败不影响其他请求；stream 为 true 时按完成顺序返回 NDJSON，
+    每行一个结果。单条请求不支持流式输出，其 stream 字段为 true 时整个批量请求被拒绝。
+    入站限流按批量请求计次，与条数无关
+    """
+    if any(item.stream for item in request.items):
+        return error_response(
+            code=ResponseCode.PARAM_ERROR,
+            msg="批量请求中的单条请求不支持 stream，请使用顶层的 stream 字段",
+        )
+    log_info(f"收到批量聊天请求: {len(request.items)} 条")
+
+    concurrency = min(
+        request.concurrency or settings.chat.BATCH_CONCURRENCY,
+        settings.chat.BATCH_CONCURRENCY,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_limited(index: int, item: ChatRequest) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await run_batch_item(index, item)
+            except Exception as e:
+                log_error(f"批量聊天请求失败，序号: {index}，错误: {e}")
+                return {
+                    "index": index,
+                    "content": None,
+                    "retry_info": None,
+                    "error": str(e),
+                }
+
+    if not request.stream:
+        results = await asyncio.gather(
+            *(run_limited(index, item) for index, item in enumerate(request.items))
+        )
+        failed = sum(1 for result in results if result["error"])
+        return success_response(
+            data={
+                "results": results,
+                "succeeded": len(results) - failed,
+                "failed": failed,
+            }
+        )
+
+    async def result_generator():
+        tasks = [
+            asyncio.ensure_future(run_limited(index, item))
+            for index, item in enumerate(request.items)
+        ]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        finally:
+            # 客户端提前断开时取消未完成的请求
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    return StreamingResponse(
+        result_generator(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+class CreateSessionRequest(BaseModel):
+    model: str = Field(default="gpt-4o-mini", description="会话使用的模型")
+    system_prompt: Optional[str] = Field(None, description="系统提示")
+
+
+class SessionMessageRequest(BaseModel):
+    prompt: str = Field(..., description="用户提问")
+    use_cache: bool = Field(
+        default=True, description="是否允许使用补全缓存及合并相同的并发请求"
+    )
+    hedge: bool = Field(
+        default=False, description="响应过慢时是否向另一个上游发送对冲请求"
+    )
+
+
+class SessionMessageResponse(BaseModel):
+    content: str = Field(..., description="助手回复内容")
+    retry_info: Dict[str, Any] = Field(..., description="重试信息")
+
+
+@router.post("/sessions", response_model=ResponseModel[Dict[str, Any]])
+async def create_session(request: CreateSessionRequest):
+    """
+    创建服务端会话，之后每轮只需发送 session_id 和新的提问
+    """
+    session = await get_session_store().create(request.model, request.system_prompt)
+    return success_response(data={"session_id": session.id})
+
+
+@router.post(
+    "/sessions/{session_id}/messages",
+    response_model=ResponseModel[SessionMessageResponse],
+)
+async def session_chat(session_id: str, request: SessionMessageRequest):
+    """
+    会话聊天接口 - 历史消息保存在服务端，只返回本轮的助手回复
+    """
+    store = get_session_store()
+    session = await store.get(session_id)
+    if session is None:
+        return not_found_error(msg="会话不存在或已过期")
+
+    # 同一会话的请求串行执行，保证历史顺序
+    async with session.lock:
+        chat_agent = create_chat_agent(
+            ChatRequest(
+                prompt=request.prompt,
+                model=session.model,
+                use_cache=request.use_cache,
+                hedge=request.hedge,
+            )
+        )
+        chat_agent.messages = session.to_history()
+        history_length = len(chat_agent.messages)
+        await chat_agent.arun(prompt=request.prompt)
+
+        result = chat_agent.get_result()
+        if result and "error" in result:
+            # 失败的一轮不写入会话，客户端可直接重试
+            return error_response(code=ResponseCode.GATEWAY_ERROR, msg=result["error"])
+        await store.append(session, chat_agent.messages[history_length:])
+
+    return success_response(
+        data=SessionMessageResponse(
+            content=chat_agent.get_last_message(),
+            retry_info=chat_agent.get_retry_info(),
+        )
+    )
+
+
+@router.get("/sessions/{session_id}", response_model=ResponseModel[Dict[str, Any]])
+async def get_session(session_id: str):
+    """
+    查询会话的完整历史
+    """
+    session = await get_session_store().get(session_id)
+    if session is None:
+        return not_found_error(msg="会话不存在或已过期")
+    return success_response(data=session.to_dict())
+
+
+@router.delete("/sessions/{session_id}", response_model=ResponseModel[None])
+async def delete_session(session_id: str):
+    """
+    删除会话
+    """
+    if not await get_session_store().delete(session_id):
+        return not_found_error(msg="会话不存在或已过期")
+    return success_response()
+
+
+@router.get("/async/{task_id}", response_model=ResponseModel[Dict[str, Any]])
+async def async_chat_result(task_id: str):
+    """
+    查询异步聊天任务的状态和结果
+    """
+    job = get_job_manager().get(task_id)
+    if job is None:
+        return not_found_error(msg="任务不存在或已过期")
+    return success_response(data=job.to_dict())
+
+
+@router.get("/stats", response_model=ResponseModel[Dict[str, Any]])
+async def chat_stats():
+    """
+    聊天服务运行统计
+    """
+    cache = get_completion_cache()
+    flight = get_single_flight()
+    balancer = get_load_balancer()
+    context = get_context_window()
+    return success_response(
+        data={
+            "cache": cache.stats if cache else None,
+            "coalescing": flight.stats if flight else None,
+            "jobs": get_job_manager().stats,
+            "callbacks": get_callback_dispatcher().stats,
+            "upstreams": get_upstream_guard_stats(),
+            "balancer": balancer.stats if balancer else None,
+            "hedging": get_hedge_policy().stats,
+            "rate_limit": get_rate_limit_stats(),
+            "sessions": get_session_store().stats,
+            "context": context.stats if context else None,
+        }
+    )
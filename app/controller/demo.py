@@ -2,7 +2,6 @@ from fastapi import APIRouter, Depends, HTTPException
 from app.common import BusinessException, ResponseCode, success_response, ResponseModel
 from pydantic import BaseModel
 from app.core.logger import (
-    log_request,
     log_info,
     log_error,
     log_warning,
@@ -58,7 +57,6 @@ async def demo_internal_error():
 
 
 @router.get("/hello")
-@log_request(url="/demo/hello")
 async def hello(name: str = "world"):
     log_info(f"处理 hello 请求，参数: name={name}")  # 使用新的日志函数
 
@@ -73,7 +71,6 @@ async def hello(name: str = "world"):
 
 
 @router.post("/data")
-@log_request(url="/demo/data", level="DEBUG")
 async def process_data(data: dict):
     log_info(f"处理数据请求，数据: {data}")  # 使用新的日志函数
 
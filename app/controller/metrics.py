@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.core.metrics import CONTENT_TYPE, get_metrics
+from app.core.setting import settings
+
+router = APIRouter(prefix="", tags=["系统"])
+
+
+@router.get(settings.metrics.PATH, include_in_schema=False)
+async def metrics():
+    """
+    Prometheus 指标接口 - 导出当前进程的指标(文本格式)
+    """
+    return Response(get_metrics().render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,236 @@
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import time
+import uuid
+from app.common import BusinessException, ResponseCode
+from app.core.setting import get_settings, JobConfig
+from app.core.logger import log_error
+
+
+class JobStatus(str, Enum):
+    """任务状态枚举"""
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class Job:
+    """后台任务记录"""
+
+    __slots__ = (
+        "id",
+        "func",
+        "status",
+        "result",
+        "error",
+        "created_at",
+        "started_at",
+        "finished_at",
+    )
+
+    def __init__(self, func: Callable[[], Awaitable[Any]]):
+        # uuid4 保证任务ID在进程间和对象回收后都不会重复
+        self.id = f"task_{uuid.uuid4().hex}"
+        self.func: Optional[Callable[[], Awaitable[Any]]] = func
+        self.status = JobStatus.PENDING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为接口返回的字典"""
+        return {
+            "task_id": self.id,
+            "status": self.status.value,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    后台任务管理器 - 有界队列 + 固定数量的异步工作协程
+
+    队列满时拒绝新任务，已结束任务的结果按保留时间自动清理
+    """
+
+    def __init__(self, workers: int = 8, max_queue: int = 1000, retention: float = 3600.0):
+        """
+        初始化任务管理器
+
+        Args:
+            workers: 并发执行任务的工作协程数
+            max_queue: 等待执行的最大任务数
+            retention: 已结束任务结果的保留时间(秒)
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retention = retention
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        self._stats = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+
+    @classmethod
+    def from_config(cls, config: JobConfig) -> "JobManager":
+        """根据任务配置创建管理器"""
+        return cls(
+            workers=config.WORKERS,
+            max_queue=config.MAX_QUEUE,
+            retention=config.RESULT_TTL,
+        )
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """启动工作协程和过期清理协程，需在事件循环中调用"""
+        if self.started:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self) -> None:
+        """停止所有协程，未执行的任务将被丢弃"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, func: Callable[[], Awaitable[Any]]) -> Job:
+        """
+        提交任务
+
+        Args:
+            func: 任务协程函数，返回值作为任务结果
+
+        Returns:
+            任务记录
+
+        Raises:
+            BusinessException: 队列已满时抛出 SERVICE_BUSY
+        """
+        if not self.started:
+            self.start()
+        job = Job(func)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._stats["rejected"] += 1
+            raise BusinessException(
+                code=ResponseCode.SERVICE_BUSY, msg="任务队列已满，请稍后重试"
+            )
+        self._jobs[job.id] = job
+        self._stats["submitted"] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        查询任务，已过保留时间的任务视为不存在
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务记录，不存在时返回None
+        """
+        job = self._jobs.get(job_id)
+        if job is not None and self._expired(job, time.time()):
+            del self._jobs[job_id]
+            return None
+        return job
+
+    @property
+    def queue_depth(self) -> int:
+        """等待执行的任务数"""
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        获取任务统计信息
+
+        Returns:
+            队列深度、执行中任务数、保留的任务数及累计计数
+        """
+        return {
+            **self._stats,
+            "queue_depth": self.queue_depth,
+            "running": self._running,
+            "tracked": len(self._jobs),
+            "workers": self.workers,
+        }
+
+    def _expired(self, job: Job, now: float) -> bool:
+        return job.finished and now - job.finished_at > self.retention
+
+    async def _worker(self) -> None:
+        while True:
+            job: Job = await self._queue.get()
+            job.status = JobStatus.PROCESSING
+            job.started_at = time.time()
+            self._running += 1
+            try:
+                job.result = await job.func()
+                job.status = JobStatus.SUCCEEDED
+                self._stats["succeeded"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.error = str(e)
+                job.status = JobStatus.FAILED
+                self._stats["failed"] += 1
+                log_error(f"后台任务执行失败，任务ID: {job.id}，错误: {e}")
+            finally:
+                job.finished_at = time.time()
+                job.func = None
+                self._running -= 1
+                self._queue.task_done()
+
+    async def _reaper(self) -> None:
+        # 至少每分钟清理一次过期任务
+        interval = min(max(self.retention / 10, 1.0), 60.0)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.time()
+            expired = [
+                job_id for job_id, job in self._jobs.items() if self._expired(job, now)
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """获取全局任务管理器，不存在时按配置创建"""
+    global _manager
+    if _manager is None:
+        _manager = JobManager.from_config(get_settings().job)
+    return _manager
+
+
+async def shutdown_job_manager() -> None:
+    """停止全局任务管理器，在应用生命周期结束时调用"""
+    global _manager
+    if _manager is not None:
+        manager, _manager = _manager, None
+        await manager.stop()
@@ -0,0 +1,160 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+import mmap
+import zipfile
+import orjson
+
+
+@contextmanager
+def _mapped(path: Path) -> Iterator[bytes]:
+    """以只读 mmap 打开文件，空文件返回空字节串(mmap 不支持长度为0)"""
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def _patterns(request_id: str) -> Tuple[bytes, bytes]:
+    """日志行中请求UUID的两种写法：生产方案的 JSON 字段与开发方案的文本列"""
+    return (
+        b'"uuid":' + orjson.dumps(request_id),
+        f"| {request_id} |".encode("utf-8"),
+    )
+
+
+def _scan(data: bytes, patterns: Sequence[bytes]) -> List[bytes]:
+    """在整个文件内容中查找包含任一模式的行，按出现顺序返回"""
+    found = {}
+    for pattern in patterns:
+        pos = data.find(pattern)
+        while pos != -1:
+            start = data.rfind(b"\n", 0, pos) + 1
+            end = data.find(b"\n", pos)
+            end = len(data) if end == -1 else end
+            found[start] = data[start:end]
+            pos = data.find(pattern, end)
+    return [found[start] for start in sorted(found)]
+
+
+def _index_offsets(index_path: Path, request_id: str) -> List[int]:
+    """从旁路索引中读取请求UUID对应的日志行偏移"""
+    key = request_id.encode("utf-8") + b"\t"
+    offsets: List[int] = []
+    with _mapped(index_path) as data:
+        pos = data.find(key)
+        while pos != -1:
+            end = data.find(b"\n", pos)
+            # 未写完的最后一行忽略；键须位于行首，避免匹配到其他UUID的后缀
+            if end == -1:
+                break
+            if pos == 0 or data[pos - 1 : pos] == b"\n":
+                offsets.extend(
+                    int(o, 16) for o in data[pos + len(key) : end].split(b",")
+                )
+            pos = data.find(key, end)
+    return offsets
+
+
+def _read_lines(
+    data: bytes, offsets: Sequence[int], pattern: bytes
+) -> Optional[List[bytes]]:
+    """
+    按索引偏移读取日志行，并校验每行确实属于该请求
+
+    Returns:
+        日志行，任一偏移不在行首或该行不含请求UUID(索引已失效)时返回None
+    """
+    lines = []
+    for offset in offsets:
+        if offset >= len(data) or (offset and data[offset - 1 : offset] != b"\n"):
+            return None
+        end = data.find(b"\n", offset)
+        line = data[offset : len(data) if end == -1 else end]
+        if pattern not in line:
+            return None
+        lines.append(line)
+    return lines
+
+
+def search_file(path: Path, request_id: str) -> List[bytes]:
+    """
+    在单个日志文件中查找请求的所有日志行
+
+    有旁路索引的 JSON 行文件按索引偏移直接读取，偏移与日志行对不上时回退为扫描；
+    无索引的文件以 mmap 扫描；已压缩的 zip 文件解压后扫描
+
+    Args:
+        path: 日志文件路径
+        request_id: 请求UUID
+
+    Returns:
+        日志行(不含换行符)
+    """
+    patterns = _patterns(request_id)
+    if path.suffix == ".zip":
+        with zipfile.ZipFile(path) as archive:
+            return [
+                line
+                for name in archive.namelist()
+                for line in _scan(archive.read(name), patterns)
+            ]
+    index_path = path.with_suffix(".idx")
+    with _mapped(path) as data:
+        if path.suffix == ".jsonl" and index_path.exists():
+            offsets = _index_offsets(index_path, request_id)
+            lines = _read_lines(data, offsets, patterns[0])
+            if lines is not None:
+                return lines
+        return _scan(data, patterns)
+
+
+def log_files(
+    log_dir: Path, kind: str = "info", dates: Optional[Sequence[str]] = None
+) -> List[Path]:
+    """
+    列出某类日志的所有文件(含已轮转和已压缩的文件)，按文件名即日期排序
+
+    Args:
+        log_dir: 日志根目录
+        kind: info 或 error
+        dates: 只包含这些日期(YYYY-MM-DD)的文件，为空时包含全部
+
+    Returns:
+        日志文件路径
+    """
+    directory = Path(log_dir) / kind
+    if not directory.is_dir():
+        return []
+    return sorted(
+        path
+        for path in directory.glob(f"*_{kind}*")
+        if path.suffix != ".idx"
+        and path.is_file()
+        and (not dates or path.name[:10] in dates)
+    )
+
+
+def search_request(
+    log_dir: Path,
+    request_id: str,
+    kind: str = "info",
+    dates: Optional[Sequence[str]] = None,
+) -> Iterator[Tuple[Path, bytes]]:
+    """
+    在当前与已轮转的日志文件中查找一个请求的所有日志
+
+    Args:
+        log_dir: 日志根目录
+        request_id: 请求UUID
+        kind: info 或 error
+        dates: 只查找这些日期的日志，为空时查找全部
+
+    Yields:
+        (日志文件, 日志行)
+    """
+    for path in log_files(log_dir, kind, dates):
+        for line in search_file(path, request_id):
+            yield path, line
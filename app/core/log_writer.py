@@ -0,0 +1,288 @@
+from collections import deque
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Deque, Dict, IO, List, Optional, Tuple
+import re
+import sys
+import threading
+import time
+import traceback
+import orjson
+
+# 日志级别数值，与 loguru 一致
+INFO_LEVEL = 20
+ERROR_LEVEL = 40
+
+# 写入线程在缓冲区中保存的记录：(时间, 级别数值, 级别名称, 请求UUID, 模块, 函数, 行号, 消息, 异常)
+LogEntry = Tuple[datetime, int, str, str, str, str, int, str, Any]
+
+
+# 不写入索引的请求UUID(无请求上下文的日志)
+_UNINDEXED_IDS = (None, "无UUID")
+
+
+class _DailyFile:
+    """
+    按日期切换的日志文件，切换时清理超过保留天数的旧文件
+
+    启用索引时同时维护 {date}_{suffix}.idx 旁路索引，每批写入追加若干行
+    "请求UUID\t偏移,偏移..."(十六进制字节偏移)，按请求查找日志时无需扫描日志文件
+
+    文件以无缓冲的追加模式打开，每批只调用一次 write，多个工作进程写同一文件时
+    各批次不会交错；偏移取自写入后的文件位置，而不是进程内自行累计的值
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        suffix: str,
+        retention_days: Optional[int],
+        index: bool = True,
+    ):
+        self.directory = directory
+        self.suffix = suffix
+        self.retention_days = retention_days
+        self.index = index
+        self._date: Optional[str] = None
+        self._file: Optional[IO[bytes]] = None
+        self._index_file: Optional[IO[bytes]] = None
+
+    def write(
+        self, date: str, lines: List[bytes], request_ids: List[Optional[str]]
+    ) -> None:
+        """
+        写入一批日志行，并记录每个请求UUID对应行的起始偏移
+
+        Args:
+            date: 日志日期，决定写入的文件
+            lines: 编码后的日志行
+            request_ids: 与日志行一一对应的请求UUID
+        """
+        if date != self._date:
+            self._rotate(date)
+        data = b"".join(lines)
+        written = self._file.write(data)
+        while written < len(data):
+            # 无缓冲写入极少出现部分写入，补写剩余部分
+            written += self._file.write(data[written:])
+        if not self.index:
+            return
+        # 追加写入后文件位置即本批末尾，其他进程的写入只会出现在本批之前或之后
+        offset = self._file.tell() - len(data)
+        offsets: Dict[str, List[int]] = {}
+        for line, request_id in zip(lines, request_ids):
+            if request_id not in _UNINDEXED_IDS:
+                offsets.setdefault(request_id, []).append(offset)
+            offset += len(line)
+        if offsets:
+            self._index_file.write(
+                "".join(
+                    f"{request_id}\t{','.join(format(o, 'x') for o in positions)}\n"
+                    for request_id, positions in offsets.items()
+                ).encode("utf-8")
+            )
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+    def _rotate(self, date: str) -> None:
+        self.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # 先写日志再写索引，保证索引中的偏移在日志文件中都已存在
+        self._file = open(
+            self.directory / f"{date}_{self.suffix}.jsonl", "ab", buffering=0
+        )
+        if self.index:
+            self._index_file = open(
+                self.directory / f"{date}_{self.suffix}.idx", "ab", buffering=0
+            )
+        self._date = date
+        if self.retention_days:
+            cutoff = time.time() - self.retention_days * 86400
+            for pattern in (f"*_{self.suffix}.jsonl", f"*_{self.suffix}.idx"):
+                for path in self.directory.glob(pattern):
+                    try:
+                        if path.stat().st_mtime < cutoff:
+                            path.unlink()
+                    except OSError:
+                        pass
+
+
+class BatchedJSONSink:
+    """
+    批量结构化日志写入器(生产环境日志方案)
+
+    loguru 调用 write 时只从记录中取出字段放入有界环形缓冲区，不做任何格式化；
+    单个写入线程批量编码为 JSON 行，每条记录只编码一次，再按级别分发到
+    info/error 文件(及可选的标准输出)。缓冲区满时按策略丢弃新记录或阻塞等待
+    """
+
+    def __init__(
+        self,
+        log_dir: str,
+        buffer_size: int = 65536,
+        batch_size: int = 512,
+        flush_interval: float = 0.5,
+        overflow: str = "drop",
+        stdout: bool = False,
+        retention_days: Optional[int] = 30,
+        index: bool = True,
+    ):
+        """
+        初始化写入器并启动写入线程
+
+        Args:
+            log_dir: 日志根目录，其下创建 info 和 error 子目录
+            buffer_size: 环形缓冲区容量(条)
+            batch_size: 每批最多写入的记录数
+            flush_interval: 缓冲区为空时的最长等待时间(秒)
+            overflow: 缓冲区满时的策略，drop 丢弃新记录，block 阻塞等待
+            stdout: 是否同时输出到标准输出
+            retention_days: 日志文件保留天数，为空时不清理
+            index: 是否为日志文件维护请求UUID到字节偏移的旁路索引
+        """
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"不支持的缓冲区溢出策略: {overflow}")
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.stdout = stdout
+        self._buffer: Deque[LogEntry] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._info = _DailyFile(Path(log_dir) / "info", "info", retention_days, index)
+        self._error = _DailyFile(
+            Path(log_dir) / "error", "error", retention_days, index
+        )
+        self._stats = {"written": 0, "dropped": 0, "blocked": 0, "batches": 0}
+        self._thread = threading.Thread(
+            target=self._run, name="log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, message: Any) -> None:
+        """
+        loguru 接口：接收一条日志记录
+
+        Args:
+            message: loguru 的消息对象，通过 message.record 获取原始字段
+        """
+        record = message.record
+        entry = (
+            record["time"],
+            record["level"].no,
+            record["level"].name,
+            record["extra"].get("request_uuid"),
+            record["name"],
+            record["function"],
+            record["line"],
+            record["message"],
+            record["exception"],
+        )
+        with self._cond:
+            if len(self._buffer) >= self.buffer_size:
+                if self.overflow == "drop" or self._closed:
+                    self._stats["dropped"] += 1
+                    return
+                self._stats["blocked"] += 1
+                while len(self._buffer) >= self.buffer_size and not self._closed:
+                    self._cond.wait()
+            self._buffer.append(entry)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    def stop(self) -> None:
+        """loguru 接口：移除 sink 时调用，写完缓冲区后停止写入线程"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._info.close()
+        self._error.close()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "buffered": len(self._buffer)}
+
+    def _take_batch(self) -> List[LogEntry]:
+        with self._cond:
+            if not self._buffer and not self._closed:
+                self._cond.wait(self.flush_interval)
+            count = min(len(self._buffer), self.batch_size)
+            batch = [self._buffer.popleft() for _ in range(count)]
+            if batch and self.overflow == "block":
+                self._cond.notify_all()
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    # 写入失败不能影响业务线程，只在标准错误中提示
+                    sys.stderr.write(f"日志写入失败: {e}\n")
+            elif self._closed:
+                return
+
+    def _write_batch(self, batch: List[LogEntry]) -> None:
+        lines = [self._encode(entry) for entry in batch]
+        # 每条记录按自身日期写入，跨零点的批次会拆分到两天的文件
+        dates = [entry[0].date() for entry in batch]
+        for target, min_level in ((self._info, INFO_LEVEL), (self._error, ERROR_LEVEL)):
+            selected = [i for i, entry in enumerate(batch) if entry[1] >= min_level]
+            for date, group in groupby(selected, key=dates.__getitem__):
+                indices = list(group)
+                target.write(
+                    date.isoformat(),
+                    [lines[i] for i in indices],
+                    [batch[i][3] for i in indices],
+                )
+        if self.stdout:
+            sys.stdout.buffer.write(b"".join(lines))
+            sys.stdout.flush()
+        self._stats["written"] += len(batch)
+        self._stats["batches"] += 1
+
+    @staticmethod
+    def _encode(entry: LogEntry) -> bytes:
+        timestamp, _, level, request_id, name, function, line, message, exc = entry
+        data = {
+            # loguru 的时间是 datetime 子类，orjson 不直接支持，在写入线程中转换
+            "time": timestamp.isoformat(timespec="milliseconds"),
+            "level": level,
+            "uuid": request_id,
+            "logger": name,
+            "func": function,
+            "line": line,
+            "msg": message,
+        }
+        if exc is not None:
+            data["exc"] = "".join(
+                traceback.format_exception(exc.type, exc.value, exc.traceback)
+            )
+        return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def parse_retention_days(retention: str) -> Optional[int]:
+    """
+    从 "30 days" 形式的保留时间配置中解析天数
+
+    Args:
+        retention: 保留时间配置
+
+    Returns:
+        天数，无法解析时返回None
+    """
+    match = re.match(r"\s*(\d+)\s*(d|day|days)?\s*$", retention)
+    return int(match.group(1)) if match else None
@@ -7,13 +7,18 @@ import functools
 from datetime import datetime
 from pathlib import Path
 from loguru import logger
-from typing import Callable, Any, Dict, Optional
+from collections import OrderedDict
+from typing import Callable, Any, Dict, Optional, Tuple
 from app.core.setting import get_settings
+from app.core.log_writer import BatchedJSONSink, parse_retention_days
 
 from contextvars import ContextVar
 
 settings = get_settings()
 
+# 生产环境日志写入器
+_production_sink: Optional[BatchedJSONSink] = None
+
 # 添加上下文变量存储请求UUID
 request_uuid: ContextVar[Optional[str]] = ContextVar("request_uuid", default=None)
 
@@ -37,6 +42,9 @@ def log_request(
     """
     记录请求信息的装饰器，自动为请求生成UUID并绑定到所有日志
 
+    HTTP 请求已由 RequestIDMiddleware 统一分配请求ID并记录开始/结束日志，
+    此时装饰器直接调用原函数；仅在中间件之外(如脚本、后台任务)才生成UUID
+
     Args:
         url: 请求的URL
         params: 请求参数
@@ -49,6 +57,9 @@ def log_request(
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         async def async_wrapper(*args, **kwargs):
+            if get_request_uuid() is not None:
+                return await func(*args, **kwargs)
+
             # 生成UUID并设置到上下文
             req_uuid = str(uuid.uuid4())
             set_request_uuid(req_uuid)
@@ -86,6 +97,9 @@ def log_request(
 
         @functools.wraps(func)
         def sync_wrapper(*args, **kwargs):
+            if get_request_uuid() is not None:
+                return func(*args, **kwargs)
+
             # 生成UUID并设置到上下文
             req_uuid = str(uuid.uuid4())
             set_request_uuid(req_uuid)
@@ -127,6 +141,20 @@ def log_request(
     return decorator
 
 
+# 按请求UUID缓存已绑定的 logger，同一请求内的日志无需重复 bind
+_BOUND_LOGGER_CACHE_SIZE = 1024
+_bound_loggers: "OrderedDict[str, Any]" = OrderedDict()
+
+
+def _bound_logger(uuid_str: str):
+    bound = _bound_loggers.get(uuid_str)
+    if bound is None:
+        bound = _bound_loggers[uuid_str] = logger.bind(request_uuid=uuid_str)
+        if len(_bound_loggers) > _BOUND_LOGGER_CACHE_SIZE:
+            _bound_loggers.popitem(last=False)
+    return bound
+
+
 # 替换原有的log_with_uuid函数，使用更函数式的方法
 def get_logger():
     """
@@ -135,8 +163,7 @@ def get_logger():
     Returns:
         绑定了当前请求UUID的logger实例
     """
-    uuid_str = get_request_uuid()
-    return logger.bind(request_uuid=uuid_str if uuid_str else "无UUID")
+    return _bound_logger(get_request_uuid() or "无UUID")
 
 
 # 定义常用日志级别的快捷函数
@@ -168,46 +195,107 @@ class InterceptHandler(logging.Handler):
     1. 继承自 logging.Handler
     2. 重写 emit 方法处理日志记录
     3. 将标准库日志转换为 Loguru 格式
+
+    低于 Loguru 输出阈值的记录在 Handler 级别直接跳过；级别映射和调用栈深度
+    (按调用位置)均缓存，已绑定请求UUID的 logger 复用
     """
 
-    def emit(self, record: logging.LogRecord) -> None:
-        # 尝试获取日志级别名称
-        try:
-            level = logger.level(record.levelname).name
-        except ValueError:
-            level = record.levelno
+    # 标准库级别数值 -> Loguru 级别名称
+    _levels: Dict[int, Any] = {}
+    # (文件, 行号) -> 调用栈深度
+    _depths: Dict[Tuple[str, int], int] = {}
+    _MAX_CACHED_DEPTHS = 4096
+
+    def __init__(self, level: int = logging.NOTSET):
+        """
+        初始化拦截处理器
+
+        Args:
+            level: 最低处理级别，通常与 Loguru 输出的最低级别一致
+        """
+        super().__init__(level)
 
-        # 获取调用帧信息
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:
-            frame = frame.f_back
-            depth += 1
+    @classmethod
+    def _level(cls, record: logging.LogRecord) -> Any:
+        level = cls._levels.get(record.levelno)
+        if level is None:
+            try:
+                level = logger.level(record.levelname).name
+            except ValueError:
+                level = record.levelno
+            cls._levels[record.levelno] = level
+        return level
+
+    @classmethod
+    def _depth(cls, record: logging.LogRecord) -> int:
+        key = (record.pathname, record.lineno)
+        depth = cls._depths.get(key)
+        if depth is None:
+            # 同一调用位置经过的 logging 内部栈帧相同，只需计算一次
+            frame, depth = sys._getframe(2), 1
+            while frame and frame.f_code.co_filename == logging.__file__:
+                frame = frame.f_back
+                depth += 1
+            if len(cls._depths) >= cls._MAX_CACHED_DEPTHS:
+                cls._depths.clear()
+            cls._depths[key] = depth
+        return depth
 
-        # 获取当前请求UUID并绑定到日志
-        uuid_str = get_request_uuid()
-        log_instance = logger.bind(request_uuid=uuid_str if uuid_str else "无UUID")
+    def emit(self, record: logging.LogRecord) -> None:
+        # 获取当前请求UUID对应的 logger 并记录日志
+        _bound_logger(get_request_uuid() or "无UUID").opt(
+            depth=self._depth(record), exception=record.exc_info
+        ).log(self._level(record), record.getMessage())
 
-        # 使用 Loguru 记录日志
-        log_instance.opt(depth=depth, exception=record.exc_info).log(
-            level, record.getMessage()
-        )
 
+def _log_profile() -> str:
+    """获取日志方案，未配置时根据应用运行环境选择"""
+    profile = settings.logger.PROFILE or settings.app.ENVIRONMENT.value
+    return "production" if profile == "production" else "development"
 
-# 使用更函数式的方法重构setup_logging
-async def setup_logging():
-    """
-    配置日志系统
 
-    功能：
-    1. 控制台彩色输出
-    2. 文件日志轮转
-    3. 错误日志单独存储
-    4. 异步日志记录
-    5. 请求UUID跟踪
+def _add_production_sink() -> None:
     """
-    # 步骤1：移除默认处理器
+    生产环境日志方案：关闭 diagnose 和彩色格式化，所有记录交给一个批量写入线程，
+    编码为 JSON 行后按级别分发到 info/error 文件
+    """
+    global _production_sink
+    config = settings.logger
+    _production_sink = BatchedJSONSink(
+        log_dir=str(Path(config.BASE_DIR) / "logs"),
+        buffer_size=config.BUFFER_SIZE,
+        batch_size=config.BATCH_SIZE,
+        flush_interval=config.FLUSH_INTERVAL,
+        overflow=config.OVERFLOW,
+        stdout=config.JSON_STDOUT,
+        retention_days=parse_retention_days(config.LOG_RETENTION),
+        index=config.INDEX,
+    )
+    logger.add(
+        _production_sink,
+        format="{message}",
+        level="DEBUG" if config.DEBUG else "INFO",
+        enqueue=False,  # 写入器自带缓冲与写入线程
+        backtrace=False,
+        diagnose=False,
+        colorize=False,
+    )
+
+
+def get_production_sink() -> Optional[BatchedJSONSink]:
+    """获取生产环境日志写入器，未使用生产方案时返回None"""
+    return _production_sink
+
+
+def close_logging() -> None:
+    """移除所有日志输出，生产方案下会写完缓冲区中的日志，在应用关闭时调用"""
+    global _production_sink
     logger.remove()
+    _production_sink = None
+
 
+async def _add_development_sinks() -> None:
+    """开发环境日志方案：彩色控制台输出，info/error 文件分别按日期轮转"""
     # 步骤2：定义日志格式，添加UUID信息
     log_format = (
         # 时间信息
@@ -289,13 +377,40 @@ async def setup_logging():
         filter=ensure_request_uuid,
     )
 
+
+# 使用更函数式的方法重构setup_logging
+async def setup_logging():
+    """
+    配置日志系统
+
+    功能：
+    1. 控制台彩色输出
+    2. 文件日志轮转
+    3. 错误日志单独存储
+    4. 异步日志记录
+    5. 请求UUID跟踪
+    6. 生产环境使用批量写入的 JSON 行日志
+    """
+    # 步骤1：移除默认处理器
+    logger.remove()
+
+    # 步骤2~6：按日志方案配置输出
+    if _log_profile() == "production":
+        _add_production_sink()
+    else:
+        await _add_development_sinks()
+
     # 步骤7：首先配置标准库日志
-    logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
+    # 根日志器的级别与 Loguru 输出阈值一致，低于阈值的第三方日志不会创建记录
+    threshold = logging.DEBUG if settings.logger.DEBUG else logging.INFO
+    logging.basicConfig(
+        handlers=[InterceptHandler(threshold)], level=threshold, force=True
+    )
 
     # 步骤8：确保拦截所有第三方库日志
     for _log in logging.Logger.manager.loggerDict.values():
         if isinstance(_log, logging.Logger):
-            _log.handlers = [InterceptHandler()]
+            _log.handlers = [InterceptHandler(threshold)]
             _log.propagate = False
             _log.level = 0
 
@@ -309,7 +424,7 @@ async def setup_logging():
         "fastapi.error",
     ]:
         _logger = logging.getLogger(logger_name)
-        _logger.handlers = [InterceptHandler()]
+        _logger.handlers = [InterceptHandler(threshold)]
         _logger.propagate = False
         _logger.level = 0
 
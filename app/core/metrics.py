@@ -0,0 +1,520 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import time
+from app.core.setting import get_settings
+from app.core.jobs import get_job_manager
+
+# 默认的延迟分桶(秒)，覆盖从毫秒级接口到分钟级长回复
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+# 流式片段间隔与排队时间的分桶(秒)
+GAP_BUCKETS: Tuple[float, ...] = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+# 生成速率的分桶(token/秒)
+RATE_BUCKETS: Tuple[float, ...] = (1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500)
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 指标样本：(名称后缀, 标签, 值)
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Metric(ABC):
+    """
+    指标基类 - 每组标签值对应一个序列，保存在以标签值元组为键的字典中
+
+    记录均在事件循环线程内完成且中间没有 await，因此无需加锁
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        """
+        初始化指标
+
+        Args:
+            name: 指标名称
+            help: 指标说明
+            labelnames: 标签名称，记录时按相同顺序传入标签值
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, values: Tuple[str, ...]) -> Tuple[Tuple[str, str], ...]:
+        return tuple(zip(self.labelnames, values))
+
+    @abstractmethod
+    def samples(self) -> Iterator[Sample]:
+        """导出所有序列的样本：(指标名后缀, 标签, 值)"""
+        pass
+
+
+class Counter(Metric):
+    """只增计数器"""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """
+        增加计数
+
+        Args:
+            labels: 标签值
+            amount: 增加的数量
+        """
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, value in self._values.items():
+            yield "", self._labels(labels), value
+
+
+class Gauge(Metric):
+    """
+    瞬时值指标，可直接增减，也可以在导出时通过函数取值
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ):
+        """
+        初始化指标
+
+        Args:
+            name: 指标名称
+            help: 指标说明
+            labelnames: 标签名称
+            function: 导出时调用的取值函数，仅用于无标签的指标
+        """
+        super().__init__(name, help, labelnames)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def samples(self) -> Iterator[Sample]:
+        if self.function is not None:
+            yield "", (), self.function()
+            return
+        for labels, value in self._values.items():
+            yield "", self._labels(labels), value
+
+
+class Histogram(Metric):
+    """
+    固定分桶直方图 - 每个序列保存各桶的计数(非累积)、总和与总数，
+    记录时二分查找所在的桶，导出时再累加为 Prometheus 的累积分桶
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        """
+        初始化直方图
+
+        Args:
+            name: 指标名称
+            help: 指标说明
+            labelnames: 标签名称
+            buckets: 各桶上限，自动排序，+Inf 桶隐含存在
+        """
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != float("inf")))
+        # 每个序列为 [各桶计数..., +Inf 桶计数, 总和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        记录一个观测值
+
+        Args:
+            value: 观测值
+            labels: 标签值
+        """
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterator[Sample]:
+        bounds = [*self.buckets, float("inf")]
+        for labels, series in self._series.items():
+            base = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                yield "_bucket", base + (("le", _format_value(bound)),), cumulative
+            yield "_sum", base, series[-1]
+            yield "_count", base, cumulative
+
+
+class MetricsRegistry:
+    """指标注册表，按注册顺序导出为 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, function))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        导出所有指标
+
+        Returns:
+            Prometheus 文本格式(0.0.4)
+        """
+        lines = []
+        for metric in self._metrics.values():
+            help_text = metric.help.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"# HELP {metric.name} {help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                if labels:
+                    label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    name = f"{metric.name}{suffix}{{{label_text}}}"
+                else:
+                    name = f"{metric.name}{suffix}"
+                lines.append(f"{name} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+class ServiceMetrics:
+    """
+    服务指标 - 接口延迟、上游延迟、重试与错误、活跃流数量及后台任务队列
+
+    模型名称来自客户端请求，超过上限的新模型名归入 other，防止序列数量无限增长
+    """
+
+    def __init__(
+        self,
+        registry: Optional[MetricsRegistry] = None,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        max_models: int = 64,
+        job_stats: Optional[Callable[[], Dict[str, Any]]] = None,
+    ):
+        """
+        初始化服务指标
+
+        Args:
+            registry: 指标注册表，默认新建
+            buckets: 延迟直方图的分桶(秒)
+            max_models: 模型标签最多的取值数量
+            job_stats: 返回后台任务统计信息的函数，用于导出队列深度
+        """
+        self.registry = registry or MetricsRegistry()
+        self.max_models = max_models
+        self._models: set = set()
+        r = self.registry
+        self.http_requests = r.counter(
+            "http_requests_total", "HTTP 请求数", ("route", "method", "status")
+        )
+        self.http_latency = r.histogram(
+            "http_request_duration_seconds",
+            "HTTP 请求耗时(含流式响应的完整传输)",
+            ("route", "method"),
+            buckets,
+        )
+        self.upstream_requests = r.counter(
+            "chat_upstream_requests_total",
+            "上游请求数(每次尝试计一次)",
+            ("model", "outcome"),
+        )
+        self.upstream_latency = r.histogram(
+            "chat_upstream_duration_seconds",
+            "单次上游请求耗时",
+            ("model",),
+            buckets,
+        )
+        self.upstream_attempts = r.counter(
+            "chat_upstream_attempts_total", "聊天请求的上游尝试次数", ("model",)
+        )
+        self.upstream_retries = r.counter(
+            "chat_upstream_retries_total", "聊天请求的重试次数", ("model",)
+        )
+        self.upstream_errors = r.counter(
+            "chat_upstream_errors_total", "上游错误数", ("model", "error")
+        )
+        self.chat_failures = r.counter(
+            "chat_requests_failed_total", "重试用尽仍失败的聊天请求数", ("model",)
+        )
+        self.active_streams = r.gauge("chat_active_streams", "正在推送的流式响应数")
+        self.stream_ttfb = r.histogram(
+            "chat_stream_ttfb_seconds",
+            "流式请求从发出到收到上游首个字节的时间",
+            ("model",),
+            buckets,
+        )
+        self.stream_ttft = r.histogram(
+            "chat_stream_ttft_seconds",
+            "流式请求从发出到收到上游首个内容片段的时间",
+            ("model",),
+            buckets,
+        )
+        self.stream_gap = r.histogram(
+            "chat_stream_inter_token_seconds",
+            "上游相邻内容片段的间隔",
+            ("model",),
+            GAP_BUCKETS,
+        )
+        self.stream_rate = r.histogram(
+            "chat_stream_tokens_per_second",
+            "上游首个内容片段之后的生成速率(估算 token 数)",
+            ("model",),
+            RATE_BUCKETS,
+        )
+        self.stream_backpressure = r.counter(
+            "chat_stream_backpressure_seconds_total",
+            "下游消费变慢导致上游读取暂停的累计时间",
+            ("model",),
+        )
+        self.stream_queue_wait = r.histogram(
+            "chat_stream_queue_wait_seconds",
+            "内容片段在服务端队列中等待推送的时间",
+            ("model",),
+            GAP_BUCKETS,
+        )
+        if job_stats is not None:
+            r.gauge(
+                "job_queue_depth",
+                "后台任务队列中等待的任务数",
+                function=lambda: job_stats()["queue_depth"],
+            )
+            r.gauge(
+                "job_running",
+                "正在执行的后台任务数",
+                function=lambda: job_stats()["running"],
+            )
+
+    def model_label(self, model: str) -> str:
+        """获取模型标签值，超出数量上限的新模型返回 other"""
+        if model in self._models:
+            return model
+        if len(self._models) >= self.max_models:
+            return "other"
+        self._models.add(model)
+        return model
+
+    def observe_request(
+        self, route: str, method: str, status: int, seconds: float
+    ) -> None:
+        """
+        记录一次 HTTP 请求
+
+        Args:
+            route: 路由模板，如 /chat/sessions/{session_id}
+            method: 请求方法
+            status: 响应状态码
+            seconds: 耗时
+        """
+        self.http_requests.inc(route, method, str(status))
+        self.http_latency.observe(seconds, route, method)
+
+    def observe_upstream(self, model: str, outcome: str, seconds: float) -> None:
+        """
+        记录一次上游请求
+
+        Args:
+            model: 模型名称
+            outcome: 结果，success、error 或 cancelled
+            seconds: 耗时
+        """
+        model = self.model_label(model)
+        self.upstream_requests.inc(model, outcome)
+        if outcome != "cancelled":
+            self.upstream_latency.observe(seconds, model)
+
+    @contextmanager
+    def upstream_call(self, model: str) -> Iterator[None]:
+        """
+        记录代码块内的一次上游请求：正常结束为 success，被取消(如对冲失败方)
+        为 cancelled，其余异常为 error
+
+        Args:
+            model: 模型名称
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "success"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self.observe_upstream(model, outcome, time.perf_counter() - started)
+
+    def observe_retry_info(self, model: str, retry_info: Dict[str, Any]) -> None:
+        """
+        记录一次聊天请求的重试信息
+
+        Args:
+            model: 模型名称
+            retry_info: 代理的重试信息
+        """
+        attempts = retry_info.get("attempts") or 0
+        if not attempts or retry_info.get("coalesced"):
+            # 缓存命中或共享他人的上游请求，没有实际的上游尝试
+            return
+        model = self.model_label(model)
+        self.upstream_attempts.inc(model, amount=attempts)
+        if attempts > 1:
+            self.upstream_retries.inc(model, amount=attempts - 1)
+        for error in retry_info.get("errors", ()):
+            # 只取错误类型("HTTP 429"、"ReadTimeout")，不含具体消息
+            self.upstream_errors.inc(model, error.split(":", 1)[0])
+        if not retry_info.get("success"):
+            self.chat_failures.inc(model)
+
+    def observe_stream(
+        self,
+        model: str,
+        ttfb: Optional[float],
+        ttft: Optional[float],
+        gaps: Sequence[float],
+        tokens_per_second: Optional[float],
+        backpressure: float,
+    ) -> None:
+        """
+        记录一次成功的上游流式请求的时间线
+
+        Args:
+            model: 模型名称
+            ttfb: 首字节时间(秒)，没有收到数据时为空
+            ttft: 首个内容片段时间(秒)，没有内容时为空
+            gaps: 相邻内容片段的间隔(秒)
+            tokens_per_second: 生成速率，无法计算时为空
+            backpressure: 上游读取因背压暂停的时间(秒)
+        """
+        model = self.model_label(model)
+        if ttfb is not None:
+            self.stream_ttfb.observe(ttfb, model)
+        if ttft is not None:
+            self.stream_ttft.observe(ttft, model)
+        for gap in gaps:
+            self.stream_gap.observe(gap, model)
+        if tokens_per_second is not None:
+            self.stream_rate.observe(tokens_per_second, model)
+        if backpressure:
+            self.stream_backpressure.inc(model, amount=backpressure)
+
+    def observe_delivery(self, model: str, waits: Sequence[float]) -> None:
+        """
+        记录一次流式响应中各片段在服务端队列中的等待时间
+
+        Args:
+            model: 模型名称
+            waits: 各片段的排队时间(秒)
+        """
+        model = self.model_label(model)
+        for wait in waits:
+            self.stream_queue_wait.observe(wait, model)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+@lru_cache()
+def get_metrics() -> ServiceMetrics:
+    """获取全局服务指标"""
+    config = get_settings().metrics
+    return ServiceMetrics(
+        buckets=config.LATENCY_BUCKETS or DEFAULT_LATENCY_BUCKETS,
+        max_models=config.MAX_MODELS,
+        job_stats=lambda: get_job_manager().stats,
+    )
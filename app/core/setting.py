@@ -84,6 +84,20 @@ class LOGGERConfig(BaseSettings):
     LOG_ROTATION: str = Field(default="00:00", env="LOG_ROTATION")
     LOG_RETENTION: str = Field(default="30 days", env="LOG_RETENTION")
     LOG_COMPRESSION: str = Field(default="zip", env="LOG_COMPRESSION")
+    # 请求ID与请求日志配置，REQUEST_LOG_SAMPLE_RATE 为请求开始日志的采样比例
+    REQUEST_ID_HEADER: str = Field(default="X-Request-ID", env="REQUEST_ID_HEADER")
+    TRUST_REQUEST_ID: bool = Field(default=True, env="TRUST_REQUEST_ID")
+    REQUEST_LOG_SAMPLE_RATE: float = Field(default=1.0, env="REQUEST_LOG_SAMPLE_RATE")
+    # 日志方案：development 或 production，为空时跟随 APP_ENVIRONMENT
+    # 生产方案输出 JSON 行，OVERFLOW 为缓冲区满时的策略(drop 或 block)
+    PROFILE: str = Field(default="", env="PROFILE")
+    BUFFER_SIZE: int = Field(default=65536, env="BUFFER_SIZE")
+    BATCH_SIZE: int = Field(default=512, env="BATCH_SIZE")
+    FLUSH_INTERVAL: float = Field(default=0.5, env="FLUSH_INTERVAL")
+    OVERFLOW: str = Field(default="drop", env="OVERFLOW")
+    JSON_STDOUT: bool = Field(default=False, env="JSON_STDOUT")
+    # 生产方案是否为日志文件维护请求UUID索引(供 scripts/log_search.py 使用)
+    INDEX: bool = Field(default=True, env="INDEX")
     model_config = SettingsConfigDict(env_prefix="LOGGER_")
 
 
@@ -96,8 +110,143 @@ class ChatConfig(BaseSettings):
         default="https://api.openai.com/v1", env="SHAREAI_BASE_URL"
     )
     OPENAI_MODEL: str = Field(default="gpt-4o-mini", env="OPENAI_MODEL")
+    # 多上游负载均衡，JSON 列表，如 [{"base_url": "...", "api_key": "...", "weight": 2}]
+    # 为空时只使用 SHAREAI_BASE_URL 和 SHAREAI_API_KEY
+    UPSTREAMS: List[Dict[str, Any]] = Field(default=[], env="UPSTREAMS")
     MAX_RETRIES: int = Field(default=3, env="MAX_RETRIES")
     RETRY_DELAY: float = Field(default=1.0, env="RETRY_DELAY")
+    RETRY_MAX_DELAY: float = Field(default=30.0, env="RETRY_MAX_DELAY")
+    # 单个请求所有重试的总时间预算(秒)，0 表示不限制
+    RETRY_DEADLINE: float = Field(default=120.0, env="RETRY_DEADLINE")
+
+    # 上游连接池配置
+    HTTP2: bool = Field(default=True, env="HTTP2")
+    POOL_MAX_CONNECTIONS: int = Field(default=100, env="POOL_MAX_CONNECTIONS")
+    POOL_MAX_KEEPALIVE: int = Field(default=20, env="POOL_MAX_KEEPALIVE")
+    POOL_KEEPALIVE_EXPIRY: float = Field(default=30.0, env="POOL_KEEPALIVE_EXPIRY")
+    CONNECT_TIMEOUT: float = Field(default=10.0, env="CONNECT_TIMEOUT")
+    READ_TIMEOUT: float = Field(default=60.0, env="READ_TIMEOUT")
+    WRITE_TIMEOUT: float = Field(default=10.0, env="WRITE_TIMEOUT")
+    POOL_TIMEOUT: float = Field(default=10.0, env="POOL_TIMEOUT")
+
+    # 上游熔断配置
+    BREAKER_FAILURE_THRESHOLD: int = Field(default=5, env="BREAKER_FAILURE_THRESHOLD")
+    BREAKER_RECOVERY_TIME: float = Field(default=30.0, env="BREAKER_RECOVERY_TIME")
+    BREAKER_HALF_OPEN_CALLS: int = Field(default=1, env="BREAKER_HALF_OPEN_CALLS")
+
+    # 上游自适应并发限制配置
+    LIMIT_INITIAL: int = Field(default=20, env="LIMIT_INITIAL")
+    LIMIT_MIN: int = Field(default=1, env="LIMIT_MIN")
+    LIMIT_MAX: int = Field(default=200, env="LIMIT_MAX")
+    LIMIT_LATENCY_TOLERANCE: float = Field(default=2.0, env="LIMIT_LATENCY_TOLERANCE")
+    LIMIT_QUEUE_TIMEOUT: float = Field(default=1.0, env="LIMIT_QUEUE_TIMEOUT")
+
+    # 对冲请求配置
+    HEDGE_PERCENTILE: float = Field(default=0.95, env="HEDGE_PERCENTILE")
+    HEDGE_MIN_DELAY: float = Field(default=0.2, env="HEDGE_MIN_DELAY")
+    HEDGE_MAX_DELAY: float = Field(default=10.0, env="HEDGE_MAX_DELAY")
+    HEDGE_DEFAULT_DELAY: float = Field(default=2.0, env="HEDGE_DEFAULT_DELAY")
+    HEDGE_BUDGET_RATIO: float = Field(default=0.1, env="HEDGE_BUDGET_RATIO")
+
+    # 流式响应缓冲队列长度
+    STREAM_QUEUE_SIZE: int = Field(default=256, env="STREAM_QUEUE_SIZE")
+
+    # 补全缓存配置，CACHE_DISK_DIR 为空时只使用内存缓存
+    CACHE_ENABLED: bool = Field(default=True, env="CACHE_ENABLED")
+    CACHE_MAX_ENTRIES: int = Field(default=1024, env="CACHE_MAX_ENTRIES")
+    CACHE_TTL: float = Field(default=3600.0, env="CACHE_TTL")
+    CACHE_DISK_DIR: str = Field(default="", env="CACHE_DISK_DIR")
+    CACHE_DISK_MAX_ENTRIES: int = Field(default=100000, env="CACHE_DISK_MAX_ENTRIES")
+
+    # 合并相同的并发请求
+    COALESCE_ENABLED: bool = Field(default=True, env="COALESCE_ENABLED")
+
+    # 上下文窗口裁剪配置，CONTEXT_WINDOWS 为模型名前缀到窗口大小的映射，覆盖内置值
+    CONTEXT_TRIM_ENABLED: bool = Field(default=True, env="CONTEXT_TRIM_ENABLED")
+    CONTEXT_RESERVE_TOKENS: int = Field(default=1024, env="CONTEXT_RESERVE_TOKENS")
+    CONTEXT_DEFAULT_WINDOW: int = Field(default=8192, env="CONTEXT_DEFAULT_WINDOW")
+    CONTEXT_WINDOWS: Dict[str, int] = Field(default={}, env="CONTEXT_WINDOWS")
+    CONTEXT_CACHE_ENTRIES: int = Field(default=65536, env="CONTEXT_CACHE_ENTRIES")
+
+    # 批量聊天配置
+    BATCH_MAX_ITEMS: int = Field(default=500, env="BATCH_MAX_ITEMS")
+    BATCH_CONCURRENCY: int = Field(default=16, env="BATCH_CONCURRENCY")
+
+
+class JobConfig(BaseSettings):
+    """后台任务配置"""
+
+    WORKERS: int = Field(default=8, env="WORKERS")
+    MAX_QUEUE: int = Field(default=1000, env="MAX_QUEUE")
+    RESULT_TTL: float = Field(default=3600.0, env="RESULT_TTL")
+
+    model_config = SettingsConfigDict(env_prefix="JOB_")
+
+
+class WebhookConfig(BaseSettings):
+    """异步任务回调配置"""
+
+    MAX_PER_HOST: int = Field(default=8, env="MAX_PER_HOST")
+    MAX_IN_FLIGHT: int = Field(default=256, env="MAX_IN_FLIGHT")
+    MAX_RETRIES: int = Field(default=3, env="MAX_RETRIES")
+    RETRY_DELAY: float = Field(default=0.5, env="RETRY_DELAY")
+    TIMEOUT: float = Field(default=10.0, env="TIMEOUT")
+    QUEUE_SIZE: int = Field(default=10000, env="QUEUE_SIZE")
+    BATCH_SIZE: int = Field(default=64, env="BATCH_SIZE")
+    DEAD_LETTER_FILE: str = Field(
+        default="logs/webhook_dead_letter.jsonl", env="DEAD_LETTER_FILE"
+    )
+    # 允许回调的主机名，JSON 列表；为空时允许任意解析到公网地址的主机
+    ALLOWED_HOSTS: List[str] = Field(default=[], env="ALLOWED_HOSTS")
+    ALLOW_PRIVATE: bool = Field(default=False, env="ALLOW_PRIVATE")
+
+    model_config = SettingsConfigDict(env_prefix="WEBHOOK_")
+
+
+class SessionConfig(BaseSettings):
+    """服务端会话配置，PERSIST_DIR 为空时只保存在内存中"""
+
+    MAX_SESSIONS: int = Field(default=10000, env="MAX_SESSIONS")
+    MAX_BYTES: int = Field(default=256 * 1024 * 1024, env="MAX_BYTES")
+    TTL: float = Field(default=86400.0, env="TTL")
+    PERSIST_DIR: str = Field(default="", env="PERSIST_DIR")
+
+    model_config = SettingsConfigDict(env_prefix="SESSION_")
+
+
+class RateLimitConfig(BaseSettings):
+    """入站限流配置，速率单位为每秒请求数"""
+
+    ENABLED: bool = Field(default=True, env="ENABLED")
+    KEY_HEADER: str = Field(default="X-API-Key", env="KEY_HEADER")
+    # 已登记的客户端密钥，JSON 列表；请求头中的密钥在列表中时才按密钥限流，否则按IP
+    API_KEYS: List[str] = Field(default=[], env="API_KEYS")
+    TRUST_FORWARDED: bool = Field(default=False, env="TRUST_FORWARDED")
+    COMPLETIONS_RATE: float = Field(default=5.0, env="COMPLETIONS_RATE")
+    COMPLETIONS_BURST: float = Field(default=20.0, env="COMPLETIONS_BURST")
+    STREAM_RATE: float = Field(default=2.0, env="STREAM_RATE")
+    STREAM_BURST: float = Field(default=10.0, env="STREAM_BURST")
+    ASYNC_RATE: float = Field(default=10.0, env="ASYNC_RATE")
+    ASYNC_BURST: float = Field(default=50.0, env="ASYNC_BURST")
+    # 批量接口每个请求计一次，与条数无关；单个请求的条数受聊天配置 BATCH_MAX_ITEMS 限制，
+    # 因此每个客户端的上游请求速率上限约为 BATCH_RATE × 聊天配置的 BATCH_MAX_ITEMS
+    BATCH_RATE: float = Field(default=0.1, env="BATCH_RATE")
+    BATCH_BURST: float = Field(default=2.0, env="BATCH_BURST")
+    IDLE_TTL: float = Field(default=300.0, env="IDLE_TTL")
+    MAX_BUCKETS: int = Field(default=100000, env="MAX_BUCKETS")
+
+    model_config = SettingsConfigDict(env_prefix="RATE_LIMIT_")
+
+
+class MetricsConfig(BaseSettings):
+    """指标配置，LATENCY_BUCKETS 为延迟直方图的分桶上限(秒)，为空时使用内置分桶"""
+
+    ENABLED: bool = Field(default=True, env="ENABLED")
+    PATH: str = Field(default="/metrics", env="PATH")
+    LATENCY_BUCKETS: List[float] = Field(default=[], env="LATENCY_BUCKETS")
+    MAX_MODELS: int = Field(default=64, env="MAX_MODELS")
+
+    model_config = SettingsConfigDict(env_prefix="METRICS_")
 
 
 class Settings(BaseSettings):
@@ -111,6 +260,11 @@ class Settings(BaseSettings):
     cors: CORSConfig = CORSConfig()
     logger: LOGGERConfig = LOGGERConfig()
     chat: ChatConfig = ChatConfig()  # 聊天代理配置
+    job: JobConfig = JobConfig()  # 后台任务配置
+    webhook: WebhookConfig = WebhookConfig()  # 异步任务回调配置
+    rate_limit: RateLimitConfig = RateLimitConfig()  # 入站限流配置
+    session: SessionConfig = SessionConfig()  # 服务端会话配置
+    metrics: MetricsConfig = MetricsConfig()  # 指标配置
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
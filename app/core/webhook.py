@@ -0,0 +1,332 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from contextlib import asynccontextmanager
+from pathlib import Path
+import asyncio
+import ipaddress
+import random
+import socket
+import time
+import httpx
+import orjson
+from app.core.setting import get_settings, WebhookConfig
+from app.core.logger import log_warning, log_error
+
+
+class _HostLimit:
+    """单个目标主机的并发名额及当前使用者数量"""
+
+    __slots__ = ("semaphore", "users")
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class CallbackDispatcher:
+    """
+    回调投递器 - 通过复用的连接池批量投递异步任务结果
+
+    每个目标主机的并发数有上限，失败按指数退避重试，
+    最终无法投递的结果写入死信文件
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = 8,
+        max_in_flight: int = 256,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+        timeout: float = 10.0,
+        queue_size: int = 10000,
+        batch_size: int = 64,
+        dead_letter_file: str = "logs/webhook_dead_letter.jsonl",
+        allowed_hosts: Optional[List[str]] = None,
+        allow_private: bool = False,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        """
+        初始化投递器
+
+        Args:
+            max_per_host: 每个目标主机的最大并发投递数
+            max_in_flight: 所有主机合计的最大未完成投递数，达到上限时暂停从队列取出
+            max_retries: 最大尝试次数
+            retry_delay: 首次重试的基础间隔(秒)
+            timeout: 单次投递超时时间(秒)
+            queue_size: 待投递队列的最大长度
+            batch_size: 每批从队列中取出的最大回调数
+            dead_letter_file: 死信文件路径
+            allowed_hosts: 允许回调的主机名列表，为空时允许任意公网地址
+            allow_private: 是否允许回调到内网、回环等非公网地址
+            client: 自定义HTTP客户端，便于对接本地测试桩
+        """
+        self.max_per_host = max_per_host
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dead_letter_file = Path(dead_letter_file)
+        self.allowed_hosts = {host.lower() for host in allowed_hosts or []}
+        self.allow_private = allow_private
+        self._client = client
+        self._owns_client = client is None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: "set[asyncio.Task]" = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._host_limits: Dict[str, _HostLimit] = {}
+        self._stats = {
+            "enqueued": 0,
+            "delivered": 0,
+            "retries": 0,
+            "dead_lettered": 0,
+            "latency_total": 0.0,
+        }
+
+    @classmethod
+    def from_config(cls, config: WebhookConfig) -> "CallbackDispatcher":
+        """根据回调配置创建投递器"""
+        return cls(
+            max_per_host=config.MAX_PER_HOST,
+            max_in_flight=config.MAX_IN_FLIGHT,
+            max_retries=config.MAX_RETRIES,
+            retry_delay=config.RETRY_DELAY,
+            timeout=config.TIMEOUT,
+            queue_size=config.QUEUE_SIZE,
+            batch_size=config.BATCH_SIZE,
+            dead_letter_file=config.DEAD_LETTER_FILE,
+            allowed_hosts=config.ALLOWED_HOSTS,
+            allow_private=config.ALLOW_PRIVATE,
+        )
+
+    def start(self) -> None:
+        """启动投递协程，需在事件循环中调用"""
+        if self._task is not None:
+            return
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=None,
+                    max_keepalive_connections=self.max_per_host * 4,
+                ),
+            )
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        停止投递器，尽量投递完队列中的回调
+
+        Args:
+            timeout: 等待剩余回调投递完成的最长时间(秒)
+        """
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            log_warning(f"回调投递器关闭超时，剩余 {self._queue.qsize()} 条未投递")
+        self._task.cancel()
+        await asyncio.gather(self._task, *self._inflight, return_exceptions=True)
+        self._task = None
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def validate(self, url: str) -> None:
+        """
+        校验回调地址，防止客户端借回调访问内网服务(SSRF)
+
+        Args:
+            url: 回调地址
+
+        Raises:
+            ValueError: 地址不是 http(s)、主机不在允许列表中或解析到非公网地址
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError("回调地址必须是 http 或 https URL")
+        host = parts.hostname.lower()
+        if self.allowed_hosts:
+            if host not in self.allowed_hosts:
+                raise ValueError(f"回调主机不在允许列表中: {host}")
+            # 允许列表中的主机由运维显式配置，不再检查地址范围
+            return
+        if self.allow_private:
+            return
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, parts.port, type=socket.SOCK_STREAM
+            )
+        except (socket.gaierror, UnicodeError) as e:
+            raise ValueError(f"无法解析回调主机: {host}") from e
+        for info in infos:
+            ip = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+            if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+                ip = ip.ipv4_mapped
+            if not ip.is_global or ip.is_multicast:
+                raise ValueError(f"回调地址不能指向内网或保留地址: {host}")
+
+    async def enqueue(self, url: str, payload: Dict[str, Any]) -> None:
+        """
+        加入待投递队列，队列满时等待
+
+        Args:
+            url: 回调地址
+            payload: 回调内容
+        """
+        if self._task is None:
+            self.start()
+        await self._queue.put((url, payload))
+        self._stats["enqueued"] += 1
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取投递统计信息
+
+        Returns:
+            入队、成功、重试、死信数量，平均投递耗时及当前队列状态
+        """
+        stats = dict(self._stats)
+        latency_total = stats.pop("latency_total")
+        delivered = stats["delivered"]
+        stats["avg_latency"] = round(latency_total / delivered, 4) if delivered else 0.0
+        stats["queued"] = self._queue.qsize() if self._queue else 0
+        stats["in_flight"] = len(self._inflight)
+        return stats
+
+    async def _drain(self) -> None:
+        await self._queue.join()
+        while self._inflight:
+            await asyncio.gather(*list(self._inflight), return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            # 每条回调先占用一个投递名额再出队，名额用完时回调留在有界队列中，
+            # 入队方因此受到背压，而不是无限创建投递任务
+            await self._slots.acquire()
+            try:
+                batch: List[Tuple[str, Dict[str, Any]]] = [await self._queue.get()]
+            except BaseException:
+                self._slots.release()
+                raise
+            # 然后非阻塞地取出同一批的其余回调
+            while (
+                len(batch) < self.batch_size
+                and not self._queue.empty()
+                and not self._slots.locked()
+            ):
+                await self._slots.acquire()
+                batch.append(self._queue.get_nowait())
+            for url, payload in batch:
+                task = asyncio.create_task(self._deliver(url, payload))
+                self._inflight.add(task)
+                task.add_done_callback(self._delivered)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _delivered(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        self._slots.release()
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str) -> AsyncIterator[None]:
+        # 只为有投递进行中(含排队等待名额)的主机保留条目，空闲即删除，
+        # 回调地址由客户端提供，按主机名无限累积会占满内存
+        host = urlsplit(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = _HostLimit(self.max_per_host)
+        limit.users += 1
+        try:
+            async with limit.semaphore:
+                yield
+        finally:
+            limit.users -= 1
+            if limit.users == 0:
+                del self._host_limits[host]
+
+    async def _deliver(self, url: str, payload: Dict[str, Any]) -> None:
+        body = orjson.dumps(payload)
+        errors: List[str] = []
+        # 投递前再次校验，避免入队后 DNS 记录被改为内网地址
+        try:
+            await self.validate(url)
+        except ValueError as e:
+            await self._dead_letter(url, payload, [str(e)])
+            return
+        for attempt in range(self.max_retries):
+            # 每次尝试单独占用主机名额，退避等待期间不占用
+            async with self._host_slot(url):
+                start = time.monotonic()
+                try:
+                    response = await self._client.post(
+                        url,
+                        content=body,
+                        headers={"Content-Type": "application/json"},
+                    )
+                    if response.status_code < 400:
+                        self._stats["delivered"] += 1
+                        self._stats["latency_total"] += time.monotonic() - start
+                        return
+                    errors.append(f"HTTP {response.status_code}")
+                    # 4xx(除 408/429)说明回调方拒收，重试没有意义
+                    if response.status_code < 500 and response.status_code not in (
+                        408,
+                        429,
+                    ):
+                        break
+                except Exception as e:
+                    # 任何异常(包括 URL 非法等非 HTTP 错误)都要走到死信，不能让结果丢失
+                    errors.append(f"{type(e).__name__}: {e}")
+
+            if attempt < self.max_retries - 1:
+                self._stats["retries"] += 1
+                # 指数退避并加入随机抖动，避免同时重试
+                delay = self.retry_delay * (2**attempt)
+                await asyncio.sleep(random.uniform(0, delay))
+
+        await self._dead_letter(url, payload, errors)
+
+    async def _dead_letter(
+        self, url: str, payload: Dict[str, Any], errors: List[str]
+    ) -> None:
+        self._stats["dead_lettered"] += 1
+        log_error(f"回调投递失败，已写入死信文件: {url}，错误: {errors}")
+        record = orjson.dumps(
+            {"url": url, "payload": payload, "errors": errors, "time": time.time()}
+        )
+        try:
+            await asyncio.to_thread(self._append_dead_letter, record)
+        except OSError as e:
+            log_error(f"写入死信文件失败: {e}")
+
+    def _append_dead_letter(self, record: bytes) -> None:
+        self.dead_letter_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.dead_letter_file, "ab") as f:
+            f.write(record + b"\n")
+
+
+_dispatcher: Optional[CallbackDispatcher] = None
+
+
+def get_callback_dispatcher() -> CallbackDispatcher:
+    """获取全局回调投递器，不存在时按配置创建"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = CallbackDispatcher.from_config(get_settings().webhook)
+    return _dispatcher
+
+
+async def shutdown_callback_dispatcher() -> None:
+    """停止全局回调投递器，在应用生命周期结束时调用"""
+    global _dispatcher
+    if _dispatcher is not None:
+        dispatcher, _dispatcher = _dispatcher, None
+        await dispatcher.stop()
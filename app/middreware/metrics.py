@@ -0,0 +1,58 @@
+from typing import Optional
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import ServiceMetrics, get_metrics
+from app.core.setting import get_settings, MetricsConfig
+
+
+class MetricsMiddleware:
+    """
+    指标中间件 - 按路由模板记录每个请求的状态码和耗时
+
+    路由取自路由匹配后写入 scope 的 route，使用路径模板而非实际路径，
+    避免会话ID等路径参数产生大量序列；未匹配任何路由的请求记为 unmatched
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Optional[ServiceMetrics] = None):
+        """
+        初始化中间件
+
+        Args:
+            app: 下游ASGI应用
+            metrics: 服务指标，默认使用全局实例
+        """
+        self.app = app
+        self.metrics = metrics or get_metrics()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.metrics.observe_request(
+                getattr(route, "path", "unmatched"),
+                scope["method"],
+                status_code,
+                time.perf_counter() - started,
+            )
+
+
+def register_metrics(app, config: Optional[MetricsConfig] = None) -> None:
+    """注册指标中间件，应在限流中间件之后注册，使被限流的请求也计入指标"""
+    config = config or get_settings().metrics
+    if not config.ENABLED:
+        return
+    app.add_middleware(MetricsMiddleware)
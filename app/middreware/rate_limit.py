@@ -0,0 +1,213 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+import math
+import time
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.common import error_response, ResponseCode
+from app.core.setting import get_settings, RateLimitConfig
+
+
+class TokenBucket:
+    """令牌桶，按时间差惰性补充令牌"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimitRule:
+    """
+    单个接口的限流规则 - 每个客户端一个令牌桶
+
+    所有操作都在事件循环线程内完成且中间没有 await，因此无需加锁；
+    桶按最近访问顺序排列，空闲超时的桶从头部淘汰，每次操作均摊 O(1)
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        idle_ttl: float = 300.0,
+        max_buckets: int = 100000,
+    ):
+        """
+        初始化限流规则
+
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 令牌桶容量，即允许的突发请求数
+            idle_ttl: 空闲桶的保留时间(秒)
+            max_buckets: 最多保留的客户端桶数量
+        """
+        self.rate = rate
+        self.burst = burst
+        self.idle_ttl = idle_ttl
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._stats = {"allowed": 0, "rejected": 0, "evicted": 0}
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """
+        为客户端消耗一个令牌
+
+        Args:
+            key: 客户端标识
+            now: 当前单调时钟时间，默认取 time.monotonic()
+
+        Returns:
+            0 表示放行，否则为需要等待的秒数
+        """
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+        else:
+            # 空闲桶补满后与新桶等价，补充量不会超过容量
+            bucket.tokens = min(
+                self.burst, bucket.tokens + (now - bucket.updated) * self.rate
+            )
+            bucket.updated = now
+            self._buckets.move_to_end(key)
+        self._evict(now)
+
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            self._stats["allowed"] += 1
+            return 0.0
+        self._stats["rejected"] += 1
+        return (1.0 - bucket.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if len(buckets) <= self.max_buckets and now - bucket.updated < self.idle_ttl:
+                break
+            del buckets[key]
+            self._stats["evicted"] += 1
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+            **self._stats,
+        }
+
+
+class RateLimitMiddleware:
+    """
+    入站限流中间件 - 按已登记的客户端密钥或IP对聊天接口分别限流
+
+    请求头中的密钥未经校验时可以随意伪造，每次换一个值就能得到新的令牌桶，
+    因此只有已登记的密钥才作为限流键，其余请求一律按IP限流
+
+    超出限制的请求直接返回统一格式的 SERVICE_BUSY 响应，并附带 Retry-After 头
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rules: Dict[Tuple[str, str], RateLimitRule],
+        key_header: str = "x-api-key",
+        api_keys: Iterable[str] = (),
+        trust_forwarded: bool = False,
+    ):
+        """
+        初始化中间件
+
+        Args:
+            app: 下游ASGI应用
+            rules: (请求方法, 路径) 到限流规则的映射
+            key_header: 标识客户端的请求头
+            api_keys: 已登记的客户端密钥，请求头缺失或密钥未登记时使用客户端IP
+            trust_forwarded: 是否使用 X-Forwarded-For 中的首个地址作为客户端IP
+        """
+        self.app = app
+        self.rules = rules
+        self.key_header = key_header.lower().encode("latin-1")
+        self.api_keys = frozenset(key.encode("latin-1") for key in api_keys)
+        self.trust_forwarded = trust_forwarded
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self.rules.get((scope["method"], scope["path"]))
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        wait = rule.acquire(self._client_key(scope))
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        response = error_response(
+            code=ResponseCode.SERVICE_BUSY, msg="请求过于频繁，请稍后重试"
+        )
+        if math.isfinite(wait):
+            response.headers["Retry-After"] = str(math.ceil(wait))
+        await response(scope, receive, send)
+
+    def _client_key(self, scope: Scope) -> str:
+        forwarded = None
+        for name, value in scope["headers"]:
+            if name == self.key_header and value in self.api_keys:
+                return "key:" + value.decode("latin-1")
+            if self.trust_forwarded and name == b"x-forwarded-for":
+                forwarded = value
+        if forwarded:
+            return "ip:" + forwarded.decode("latin-1").split(",", 1)[0].strip()
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+
+_rules: Optional[Dict[Tuple[str, str], RateLimitRule]] = None
+
+
+def get_rate_limit_rules() -> Dict[Tuple[str, str], RateLimitRule]:
+    """获取全局限流规则，不存在时按配置创建"""
+    global _rules
+    if _rules is None:
+        config = get_settings().rate_limit
+
+        def rule(rate: float, burst: float) -> RateLimitRule:
+            return RateLimitRule(
+                rate=rate,
+                burst=burst,
+                idle_ttl=config.IDLE_TTL,
+                max_buckets=config.MAX_BUCKETS,
+            )
+
+        _rules = {
+            ("POST", "/chat/completions"): rule(
+                config.COMPLETIONS_RATE, config.COMPLETIONS_BURST
+            ),
+            ("POST", "/chat/stream"): rule(config.STREAM_RATE, config.STREAM_BURST),
+            ("POST", "/chat/async"): rule(config.ASYNC_RATE, config.ASYNC_BURST),
+            ("POST", "/chat/batch"): rule(config.BATCH_RATE, config.BATCH_BURST),
+        }
+    return _rules
+
+
+def get_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """获取各接口的限流统计"""
+    return {path: rule.stats for (_, path), rule in get_rate_limit_rules().items()}
+
+
+def register_rate_limit(app, config: Optional[RateLimitConfig] = None) -> None:
+    """注册入站限流中间件"""
+    config = config or get_settings().rate_limit
+    if not config.ENABLED:
+        return
+    app.add_middleware(
+        RateLimitMiddleware,
+        rules=get_rate_limit_rules(),
+        key_header=config.KEY_HEADER,
+        api_keys=config.API_KEYS,
+        trust_forwarded=config.TRUST_FORWARDED,
+    )
@@ -0,0 +1,106 @@
+from typing import Optional
+import itertools
+import os
+import random
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.logger import logger, request_uuid
+from app.core.setting import get_settings, LOGGERConfig
+
+# 客户端传入的请求ID最大长度，超出或包含不可见字符时重新生成
+_MAX_REQUEST_ID_LENGTH = 128
+
+
+class RequestIDMiddleware:
+    """
+    请求ID中间件 - 为每个请求分配或沿用 X-Request-ID，写入 request_uuid 上下文变量
+
+    请求ID由进程前缀加自增序号组成，无需每次生成 uuid4；开始日志可按比例采样，
+    日志参数延迟到确定输出时才格式化
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        header: str = "X-Request-ID",
+        trust_header: bool = True,
+        start_sample_rate: float = 1.0,
+    ):
+        """
+        初始化中间件
+
+        Args:
+            app: 下游ASGI应用
+            header: 请求ID使用的请求头和响应头名称
+            trust_header: 是否沿用客户端传入的请求ID
+            start_sample_rate: 请求开始日志的采样比例，0~1
+        """
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+        self.trust_header = trust_header
+        self.start_sample_rate = start_sample_rate
+        # 进程ID加随机数作为前缀，保证多进程部署下不重复
+        self._prefix = f"{os.getpid():x}{random.getrandbits(24):06x}"
+        self._counter = itertools.count(1)
+
+    def _incoming_id(self, scope: Scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                if len(value) <= _MAX_REQUEST_ID_LENGTH and value.isascii():
+                    request_id = value.decode("ascii")
+                    if request_id.isprintable():
+                        return request_id
+                return None
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = (self.trust_header and self._incoming_id(scope)) or (
+            f"{self._prefix}-{next(self._counter):x}"
+        )
+        token = request_uuid.set(request_id)
+        bound = logger.bind(request_uuid=request_id)
+        started = time.perf_counter()
+        status_code = 500
+
+        if self.start_sample_rate >= 1.0 or random.random() < self.start_sample_rate:
+            bound.opt(lazy=True).info(
+                "请求开始: {} {}",
+                lambda: scope["method"],
+                lambda: scope["path"],
+            )
+
+        header = (self.header, request_id.encode("ascii"))
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", ()), header]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            bound.opt(lazy=True).info(
+                "请求结束: {} {} {} {}ms",
+                lambda: scope["method"],
+                lambda: scope["path"],
+                lambda: status_code,
+                lambda: round((time.perf_counter() - started) * 1000, 2),
+            )
+            request_uuid.reset(token)
+
+
+def register_request_id(app, config: Optional[LOGGERConfig] = None) -> None:
+    """注册请求ID中间件，应在其他中间件之后注册，使其位于最外层"""
+    config = config or get_settings().logger
+    app.add_middleware(
+        RequestIDMiddleware,
+        header=config.REQUEST_ID_HEADER,
+        trust_header=config.TRUST_REQUEST_ID,
+        start_sample_rate=config.REQUEST_LOG_SAMPLE_RATE,
+    )
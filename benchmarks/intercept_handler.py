@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+标准库日志拦截基准：对比原 InterceptHandler(每条记录查询级别、遍历调用栈、重新 bind)
+与当前实现(按阈值过滤、级别与栈深度缓存、复用已绑定 logger)的单条耗时
+
+用法：python benchmarks/intercept_handler.py [--records 100000]
+"""
+from pathlib import Path
+import argparse
+import json
+import logging
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger
+from app.core.logger import InterceptHandler, get_request_uuid, request_uuid
+
+
+class LegacyInterceptHandler(logging.Handler):
+    """优化前的拦截处理器"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        frame, depth = logging.currentframe(), 2
+        while frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+
+        uuid_str = get_request_uuid()
+        log_instance = logger.bind(request_uuid=uuid_str if uuid_str else "无UUID")
+        log_instance.opt(depth=depth, exception=record.exc_info).log(
+            level, record.getMessage()
+        )
+
+
+def configure(handler: logging.Handler, root_level: int) -> logging.Logger:
+    """与 setup_logging 相同的接入方式：第三方 logger 不传播，级别继承根日志器"""
+    logging.basicConfig(handlers=[handler], level=root_level, force=True)
+    bench = logging.getLogger("bench.third_party")
+    bench.handlers = [handler]
+    bench.propagate = False
+    bench.level = 0
+    return bench
+
+
+def measure(log: logging.Logger, method: str, records: int) -> float:
+    emit = getattr(log, method)
+    started = time.perf_counter()
+    for i in range(records):
+        emit("连接池状态 %s", i)
+    return (time.perf_counter() - started) / records * 1e9
+
+
+def run(name: str, handler: logging.Handler, root_level: int, records: int) -> dict:
+    log = configure(handler, root_level)
+    return {
+        "handler": name,
+        "filtered_debug_ns": round(measure(log, "debug", records)),
+        "emitted_info_ns": round(measure(log, "info", records)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="标准库日志拦截基准")
+    parser.add_argument("--records", type=int, default=100000, help="每项测试的日志条数")
+    args = parser.parse_args()
+
+    # Loguru 只输出 INFO 及以上到空输出，与生产配置的过滤阈值一致
+    logger.remove()
+    logger.add(lambda _: None, level="INFO", format="{message}")
+    token = request_uuid.set("bench-1")
+    try:
+        results = [
+            # 原实现根日志器级别为0，所有记录都会创建并交给 Loguru 过滤
+            run("legacy", LegacyInterceptHandler(), 0, args.records),
+            run(
+                "current",
+                InterceptHandler(logging.INFO),
+                logging.INFO,
+                args.records,
+            ),
+        ]
+    finally:
+        request_uuid.reset(token)
+        logger.remove()
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+"""
+压测工具：以固定并发(闭环)或固定到达速率(开环)请求服务接口，输出吞吐、延迟分位数、
+首个内容片段时间(TTFT)和错误率的 JSON 报告
+
+典型用法(三个终端)：
+    python benchmarks/mock_upstream.py --port 9100
+    SHAREAI_BASE_URL=http://127.0.0.1:9100 RATE_LIMIT_ENABLED=false python run.py
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 \\
+        --scenario completions --scenario stream --concurrency 32 --duration 30
+
+开环模式(--rate)下延迟从计划发送时间开始计算，服务变慢时排队时间也计入延迟
+"""
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import httpx
+
+SUCCESS_CODE = 20000
+
+# 场景名称 -> (方法, 路径)
+SCENARIOS: Dict[str, Tuple[str, str]] = {
+    "completions": ("POST", "/chat/completions"),
+    "stream": ("POST", "/chat/stream"),
+    "async": ("POST", "/chat/async"),
+    "demo": ("GET", "/api/demo"),
+}
+
+# 单次请求的结果：(错误类型，成功时为None, TTFT 秒)
+Outcome = Tuple[Optional[str], Optional[float]]
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    """计算延迟分布(毫秒)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    last = len(ordered) - 1
+
+    def at(q: float) -> float:
+        return round(ordered[round(last * q)] * 1000, 2)
+
+    return {
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50": at(0.5),
+        "p90": at(0.9),
+        "p99": at(0.99),
+        "max": at(1.0),
+    }
+
+
+def envelope_error(response: httpx.Response) -> Optional[str]:
+    """检查响应的 HTTP 状态和统一响应格式中的业务码"""
+    if response.status_code != 200:
+        return f"HTTP {response.status_code}"
+    try:
+        code = response.json().get("code")
+    except ValueError:
+        return "invalid json"
+    return None if code == SUCCESS_CODE else f"code {code}"
+
+
+class Recorder:
+    """收集一个场景的请求结果"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.requests = 0
+        self.dropped = 0
+
+    def record(self, latency: float, outcome: Outcome) -> None:
+        error, ttft = outcome
+        self.requests += 1
+        if error is None:
+            self.latencies.append(latency)
+            if ttft is not None:
+                self.ttfts.append(ttft)
+        else:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        failed = sum(self.errors.values())
+        return {
+            "requests": self.requests,
+            "succeeded": self.requests - failed,
+            "failed": failed,
+            "dropped": self.dropped,
+            "error_rate": round(failed / self.requests, 4) if self.requests else 0.0,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_rps": round((self.requests - failed) / elapsed, 2)
+            if elapsed
+            else 0.0,
+            "latency_ms": percentiles(self.latencies),
+            "ttft_ms": percentiles(self.ttfts),
+            "errors": self.errors,
+        }
+
+
+class LoadTest:
+    """按场景构造请求并执行，记录每个请求的延迟和结果"""
+
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self._seq = itertools.count(1)
+
+    def chat_body(self) -> Dict[str, Any]:
+        # 默认每个请求的提示不同，避免补全缓存和请求合并让结果失真
+        prompt = self.args.prompt
+        if not self.args.repeat_prompt:
+            prompt = f"{prompt} #{next(self._seq)}"
+        return {
+            "prompt": prompt,
+            "model": self.args.model,
+            "use_cache": self.args.use_cache,
+        }
+
+    async def completions(self, started: float) -> Outcome:
+        response = await self.client.post("/chat/completions", json=self.chat_body())
+        return envelope_error(response), None
+
+    async def stream(self, started: float) -> Outcome:
+        ttft = None
+        async with self.client.stream(
+            "POST", "/chat/stream", json=self.chat_body()
+        ) as response:
+            if response.status_code != 200:
+                return f"HTTP {response.status_code}", None
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data.startswith("{") and '"error"' in data:
+                    return "stream error", None
+                if ttft is None and data != "[DONE]" and not data.startswith("{"):
+                    ttft = time.perf_counter() - started
+        if ttft is None:
+            return "empty stream", None
+        return None, ttft
+
+    async def async_job(self, started: float) -> Outcome:
+        response = await self.client.post("/chat/async", json=self.chat_body())
+        error = envelope_error(response)
+        if error or not self.args.async_poll:
+            return error, None
+        # 轮询到任务结束，延迟为提交到完成的总时间
+        task_id = response.json()["data"]["task_id"]
+        while True:
+            await asyncio.sleep(self.args.poll_interval)
+            result = await self.client.get(f"/chat/async/{task_id}")
+            error = envelope_error(result)
+            if error:
+                return error, None
+            status = result.json()["data"]["status"]
+            if status == "succeeded":
+                return None, None
+            if status == "failed":
+                return "job failed", None
+
+    async def demo(self, started: float) -> Outcome:
+        return envelope_error(await self.client.get("/api/demo")), None
+
+    def handler(self, scenario: str) -> Callable[[float], Awaitable[Outcome]]:
+        return {
+            "completions": self.completions,
+            "stream": self.stream,
+            "async": self.async_job,
+            "demo": self.demo,
+        }[scenario]
+
+    async def call(
+        self, handler: Callable[[float], Awaitable[Outcome]], started: float
+    ) -> Tuple[float, Outcome]:
+        try:
+            outcome = await handler(started)
+        except httpx.HTTPError as e:
+            outcome = (type(e).__name__, None)
+        return time.perf_counter() - started, outcome
+
+    async def closed_loop(self, scenario: str, recorder: Recorder) -> None:
+        """固定并发：每个工作协程收到响应后立即发送下一个请求"""
+        handler = self.handler(scenario)
+        deadline = time.perf_counter() + self.args.duration
+        remaining = itertools.count(1)
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                if self.args.requests and next(remaining) > self.args.requests:
+                    return
+                latency, outcome = await self.call(handler, time.perf_counter())
+                recorder.record(latency, outcome)
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+    async def open_loop(self, scenario: str, recorder: Recorder) -> None:
+        """固定到达速率：按计划时间发送请求，不等待之前的请求完成"""
+        handler = self.handler(scenario)
+        started = time.perf_counter()
+        in_flight: set = set()
+        next_at = started
+        sent = 0
+
+        async def run(scheduled: float) -> None:
+            latency, outcome = await self.call(handler, scheduled)
+            recorder.record(latency, outcome)
+
+        while next_at < started + self.args.duration:
+            if self.args.requests and sent >= self.args.requests:
+                break
+            wait = next_at - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if len(in_flight) >= self.args.max_in_flight:
+                # 未完成的请求过多，丢弃本次到达并计数
+                recorder.dropped += 1
+            else:
+                task = asyncio.create_task(run(next_at))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            sent += 1
+            gap = 1.0 / self.args.rate
+            next_at += random.expovariate(1.0 / gap) if self.args.poisson else gap
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    async def run(self, scenario: str) -> Dict[str, Any]:
+        recorder = Recorder()
+        started = time.perf_counter()
+        if self.args.rate:
+            await self.open_loop(scenario, recorder)
+            mode = {"mode": "open", "rate": self.args.rate}
+        else:
+            await self.closed_loop(scenario, recorder)
+            mode = {"mode": "closed", "concurrency": self.args.concurrency}
+        elapsed = time.perf_counter() - started
+        return {"scenario": scenario, **mode, **recorder.report(elapsed)}
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    limit = max(args.concurrency, args.max_in_flight if args.rate else 0)
+    async with httpx.AsyncClient(
+        base_url=args.url,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+    ) as client:
+        load_test = LoadTest(client, args)
+        return [await load_test.run(scenario) for scenario in args.scenario]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="服务压测工具")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="压测场景，可重复，按顺序依次执行；默认 completions",
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="每个场景的时长(秒)")
+    parser.add_argument(
+        "--requests", type=int, default=0, help="每个场景最多发送的请求数，0 表示不限"
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="闭环模式的并发数")
+    parser.add_argument(
+        "--rate", type=float, default=0.0, help="开环模式的到达速率(请求/秒)，0 表示闭环"
+    )
+    parser.add_argument(
+        "--poisson", action="store_true", help="开环模式按泊松过程到达，默认均匀间隔"
+    )
+    parser.add_argument(
+        "--max-in-flight", type=int, default=1000, help="开环模式未完成请求数上限"
+    )
+    parser.add_argument("--timeout", type=float, default=120.0, help="单个请求超时(秒)")
+    parser.add_argument("--model", default="gpt-4o-mini", help="请求的模型名称")
+    parser.add_argument("--prompt", default="benchmark", help="用户提问")
+    parser.add_argument(
+        "--repeat-prompt", action="store_true", help="所有请求使用相同的提示"
+    )
+    parser.add_argument(
+        "--use-cache", action="store_true", help="允许服务使用补全缓存和请求合并"
+    )
+    parser.add_argument(
+        "--async-poll",
+        action="store_true",
+        help="async 场景轮询到任务完成，延迟为提交到完成的时间",
+    )
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="轮询间隔(秒)")
+    parser.add_argument("--output", help="报告写入的文件，默认输出到标准输出")
+    args = parser.parse_args()
+    args.scenario = args.scenario or ["completions"]
+
+    results = asyncio.run(main_async(args))
+    report = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(report, encoding="utf-8")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
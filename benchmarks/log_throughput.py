@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+日志吞吐基准：对比开发方案(彩色格式化 + 三个 enqueue 输出)与生产方案(批量 JSON 行写入器)
+
+用法：python benchmarks/log_throughput.py [--records 100000] [--overflow block]
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger
+from app.core.log_writer import BatchedJSONSink
+
+DEV_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
+    "<level>{level: ^8}</level> | "
+    "process [<cyan>{process}</cyan>]:<cyan>{thread}</cyan> | "
+    "<magenta>{extra[request_uuid]}</magenta> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+
+
+def add_development_sinks(log_dir: Path, stdout) -> None:
+    """与 setup_logging 开发方案相同的三个输出，控制台输出重定向到空设备"""
+    logger.add(
+        stdout,
+        format=DEV_FORMAT,
+        level="INFO",
+        enqueue=True,
+        backtrace=True,
+        diagnose=True,
+        colorize=True,
+    )
+    for level in ("INFO", "ERROR"):
+        logger.add(
+            str(log_dir / f"{{time:YYYY-MM-DD}}_{level.lower()}.log"),
+            format=DEV_FORMAT,
+            level=level,
+            encoding="utf-8",
+            enqueue=True,
+        )
+
+
+def add_production_sink(log_dir: Path, overflow: str) -> BatchedJSONSink:
+    """与 setup_logging 生产方案相同的批量写入器"""
+    sink = BatchedJSONSink(str(log_dir), overflow=overflow, retention_days=None)
+    logger.add(
+        sink,
+        format="{message}",
+        level="INFO",
+        enqueue=False,
+        backtrace=False,
+        diagnose=False,
+        colorize=False,
+    )
+    return sink
+
+
+def run(profile: str, records: int, overflow: str) -> dict:
+    """
+    写入指定数量的日志并统计吞吐
+
+    Returns:
+        调用方耗时(记录日志的线程)与写完所有日志的总耗时
+    """
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        log_dir = Path(tmp)
+        sink = None
+        if profile == "production":
+            sink = add_production_sink(log_dir, overflow)
+        else:
+            add_development_sinks(log_dir, devnull)
+
+        bound = logger.bind(request_uuid="bench-1")
+        started = time.perf_counter()
+        for i in range(records):
+            if i % 100 == 0:
+                bound.error("处理请求失败 {}", i)
+            else:
+                bound.info("处理请求 {}", i)
+        emitted = time.perf_counter() - started
+        # remove 会等待所有输出写完
+        logger.remove()
+        total = time.perf_counter() - started
+
+    result = {
+        "profile": profile,
+        "records": records,
+        "caller_seconds": round(emitted, 4),
+        "caller_records_per_second": round(records / emitted),
+        "total_seconds": round(total, 4),
+        "total_records_per_second": round(records / total),
+    }
+    if sink is not None:
+        result["sink"] = sink.stats
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日志吞吐基准")
+    parser.add_argument("--records", type=int, default=100000, help="写入的日志条数")
+    parser.add_argument(
+        "--overflow",
+        choices=("drop", "block"),
+        default="block",
+        help="生产方案缓冲区满时的策略，基准默认阻塞以保证不丢日志",
+    )
+    args = parser.parse_args()
+
+    results = [
+        run(profile, args.records, args.overflow)
+        for profile in ("development", "production")
+    ]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
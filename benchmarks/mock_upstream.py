@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""
+本地模拟上游：兼容 OpenAI 的 /v1/chat/completions，支持 JSON 与 SSE 两种模式，
+可配置延迟、生成速率、错误率和 429 比例，用于压测时替代真实的 SHAREAI_BASE_URL
+
+用法：
+    python benchmarks/mock_upstream.py --port 9100 --latency 0.2 --token-rate 50
+    SHAREAI_BASE_URL=http://127.0.0.1:9100 python run.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+class MockConfig:
+    """模拟上游的行为配置"""
+
+    def __init__(
+        self,
+        latency: float = 0.1,
+        jitter: float = 0.0,
+        token_rate: float = 50.0,
+        tokens: int = 64,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+    ):
+        """
+        Args:
+            latency: 首个 token(流式)或完整响应(非流式)之前的延迟(秒)
+            jitter: 延迟的随机抖动(秒)
+            token_rate: 生成速率(token/秒)，非流式响应会额外等待生成全部 token 的时间，
+                0 表示不限
+            tokens: 每次回复的 token 数
+            error_rate: 返回 500 的比例
+            rate_limit_rate: 返回 429 的比例
+            retry_after: 429 响应的 Retry-After(秒)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+
+
+def _reply_tokens(count: int) -> list:
+    return [f"tok{i} " for i in range(count)]
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    """
+    创建模拟上游应用
+
+    Args:
+        config: 行为配置
+
+    Returns:
+        FastAPI 应用
+    """
+    app = FastAPI(title="mock-upstream")
+    stats = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0}
+
+    def delay() -> float:
+        return max(0.0, config.latency + random.uniform(-config.jitter, config.jitter))
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        stats["requests"] += 1
+        body = await request.json()
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "rate limited", "type": "rate_limit"}},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(delay())
+            return JSONResponse(
+                {"error": {"message": "mock failure", "type": "server_error"}},
+                status_code=500,
+            )
+
+        model = body.get("model", "mock")
+        tokens = _reply_tokens(config.tokens)
+        interval = 1.0 / config.token_rate if config.token_rate > 0 else 0.0
+
+        if body.get("stream"):
+            stats["streams"] += 1
+
+            async def events():
+                await asyncio.sleep(delay())
+                started = time.perf_counter()
+                for index, token in enumerate(tokens):
+                    # 按计划时间发送，避免 sleep 误差累积
+                    wait = started + index * interval - time.perf_counter()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    chunk = {
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(delay() + interval * len(tokens))
+        return JSONResponse(
+            {
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"completion_tokens": len(tokens)},
+            }
+        )
+
+    @app.get("/stats")
+    async def mock_stats():
+        return stats
+
+    @app.get("/health")
+    async def health():
+        return Response("ok")
+
+    return app
+
+
+def main() -> None:
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description="兼容 OpenAI 的本地模拟上游")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument(
+        "--latency", type=float, default=defaults.latency, help="首个 token 前的延迟(秒)"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=defaults.jitter, help="延迟的随机抖动(秒)"
+    )
+    parser.add_argument(
+        "--token-rate",
+        type=float,
+        default=defaults.token_rate,
+        help="生成速率(token/秒)，0 表示不限",
+    )
+    parser.add_argument(
+        "--tokens", type=int, default=defaults.tokens, help="每次回复的 token 数"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=defaults.error_rate, help="返回 500 的比例"
+    )
+    parser.add_argument(
+        "--rate-limit-rate",
+        type=float,
+        default=defaults.rate_limit_rate,
+        help="返回 429 的比例",
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=float,
+        default=defaults.retry_after,
+        help="429 响应的 Retry-After(秒)",
+    )
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        token_rate=args.token_rate,
+        tokens=args.tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.middreware.exception_handler import register_exception_handlers
+from app.middreware.rate_limit import register_rate_limit
+from app.middreware.metrics import register_metrics
+from app.middreware.request_id import register_request_id
 from app.controller.demo import router as demo_router
 from app.controller import chat
+from app.controller.metrics import router as metrics_router
 
 from app.core.setting import get_settings
-from app.core.logger import setup_logging, logger
+from app.core.logger import setup_logging, close_logging, logger
+from app.agent.http_pool import init_upstream_pool, close_upstream_pool
+from app.core.jobs import get_job_manager, shutdown_job_manager
+from app.core.webhook import get_callback_dispatcher, shutdown_callback_dispatcher
 
 # 获取设置
 settings = get_settings()
@@ -17,12 +24,22 @@ async def lifespan(app: FastAPI):
     # 启动事件
     await setup_logging()
     logger.info("日志系统已初始化")
+    init_upstream_pool(settings.chat)
+    logger.info("上游连接池已创建")
+    get_job_manager().start()
+    logger.info("后台任务工作池已启动")
+    get_callback_dispatcher().start()
+    logger.info("回调投递器已启动")
     logger.info("应用程序已启动")
 
     yield
 
-    # 关闭事件（如果有需要）
+    # 关闭事件
+    await shutdown_job_manager()
+    await shutdown_callback_dispatcher()
+    await close_upstream_pool()
     logger.info("应用程序已关闭")
+    close_logging()
 
 
 # 创建应用
@@ -37,6 +54,12 @@ app = FastAPI(
 )
 
 register_exception_handlers(app)
+register_rate_limit(app)
+register_metrics(app)
+# 最后注册的中间件位于最外层，限流拒绝的响应也带有请求ID
+register_request_id(app)
 
 app.include_router(demo_router, prefix=settings.api.PREFIX, tags=["系统"])
 app.include_router(chat.router)
+if settings.metrics.ENABLED:
+    app.include_router(metrics_router)
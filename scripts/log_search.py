@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+按请求UUID查找日志：生产方案的 JSON 行日志使用旁路索引定位，其余日志以 mmap 扫描
+
+用法：python scripts/log_search.py <request_id> [--kind error] [--date 2025-03-04]
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.log_search import search_request
+from app.core.setting import get_settings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按请求UUID查找日志")
+    parser.add_argument("request_id", help="请求UUID(X-Request-ID)")
+    parser.add_argument(
+        "--log-dir",
+        default=str(Path(get_settings().logger.BASE_DIR) / "logs"),
+        help="日志根目录，默认取 LOGGER_BASE_DIR 配置",
+    )
+    parser.add_argument(
+        "--kind", choices=("info", "error"), default="info", help="查找的日志类型"
+    )
+    parser.add_argument(
+        "--date", action="append", help="只查找指定日期(YYYY-MM-DD)，可重复"
+    )
+    parser.add_argument("--with-file", action="store_true", help="输出行前附带文件名")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    count = 0
+    out = sys.stdout.buffer
+    for path, line in search_request(args.log_dir, args.request_id, args.kind, args.date):
+        if args.with_file:
+            out.write(path.name.encode("utf-8") + b": ")
+        out.write(line + b"\n")
+        count += 1
+    out.flush()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"共 {count} 条，耗时 {elapsed:.1f}ms", file=sys.stderr)
+    sys.exit(0 if count else 1)
+
+
+if __name__ == "__main__":
+    main()
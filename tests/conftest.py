@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 测试不写入仓库内的 logs 目录
+os.environ.setdefault("LOGGER_BASE_DIR", tempfile.mkdtemp(prefix="fastapi-template-logs-"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
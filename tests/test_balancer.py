@@ -0,0 +1,59 @@
+import asyncio
+import random
+import uuid
+import pytest
+from app.agent.balancer import LoadBalancer, Upstream
+
+
+def make_upstream(weight: float = 1.0) -> Upstream:
+    # 名称唯一，避免与其他测试共享熔断器
+    name = f"test-{uuid.uuid4().hex}"
+    return Upstream(f"http://{name}.test", "k", weight=weight, name=name)
+
+
+def test_requires_at_least_one_upstream():
+    with pytest.raises(ValueError):
+        LoadBalancer([])
+
+
+def test_prefers_upstream_with_lower_score():
+    random.seed(0)
+    fast, slow = make_upstream(), make_upstream()
+    fast.ewma_latency, slow.ewma_latency = 0.1, 1.0
+    balancer = LoadBalancer([fast, slow])
+    picks = [balancer.pick() for _ in range(1000)]
+    # 两个候选相同时才会选到较慢的上游，期望占比约 1/4
+    assert picks.count(fast) > 700
+
+
+def test_outstanding_requests_raise_score():
+    busy, idle = make_upstream(), make_upstream()
+    busy.ewma_latency = idle.ewma_latency = 0.5
+    busy.outstanding = 3
+    assert busy.score() > idle.score()
+
+
+def test_avoid_and_open_breaker_remove_candidates():
+    first, second, third = make_upstream(), make_upstream(), make_upstream()
+    balancer = LoadBalancer([first, second, third])
+    third.guard.breaker._trip()
+    assert not third.healthy
+    assert {balancer.pick(avoid=first) for _ in range(100)} == {second}
+    # 全部熔断时仍返回一个上游，由其熔断器快速失败
+    first.guard.breaker._trip()
+    second.guard.breaker._trip()
+    assert balancer.pick() in (first, second, third)
+
+
+def test_failures_penalize_latency_estimate():
+    upstream = make_upstream()
+
+    async def fail():
+        async with upstream.call():
+            raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(fail())
+    assert upstream.ewma_latency == 1.0
+    assert upstream.outstanding == 0
+    assert upstream.stats["failures"] == 1
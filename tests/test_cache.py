@@ -0,0 +1,68 @@
+import os
+import time
+from app.agent import cache as cache_module
+from app.agent.cache import CompletionCache
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+def test_memory_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock(1000.0)
+    monkeypatch.setattr(cache_module, "time", clock)
+    cache = CompletionCache(ttl=10.0)
+    cache.set("k", {"v": 1})
+    clock.now += 9.9
+    assert cache.get("k") == {"v": 1}
+    clock.now += 0.1
+    assert cache.get("k") is None
+    assert cache.stats["expirations"] == 1
+    assert cache.stats["size"] == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = CompletionCache(max_entries=2)
+    cache.set("a", {"v": "a"})
+    cache.set("b", {"v": "b"})
+    cache.get("a")
+    cache.set("c", {"v": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": "a"}
+    assert cache.stats["evictions"] == 1
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path, monkeypatch):
+    clock = FakeClock(1000.0)
+    monkeypatch.setattr(cache_module, "time", clock)
+    CompletionCache(ttl=10.0, disk_dir=str(tmp_path)).set("k", {"v": 1})
+
+    restarted = CompletionCache(ttl=10.0, disk_dir=str(tmp_path))
+    assert restarted.get("k") == {"v": 1}
+    assert restarted.stats["disk_hits"] == 1
+
+    clock.now += 10.0
+    assert CompletionCache(ttl=10.0, disk_dir=str(tmp_path)).get("k") is None
+    assert not (tmp_path / "k.json").exists()
+
+
+def test_disk_sweep_removes_expired_and_caps_entries(tmp_path):
+    cache = CompletionCache(ttl=100.0, disk_dir=str(tmp_path), disk_max_entries=2)
+    now = time.time()
+    cache.set("old", {"v": 0})
+    os.utime(tmp_path / "old.json", (now - 1000, now - 1000))
+    (tmp_path / "leftover.tmp").write_bytes(b"{")
+    os.utime(tmp_path / "leftover.tmp", (now - 1000, now - 1000))
+    cache.set("a", {"v": 1})
+    os.utime(tmp_path / "a.json", (now - 20, now - 20))
+    cache.set("b", {"v": 2})
+    os.utime(tmp_path / "b.json", (now - 10, now - 10))
+    cache.set("c", {"v": 3})
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["b.json", "c.json"]
+    assert cache.stats["disk_evictions"] == 1
+    assert cache.stats["expirations"] >= 1
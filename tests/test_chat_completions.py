@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+from app.agent.chat_agent import ChatAgent
+from app.common import ResponseModel
+from app.controller.chat import ChatResponse
+from main import app
+
+
+def test_completions_body_matches_response_model(monkeypatch):
+    """预编码的响应体符合接口声明的 ResponseModel[ChatResponse]"""
+
+    async def fake_request(self, payload, upstream=None):
+        return {"choices": [{"message": {"role": "assistant", "content": "hi"}}]}
+
+    monkeypatch.setattr(ChatAgent, "_aexecute_request", fake_request)
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/chat/completions",
+            json={
+                "prompt": "response model test",
+                "system_prompt": "be brief",
+                "messages": [{"role": "user", "content": "earlier"}],
+                "use_cache": False,
+            },
+        )
+
+    assert response.status_code == 200
+    body = ResponseModel[ChatResponse].model_validate_json(response.content)
+    assert body.data.content == "hi"
+    assert [(m.role, m.content) for m in body.data.messages] == [
+        ("user", "earlier"),
+        ("system", "be brief"),
+        ("user", "response model test"),
+        ("assistant", "hi"),
+    ]
+    assert body.data.retry_info["success"]
@@ -0,0 +1,63 @@
+import asyncio
+import json
+from app.agent.chat_agent import ChatAgent
+from main import app
+
+
+def test_client_disconnect_cancels_upstream_stream(monkeypatch):
+    """默认配置(启用缓存与请求合并)下，SSE 客户端断开后上游流式请求被取消"""
+    state = {"emitted": 0, "cancelled": False}
+
+    async def endless_stream(self, payload, callback, upstream=None):
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                await callback("chunk")
+                state["emitted"] += 1
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    monkeypatch.setattr(ChatAgent, "_execute_stream_request", endless_stream)
+
+    async def main():
+        body = json.dumps({"prompt": "disconnect test"}).encode()
+        disconnected = asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and b"chunk" in message.get(
+                "body", b""
+            ):
+                disconnected.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/chat/stream",
+            "raw_path": b"/chat/stream",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        await asyncio.sleep(0.1)
+        emitted = state["emitted"]
+        await asyncio.sleep(0.1)
+        assert state["cancelled"]
+        assert state["emitted"] == emitted
+
+    asyncio.run(main())
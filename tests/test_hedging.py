@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from app.agent.chat_agent import ChatAgent
+from app.agent.hedging import HedgePolicy
+
+
+def make_agent(hedging: HedgePolicy) -> ChatAgent:
+    return ChatAgent(api_key="k", base_url="http://upstream.test", hedging=hedging)
+
+
+def test_stream_single_chunk_after_hedge_delay_returns_response():
+    # 对冲预算为0：超过对冲延迟后不发送对冲请求，唯一的片段与响应在同一轮结束
+    agent = make_agent(HedgePolicy(default_delay=0.01, budget_burst=0.0, budget_ratio=0.0))
+
+    async def stub(payload, callback, upstream=None):
+        await asyncio.sleep(0.05)
+        await callback("whole answer")
+        return {"choices": [{"message": {"role": "assistant", "content": "whole answer"}}]}
+
+    agent._execute_stream_request = stub
+    received = []
+    result = asyncio.run(agent._execute_stream_hedged({}, received.append))
+    assert result["choices"][0]["message"]["content"] == "whole answer"
+    assert received == ["whole answer"]
+
+
+def test_stream_hedge_wins_when_primary_is_slow():
+    hedging = HedgePolicy(default_delay=0.01)
+    agent = make_agent(hedging)
+    calls = []
+
+    async def stub(payload, callback, upstream=None):
+        index = len(calls)
+        calls.append(index)
+        await asyncio.sleep(1.0 if index == 0 else 0.02)
+        await callback(f"from {index}")
+        return {"choices": [{"message": {"role": "assistant", "content": f"from {index}"}}]}
+
+    agent._execute_stream_request = stub
+    received = []
+    result = asyncio.run(agent._execute_stream_hedged({}, received.append))
+    assert result["choices"][0]["message"]["content"] == "from 1"
+    assert received == ["from 1"]
+    assert hedging.stats["hedge_wins"] == 1
+
+
+def test_stream_error_is_raised_when_all_contenders_fail():
+    agent = make_agent(HedgePolicy(default_delay=0.01))
+
+    async def stub(payload, callback, upstream=None):
+        await asyncio.sleep(0.02)
+        raise ConnectionError("down")
+
+    agent._execute_stream_request = stub
+    with pytest.raises(ConnectionError):
+        asyncio.run(agent._execute_stream_hedged({}, None))
+
+
+def test_budget_limits_hedge_ratio():
+    hedging = HedgePolicy(budget_ratio=0.1, budget_burst=1.0)
+    hedged = 0
+    for _ in range(100):
+        hedging.delay("completion")
+        hedged += hedging.try_hedge()
+    assert hedged <= 11
+    assert hedging.stats["budget_denied"] == 100 - hedged
+
+
+def test_delay_follows_observed_percentile_within_bounds():
+    hedging = HedgePolicy(
+        percentile=0.5, min_delay=0.2, max_delay=1.0, default_delay=2.0, min_samples=5
+    )
+    assert hedging.delay("completion") == 2.0
+    for latency in (0.4, 0.5, 0.6, 0.7, 0.8):
+        hedging.observe("completion", latency)
+    assert hedging.delay("completion") == 0.6
+    for _ in range(50):
+        hedging.observe("completion", 5.0)
+    assert hedging.delay("completion") == 1.0
@@ -0,0 +1,99 @@
+import asyncio
+import math
+import orjson
+from app.common import ResponseCode
+from app.middreware.rate_limit import RateLimitMiddleware, RateLimitRule
+
+
+def test_bucket_allows_burst_then_rejects_until_refilled():
+    rule = RateLimitRule(rate=2.0, burst=3.0)
+    assert [rule.acquire("c", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert rule.acquire("c", now=0.0) == 0.5
+    # 0.5 秒补充 1 个令牌
+    assert rule.acquire("c", now=0.5) == 0.0
+    assert rule.acquire("c", now=0.5) > 0
+    # 长时间空闲后最多补满到容量
+    assert [rule.acquire("c", now=100.0) for _ in range(4)][-1] > 0
+    assert rule.stats["allowed"] == 7
+
+
+def test_clients_have_separate_buckets():
+    rule = RateLimitRule(rate=1.0, burst=1.0)
+    assert rule.acquire("a", now=0.0) == 0.0
+    assert rule.acquire("b", now=0.0) == 0.0
+    assert rule.acquire("a", now=0.0) > 0
+
+
+def test_zero_rate_rejects_forever():
+    rule = RateLimitRule(rate=0.0, burst=1.0)
+    assert rule.acquire("c", now=0.0) == 0.0
+    assert math.isinf(rule.acquire("c", now=1000.0))
+
+
+def test_idle_and_excess_buckets_are_evicted():
+    rule = RateLimitRule(rate=1.0, burst=1.0, idle_ttl=10.0, max_buckets=2)
+    rule.acquire("a", now=0.0)
+    rule.acquire("b", now=1.0)
+    rule.acquire("c", now=2.0)
+    assert rule.stats["clients"] == 2
+    rule.acquire("d", now=20.0)
+    assert rule.stats["clients"] == 1
+    assert rule.stats["evicted"] == 3
+
+
+def make_scope(headers=(), client=("10.0.0.1", 1234)):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/chat/completions",
+        "headers": list(headers),
+        "client": client,
+    }
+
+
+def test_client_key_uses_only_registered_api_keys():
+    middleware = RateLimitMiddleware(
+        app=None, rules={}, key_header="X-API-Key", api_keys=["known"]
+    )
+    assert middleware._client_key(make_scope([(b"x-api-key", b"known")])) == "key:known"
+    # 未登记的密钥可随意伪造，按IP限流
+    assert middleware._client_key(make_scope([(b"x-api-key", b"forged")])) == "ip:10.0.0.1"
+
+
+def test_client_key_trusts_forwarded_only_when_configured():
+    headers = [(b"x-forwarded-for", b"203.0.113.7, 10.0.0.2")]
+    assert RateLimitMiddleware(app=None, rules={})._client_key(
+        make_scope(headers)
+    ) == "ip:10.0.0.1"
+    assert RateLimitMiddleware(app=None, rules={}, trust_forwarded=True)._client_key(
+        make_scope(headers)
+    ) == "ip:203.0.113.7"
+
+
+def test_middleware_rejects_with_retry_after():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    rule = RateLimitRule(rate=0.5, burst=1.0)
+    middleware = RateLimitMiddleware(app, rules={("POST", "/chat/completions"): rule})
+
+    async def call():
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware(make_scope(), receive, send)
+        return messages
+
+    assert asyncio.run(call()) == []
+    messages = asyncio.run(call())
+    assert calls == ["/chat/completions"]
+    headers = dict(messages[0]["headers"])
+    assert headers[b"retry-after"] == b"2"
+    assert orjson.loads(messages[1]["body"])["code"] == ResponseCode.SERVICE_BUSY
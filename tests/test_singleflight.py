@@ -0,0 +1,98 @@
+import asyncio
+from app.agent.singleflight import SingleFlight
+
+
+class Upstream:
+    """模拟的上游流式调用：按间隔产出片段，记录是否被取消"""
+
+    def __init__(self, chunks, interval=0.0):
+        self.chunks = chunks
+        self.interval = interval
+        self.calls = 0
+        self.emitted = 0
+        self.cancelled = False
+
+    async def __call__(self, emit):
+        self.calls += 1
+        try:
+            for chunk in self.chunks:
+                await asyncio.sleep(self.interval)
+                await emit(chunk)
+                self.emitted += 1
+            return "".join(self.chunks)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def test_concurrent_streams_share_one_upstream_call():
+    async def main():
+        flight = SingleFlight()
+        upstream = Upstream(["a", "b", "c"], interval=0.01)
+        received = [[], []]
+        results = await asyncio.gather(
+            flight.stream("k", upstream, received[0].append),
+            flight.stream("k", upstream, received[1].append),
+        )
+        assert upstream.calls == 1
+        assert received == [["a", "b", "c"], ["a", "b", "c"]]
+        assert results == [("abc", False), ("abc", True)]
+        assert flight.stats["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_slow_subscriber_applies_backpressure():
+    async def main():
+        flight = SingleFlight(stream_queue_size=2)
+        upstream = Upstream([str(i) for i in range(100)])
+        release = asyncio.Event()
+
+        async def slow(chunk):
+            await release.wait()
+
+        task = asyncio.ensure_future(flight.stream("k", upstream, slow))
+        await asyncio.sleep(0.05)
+        # 订阅者卡在第一个片段上，上游最多再填满一个队列
+        assert upstream.emitted <= 3
+        release.set()
+        assert (await task)[0] == "".join(str(i) for i in range(100))
+
+    asyncio.run(main())
+
+
+def test_last_subscriber_leaving_cancels_upstream():
+    async def main():
+        flight = SingleFlight()
+        upstream = Upstream(["x"] * 1000, interval=0.01)
+        first = asyncio.ensure_future(flight.stream("k", upstream))
+        second = asyncio.ensure_future(flight.stream("k", upstream))
+        await asyncio.sleep(0.05)
+
+        first.cancel()
+        await asyncio.sleep(0.05)
+        # 仍有订阅者时上游继续读取
+        assert not upstream.cancelled
+
+        second.cancel()
+        await asyncio.sleep(0.05)
+        assert upstream.cancelled
+        assert flight.stats["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_late_request_does_not_join_started_stream():
+    async def main():
+        flight = SingleFlight()
+        upstream = Upstream(["a", "b"], interval=0.05)
+        first = asyncio.ensure_future(flight.stream("k", upstream))
+        await asyncio.sleep(0.07)
+        received = []
+        result, shared = await flight.stream("k", upstream, received.append)
+        assert (result, shared) == ("ab", False)
+        assert received == ["a", "b"]
+        assert upstream.calls == 2
+        await first
+
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+import asyncio
+import httpx
+import orjson
+import pytest
+from app.core import webhook
+from app.core.webhook import CallbackDispatcher
+
+
+def make_dispatcher(tmp_path, handler, **kwargs) -> CallbackDispatcher:
+    kwargs.setdefault("allow_private", True)
+    kwargs.setdefault("retry_delay", 0.01)
+    return CallbackDispatcher(
+        dead_letter_file=str(tmp_path / "dead_letter.jsonl"),
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        **kwargs,
+    )
+
+
+def read_dead_letters(dispatcher: CallbackDispatcher):
+    if not dispatcher.dead_letter_file.exists():
+        return []
+    return [orjson.loads(line) for line in dispatcher.dead_letter_file.read_bytes().splitlines()]
+
+
+def test_retries_server_errors_until_delivered(tmp_path):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url.path)
+        return httpx.Response(503 if len(attempts) < 3 else 200)
+
+    dispatcher = make_dispatcher(tmp_path, handler, max_retries=3)
+
+    async def main():
+        await dispatcher.enqueue("http://hooks.test/cb", {"task_id": "t1"})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    assert len(attempts) == 3
+    assert dispatcher.stats["delivered"] == 1
+    assert dispatcher.stats["retries"] == 2
+    assert read_dead_letters(dispatcher) == []
+
+
+def test_client_error_is_dead_lettered_without_retry(tmp_path):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url.path)
+        return httpx.Response(404)
+
+    dispatcher = make_dispatcher(tmp_path, handler, max_retries=3)
+
+    async def main():
+        await dispatcher.enqueue("http://hooks.test/cb", {"task_id": "t1"})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    assert len(attempts) == 1
+    records = read_dead_letters(dispatcher)
+    assert [r["payload"] for r in records] == [{"task_id": "t1"}]
+    assert records[0]["errors"] == ["HTTP 404"]
+
+
+def test_exhausted_retries_are_dead_lettered(tmp_path):
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    dispatcher = make_dispatcher(tmp_path, handler, max_retries=2)
+
+    async def main():
+        await dispatcher.enqueue("http://hooks.test/cb", {"task_id": "t1"})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    records = read_dead_letters(dispatcher)
+    assert len(records) == 1
+    assert len(records[0]["errors"]) == 2
+    assert dispatcher.stats["dead_lettered"] == 1
+
+
+def test_private_callback_is_dead_lettered_without_request(tmp_path):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url.path)
+        return httpx.Response(200)
+
+    dispatcher = make_dispatcher(tmp_path, handler, allow_private=False)
+
+    async def main():
+        await dispatcher.enqueue("http://127.0.0.1:8080/cb", {"task_id": "t1"})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    assert attempts == []
+    assert len(read_dead_letters(dispatcher)) == 1
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "ftp://8.8.8.8/cb",
+        "http://127.0.0.1/cb",
+        "http://10.0.0.5/cb",
+        "http://169.254.169.254/latest/meta-data",
+        "http://[::1]/cb",
+        "http://[::ffff:192.168.0.1]/cb",
+    ],
+)
+def test_validate_rejects_non_public_targets(url):
+    with pytest.raises(ValueError):
+        asyncio.run(CallbackDispatcher().validate(url))
+
+
+def test_validate_allow_list():
+    dispatcher = CallbackDispatcher(allowed_hosts=["hooks.example.com"])
+    asyncio.run(dispatcher.validate("https://HOOKS.example.com/cb"))
+    with pytest.raises(ValueError):
+        asyncio.run(dispatcher.validate("https://8.8.8.8/cb"))
+
+
+def test_host_slot_is_released_during_backoff(tmp_path, monkeypatch):
+    # 退避取满延迟，便于观察退避期间同一主机的其他回调能否投递
+    monkeypatch.setattr(webhook.random, "uniform", lambda low, high: high)
+    order = []
+
+    def handler(request):
+        order.append(request.url.path)
+        first_try = request.url.path == "/a" and order.count("/a") == 1
+        return httpx.Response(500 if first_try else 200)
+
+    dispatcher = make_dispatcher(tmp_path, handler, max_per_host=1, retry_delay=0.2)
+
+    async def main():
+        await dispatcher.enqueue("http://hooks.test/a", {})
+        await dispatcher.enqueue("http://hooks.test/b", {})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    assert order == ["/a", "/b", "/a"]
+    assert dispatcher.stats["delivered"] == 2
+    # 投递结束后不再保留空闲主机的并发名额
+    assert dispatcher._host_limits == {}